@@ -1,9 +1,171 @@
+import os
+import uuid
+from typing import TYPE_CHECKING, Optional
 import streamlit as st
-from src.databricks_client import DatabricksGenieClient
 from src.chat_interface import ChatInterface
+from src.markdown_formatter import format_markdown_stream
+from src.transcript import TranscriptView
+from src.utils import configure_logging, format_markdown_response
 import config
 
+# Client and cache modules are imported on first use so the page renders before they load
+if TYPE_CHECKING:
+    from src.client_registry import ClientRegistry
+    from src.conversation_store import ConversationStore
+    from src.semantic_cache import SemanticCache
+
+@st.cache_resource
+def get_client_registry() -> "ClientRegistry":
+    """Return the registry of clients shared by every session in this process."""
+    from src.client_registry import ClientRegistry
+    
+    return ClientRegistry()
+
+@st.cache_resource
+def get_semantic_cache() -> "SemanticCache":
+    """Return the semantic answer cache shared by every session in this process."""
+    from src.semantic_cache import SemanticCache
+    
+    return SemanticCache()
+
+@st.cache_resource
+def get_conversation_store() -> Optional["ConversationStore"]:
+    """Return the conversation store shared by every session in this process, if configured."""
+    from src.conversation_store import create_conversation_store
+    
+    return create_conversation_store()
+
+def get_session_id() -> str:
+    """
+    Return the id of this browser session's conversation.
+    
+    With SESSION_SECRET set, a signed, expiring token for the id is kept in the
+    page URL, so a reload or a different server process resumes the same
+    conversation from the conversation store. The URL is then a credential for
+    the transcript; without a secret, a bare id in the URL is never trusted and
+    every browser session starts a new conversation.
+    
+    Returns:
+        The session id
+    """
+    from src.conversation_store import sign_session_id, verify_session_token
+    
+    session_id = st.session_state.get("session_id")
+    if session_id is None:
+        session_id = verify_session_token(st.query_params.get("session"), config.SESSION_SECRET,
+                                          config.SESSION_LINK_MAX_AGE)
+        session_id = session_id or uuid.uuid4().hex
+        st.session_state.session_id = session_id
+        if config.SESSION_SECRET:
+            st.query_params["session"] = sign_session_id(session_id, config.SESSION_SECRET)
+        elif "session" in st.query_params:
+            del st.query_params["session"]
+    return session_id
+
+@st.cache_resource
+def start_metrics_endpoint() -> None:
+    """Expose request-path metrics on localhost once per process, if configured."""
+    if config.METRICS_PORT:
+        from src.metrics import start_metrics_server
+        
+        try:
+            start_metrics_server(config.METRICS_PORT)
+        except OSError as e:
+            st.warning(f"Could not start metrics endpoint on port {config.METRICS_PORT}: {str(e)}")
+
+def render_request_trace(chat_interface: ChatInterface) -> None:
+    """Show the last request's timings and per-stage latency percentiles in the sidebar."""
+    from src.metrics import stage_percentiles
+    
+    with st.sidebar:
+        st.divider()
+        st.markdown("### Request Trace")
+        if chat_interface.last_trace is not None:
+            st.json(chat_interface.last_trace.as_dict())
+        percentiles = stage_percentiles()
+        if percentiles:
+            st.markdown("Stage latency (ms)")
+            rows = [{"stage": stage, **values} for stage, values in sorted(percentiles.items())]
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def get_chat_interface(api_key: str) -> ChatInterface:
+    """
+    Return this session's chat interface, bound to the shared client for the API key.
+    
+    Args:
+        api_key: Databricks API key to use
+        
+    Returns:
+        The ChatInterface stored in session state
+    """
+    client = get_client_registry().get_client(api_key=api_key)
+    chat_interface = st.session_state.get("chat_interface")
+    
+    if chat_interface is None:
+        session_id = get_session_id()
+        archive_path = None
+        if config.HISTORY_ARCHIVE_DIR:
+            os.makedirs(config.HISTORY_ARCHIVE_DIR, exist_ok=True)
+            archive_path = os.path.join(config.HISTORY_ARCHIVE_DIR, f"{session_id}.jsonl.gz")
+        semantic_cache = get_semantic_cache() if config.SEMANTIC_CACHE_ENABLED else None
+        chat_interface = ChatInterface(client, history_archive_path=archive_path,
+                                       semantic_cache=semantic_cache,
+                                       conversation_store=get_conversation_store(),
+                                       session_id=session_id)
+        st.session_state.chat_interface = chat_interface
+    elif chat_interface.client is not client:
+        # Credentials changed; keep the conversation but switch clients
+        chat_interface.client = client
+    
+    return chat_interface
+
+def get_transcript_view() -> TranscriptView:
+    """Return this session's transcript window, which keeps formatted messages across reruns."""
+    view = st.session_state.get("transcript_view")
+    if view is None:
+        view = st.session_state.transcript_view = TranscriptView()
+    return view
+
+def render_history(chat_interface: ChatInterface) -> None:
+    """
+    Display the newest messages of the conversation, with a button to page in older ones.
+    
+    Args:
+        chat_interface: This session's chat interface
+    """
+    transcript = get_transcript_view()
+    messages, has_earlier = transcript.visible(chat_interface)
+    if has_earlier:
+        st.button("Load earlier messages", on_click=transcript.load_earlier)
+    for index, message in messages:
+        with st.chat_message(message["role"]):
+            st.markdown(transcript.format(index, message))
+
+def ask_followup(question: str) -> None:
+    """Button callback: submit a suggested question on the next rerun."""
+    st.session_state.followup_prompt = question
+
+def render_followups(chat_interface: ChatInterface) -> None:
+    """
+    Offer suggested follow-up questions and start answering them in the background.
+    
+    Clicking one submits it as the next prompt on the following rerun.
+    
+    Args:
+        chat_interface: This session's chat interface
+    """
+    suggestions = chat_interface.followup_suggestions()
+    if not suggestions:
+        return
+    chat_interface.prefetch_followups(suggestions)
+    columns = st.columns(len(suggestions))
+    for index, (column, question) in enumerate(zip(columns, suggestions)):
+        column.button(question, key=f"followup-{index}", use_container_width=True,
+                      on_click=ask_followup, args=(question,))
+
 def main():
+    configure_logging()
+    
     # Set page config
     st.set_page_config(
         page_title="Clinical Chatbot",
@@ -11,14 +173,12 @@ def main():
         layout="wide"
     )
     
-    # Initialize session state for chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    
     # App header
     st.title("Clinical Chatbot")
     st.markdown("Ask medical questions and get responses powered by Databricks Genie")
     
+    start_metrics_endpoint()
+    
     # Sidebar for configuration
     with st.sidebar:
         st.header("Configuration")
@@ -35,39 +195,40 @@ def main():
         professional for medical advice.
         """)
     
-    # Initialize the Databricks client
+    # Get the shared Databricks client and this session's chat interface
     try:
         # Use API key from session state or config
         api_key_to_use = api_key or config.DATABRICKS_API_KEY
-        client = DatabricksGenieClient(api_key=api_key_to_use)
-        chat_interface = ChatInterface(client)
+        chat_interface = get_chat_interface(api_key_to_use)
     except Exception as e:
         st.error(f"Error initializing Databricks client: {str(e)}")
         st.warning("Please check your API key and configuration.")
         return
     
-    # Display chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # Display the most recent part of the chat history
+    render_history(chat_interface)
     
-    # Input field for new messages
-    if prompt := st.chat_input("Ask a clinical question..."):
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
+    # Input field for new messages; a clicked suggestion is asked as if it had been typed
+    followup = st.session_state.pop("followup_prompt", None)
+    prompt = st.chat_input("Ask a clinical question...") or followup
+    if prompt:
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get response from Databricks Genie API
+        # Get response from Databricks Genie API; both turns are recorded in chat_interface.history
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = chat_interface.get_response(prompt)
-                st.markdown(response)
-        
-        # Add assistant response to chat history
-        st.session_state.messages.append({"role": "assistant", "content": response})
+            if config.STREAMING_ENABLED:
+                st.write_stream(format_markdown_stream(chat_interface.stream_response(prompt)))
+            else:
+                with st.spinner("Thinking..."):
+                    response = chat_interface.get_response(prompt)
+                    st.markdown(format_markdown_response(response))
+    
+    render_followups(chat_interface)
+    
+    if config.SHOW_REQUEST_TRACE:
+        render_request_trace(chat_interface)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
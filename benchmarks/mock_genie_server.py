@@ -0,0 +1,231 @@
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LOREM_WORDS = (
+    "the patient should be monitored for renal function and blood pressure while "
+    "therapy is titrated consult the prescribing information and a clinician before "
+    "changing the dose of any medication"
+).split()
+
+class LatencyModel:
+    """Samples upstream latencies from a configurable distribution."""
+
+    def __init__(self, distribution: str = "lognormal", mean_ms: float = 50.0, jitter_ms: float = 20.0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the latency model.
+
+        Args:
+            distribution: "fixed", "uniform", "normal" or "lognormal"
+            mean_ms: Mean latency in milliseconds
+            jitter_ms: Spread around the mean in milliseconds (half-width for uniform, sigma otherwise)
+            seed: Optional random seed for reproducible runs
+        """
+        if distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """
+        Draw one latency.
+
+        Returns:
+            Latency in seconds
+        """
+        with self._lock:
+            if self.distribution == "fixed" or self.jitter_ms <= 0:
+                value = self.mean_ms
+            elif self.distribution == "uniform":
+                value = self._random.uniform(self.mean_ms - self.jitter_ms, self.mean_ms + self.jitter_ms)
+            elif self.distribution == "normal":
+                value = self._random.gauss(self.mean_ms, self.jitter_ms)
+            else:
+                # Parameterized so the samples have the requested mean and standard deviation
+                variance = (self.jitter_ms / self.mean_ms) ** 2
+                sigma = math.sqrt(math.log(1 + variance))
+                mu = math.log(self.mean_ms) - sigma ** 2 / 2
+                value = self._random.lognormvariate(mu, sigma)
+        return max(0.0, value) / 1000.0
+
+class MockGenieServer:
+    """
+    Local stand-in for the Genie completions endpoint.
+
+    Accepts POSTs on any path, waits for a sampled latency and answers with a
+    completion in the same shapes the real endpoint uses: a JSON body, or
+    server-sent events when the request sets ``"stream": true``. Errors and
+    429 throttling can be injected at configurable rates.
+    """
+
+    def __init__(self,
+                 latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 retry_after: float = 0.05,
+                 response_words: int = 60,
+                 stream_chunk_words: int = 4,
+                 stream_chunk_delay: float = 0.0,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the mock server.
+
+        Args:
+            latency: Time before the response (or first streamed chunk) is sent
+            error_rate: Fraction of requests answered with HTTP 500
+            throttle_rate: Fraction of requests answered with HTTP 429
+            retry_after: Retry-After value in seconds sent with 429 responses
+            response_words: Number of words in each completion
+            stream_chunk_words: Words per streamed event
+            stream_chunk_delay: Delay in seconds between streamed events
+            host: Interface to bind
+            port: Port to listen on; 0 picks a free port
+            seed: Optional random seed for fault injection
+        """
+        self.latency = latency or LatencyModel(seed=seed)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.response_words = response_words
+        self.stream_chunk_words = max(1, stream_chunk_words)
+        self.stream_chunk_delay = stream_chunk_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "completions": 0, "streams": 0, "errors": 0, "throttled": 0}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server, usable as a workspace URL."""
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("ascii")
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockGenieServer":
+        """Serve requests from a daemon thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-genie", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockGenieServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _choose_fault(self) -> Optional[int]:
+        """Return an injected status code, or None to answer normally."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def _completion_text(self, prompt: str) -> str:
+        """Build a deterministic answer whose length does not depend on the prompt."""
+        offset = len(prompt) % len(LOREM_WORDS)
+        words = [LOREM_WORDS[(offset + i) % len(LOREM_WORDS)] for i in range(self.response_words)]
+        return " ".join(words)
+
+    def _make_handler(self):
+        server = self
+
+        class GenieHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                server._count("requests")
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload: Dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+
+                time.sleep(server.latency.sample())
+
+                fault = server._choose_fault()
+                if fault == 429:
+                    server._count("throttled")
+                    self._send_json(429, {"error": "rate limited"},
+                                    {"Retry-After": f"{server.retry_after:g}"})
+                    return
+                if fault == 500:
+                    server._count("errors")
+                    self._send_json(500, {"error": "injected failure"})
+                    return
+
+                text = server._completion_text(payload.get("prompt", ""))
+                if payload.get("stream"):
+                    server._count("streams")
+                    self._send_stream(text)
+                else:
+                    server._count("completions")
+                    self._send_json(200, {"choices": [{"text": text}]})
+
+            def _send_json(self, status: int, body: Dict[str, Any],
+                           headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, text: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = text.split(" ")
+                step = server.stream_chunk_words
+                for start in range(0, len(words), step):
+                    delta = " ".join(words[start:start + step])
+                    if start:
+                        delta = " " + delta
+                        if server.stream_chunk_delay:
+                            time.sleep(server.stream_chunk_delay)
+                    event = json.dumps({"choices": [{"text": delta}]})
+                    self.wfile.write(f"data: {event}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return GenieHandler
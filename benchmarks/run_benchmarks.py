@@ -0,0 +1,357 @@
+"""
+Offline benchmarks for the Genie client and chat interface.
+
+Starts a local MockGenieServer and drives the real client code against it,
+reporting throughput, latency percentiles and memory as JSON.
+
+Usage:
+    python -m benchmarks.run_benchmarks --concurrency 8 --requests 200 --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json
+"""
+import argparse
+import json
+import logging
+import math
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks.mock_genie_server import LatencyModel, MockGenieServer
+from src.chat_interface import ChatInterface
+from src.databricks_client import DatabricksGenieClient
+from src.metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("client_blocking", "client_streaming", "chat_session")
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values: Values in ascending order
+        q: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or None if there are no values
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Summarize latencies in milliseconds.
+
+    Args:
+        latencies: Durations in seconds
+
+    Returns:
+        p50, p95, p99, mean and max in milliseconds
+    """
+    values = sorted(latencies)
+    summary = {f"p{q}": percentile(values, q) for q in (50, 95, 99)}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["max"] = values[-1] if values else None
+    return {name: None if value is None else round(value * 1000, 3) for name, value in summary.items()}
+
+class BenchmarkRunner:
+    """Runs benchmark scenarios against a mock Genie server."""
+
+    def __init__(self,
+                 server: MockGenieServer,
+                 concurrency: int = 8,
+                 requests_per_scenario: int = 200,
+                 session_turns: int = 10,
+                 max_retries: int = 3,
+                 trace_memory: bool = True):
+        """
+        Initialize the runner.
+
+        Args:
+            server: A started mock server
+            concurrency: Number of worker threads (or concurrent sessions)
+            requests_per_scenario: Completions issued by the client scenarios
+            session_turns: Turns per session in the chat scenario
+            max_retries: Client retry budget for injected faults
+            trace_memory: Whether to record peak allocations with tracemalloc
+        """
+        self.server = server
+        self.concurrency = concurrency
+        self.requests_per_scenario = requests_per_scenario
+        self.session_turns = session_turns
+        self.max_retries = max_retries
+        self.trace_memory = trace_memory
+
+    def _client(self) -> DatabricksGenieClient:
+        return DatabricksGenieClient(api_key="benchmark",
+                                     workspace_url=self.server.url,
+                                     pool_size=self.concurrency,
+                                     max_retries=self.max_retries)
+
+    def run(self, name: str) -> Dict[str, Any]:
+        """
+        Run one scenario.
+
+        Args:
+            name: One of SCENARIOS
+
+        Returns:
+            The scenario's results
+        """
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        server_before = dict(self.server.stats)
+
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            result = getattr(self, f"_run_{name}")()
+        finally:
+            duration = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+
+        latencies = result.pop("latencies")
+        result.update({
+            "scenario": name,
+            "concurrency": self.concurrency,
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+            "latency_ms": summarize_latencies(latencies),
+            "peak_memory_kib": None if peak is None else round(peak / 1024, 1),
+            "server": {key: self.server.stats[key] - server_before[key] for key in server_before}
+        })
+        return result
+
+    def _run_parallel(self, count: int, task: Callable[[int], Any]) -> List[Any]:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(task, range(count)))
+
+    def _run_client_blocking(self) -> Dict[str, Any]:
+        errors = 0
+        lock = threading.Lock()
+
+        with self._client() as client:
+            def task(i: int) -> float:
+                nonlocal errors
+                start = time.perf_counter()
+                try:
+                    client.generate_completion(f"Benchmark question {i}")
+                except Exception:
+                    with lock:
+                        errors += 1
+                return time.perf_counter() - start
+
+            latencies = self._run_parallel(self.requests_per_scenario, task)
+
+        return {"requests": len(latencies), "errors": errors, "latencies": latencies}
+
+    def _run_client_streaming(self) -> Dict[str, Any]:
+        errors = 0
+        first_tokens: List[float] = []
+        lock = threading.Lock()
+
+        with self._client() as client:
+            def task(i: int) -> float:
+                nonlocal errors
+                start = time.perf_counter()
+                first = None
+                try:
+                    for _ in client.stream_completion(f"Benchmark question {i}"):
+                        if first is None:
+                            first = time.perf_counter() - start
+                except Exception:
+                    with lock:
+                        errors += 1
+                if first is not None:
+                    with lock:
+                        first_tokens.append(first)
+                return time.perf_counter() - start
+
+            latencies = self._run_parallel(self.requests_per_scenario, task)
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "time_to_first_token_ms": summarize_latencies(first_tokens),
+            "latencies": latencies
+        }
+
+    def _run_chat_session(self) -> Dict[str, Any]:
+        errors_before = ERRORS.value(stage="get_response")
+        context_chars: List[int] = []
+        lock = threading.Lock()
+
+        with self._client() as client:
+            def session(session_id: int) -> List[float]:
+                interface = ChatInterface(client)
+                turn_latencies = []
+                for turn in range(self.session_turns):
+                    start = time.perf_counter()
+                    interface.get_response(f"Session {session_id} follow-up question {turn}")
+                    turn_latencies.append(time.perf_counter() - start)
+                with lock:
+                    context_chars.append(len(interface._create_context()))
+                return turn_latencies
+
+            per_session = self._run_parallel(self.concurrency, session)
+
+        latencies = [latency for turns in per_session for latency in turns]
+        return {
+            "sessions": len(per_session),
+            "turns_per_session": self.session_turns,
+            "requests": len(latencies),
+            "errors": int(ERRORS.value(stage="get_response") - errors_before),
+            "final_context_chars_max": max(context_chars) if context_chars else 0,
+            "latencies": latencies
+        }
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(scenarios: Sequence[str] = SCENARIOS,
+                   concurrency: int = 8,
+                   requests_per_scenario: int = 200,
+                   session_turns: int = 10,
+                   latency: Optional[LatencyModel] = None,
+                   error_rate: float = 0.0,
+                   throttle_rate: float = 0.0,
+                   max_retries: int = 3,
+                   trace_memory: bool = True,
+                   seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Start a mock server and run the given scenarios against it.
+
+    Args:
+        scenarios: Scenario names to run, in order
+        concurrency: Worker threads, or concurrent sessions for chat_session
+        requests_per_scenario: Completions issued by the client scenarios
+        session_turns: Turns per chat session
+        latency: Upstream latency model
+        error_rate: Fraction of upstream requests failing with HTTP 500
+        throttle_rate: Fraction of upstream requests throttled with HTTP 429
+        max_retries: Client retry budget
+        trace_memory: Whether to record peak allocations
+        seed: Optional random seed
+
+    Returns:
+        Run metadata and per-scenario results
+    """
+    latency = latency or LatencyModel(seed=seed)
+    with MockGenieServer(latency=latency, error_rate=error_rate,
+                         throttle_rate=throttle_rate, seed=seed) as server:
+        runner = BenchmarkRunner(server, concurrency=concurrency,
+                                 requests_per_scenario=requests_per_scenario,
+                                 session_turns=session_turns, max_retries=max_retries,
+                                 trace_memory=trace_memory)
+        results = [runner.run(name) for name in scenarios]
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency": {"distribution": latency.distribution, "mean_ms": latency.mean_ms,
+                        "jitter_ms": latency.jitter_ms},
+            "error_rate": error_rate,
+            "throttle_rate": throttle_rate,
+            "max_retries": max_retries
+        },
+        "scenarios": results
+    }
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Describe throughput and p95 changes relative to an earlier run.
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from an earlier run's JSON
+
+    Returns:
+        One line per scenario present in both runs
+    """
+    previous = {result["scenario"]: result for result in baseline.get("scenarios", [])}
+    lines = []
+    for result in current["scenarios"]:
+        old = previous.get(result["scenario"])
+        if old is None:
+            continue
+
+        def change(new_value, old_value):
+            if not new_value or not old_value:
+                return "n/a"
+            return f"{(new_value - old_value) / old_value * 100:+.1f}%"
+
+        lines.append(
+            f"{result['scenario']}: throughput {change(result['throughput_rps'], old['throughput_rps'])}, "
+            f"p95 {change(result['latency_ms']['p95'], old['latency_ms']['p95'])}"
+        )
+    return lines
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Genie client against a local mock server")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run; may be repeated (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Completions per client scenario")
+    parser.add_argument("--session-turns", type=int, default=10)
+    parser.add_argument("--latency", choices=("fixed", "uniform", "normal", "lognormal"), default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Upstream latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (lower overhead)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Write results to this JSON file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    # Injected faults make retry warnings expected noise
+    logging.getLogger().setLevel(logging.ERROR)
+
+    results = run_benchmarks(
+        scenarios=args.scenario or SCENARIOS,
+        concurrency=args.concurrency,
+        requests_per_scenario=args.requests,
+        session_turns=args.session_turns,
+        latency=LatencyModel(args.latency, args.latency_ms, args.jitter_ms, seed=args.seed),
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        max_retries=args.max_retries,
+        trace_memory=not args.no_memory,
+        seed=args.seed
+    )
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            for line in compare_to_baseline(results, json.load(baseline_file)):
+                print(line, file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
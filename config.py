@@ -1,19 +1,189 @@
+"""
+Application settings.
+
+Settings are read once, on first use, from the environment and an optional
+.env file into a frozen Settings object. Module attributes such as
+config.MODEL_NAME remain available and resolve to the matching field of
+get_settings(), so importing this module has no side effects.
+"""
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+@dataclass(frozen=True)
+class Settings:
+    """Configuration values; each field is overridden by the environment variable of the same name in upper case."""
+
+    # Databricks API configuration
+    databricks_api_key: str = ""
+    databricks_workspace_url: str = "https://dbc-xxxxxxxx-xxxx.cloud.databricks.com"
+    databricks_genie_endpoint: str = "/api/2.0/genie/completions"
+    # Optional comma-separated list of interchangeable serving endpoints (paths or full URLs)
+    databricks_genie_endpoints: Tuple[str, ...] = ()
+
+    # Model configuration
+    model_name: str = "genie-1-mistral"
+    max_tokens: int = 2000
+    temperature: float = 0.3
+    context_token_budget: int = 3000
+
+    # Conversation history kept in memory per session
+    history_max_messages: int = 200
+    history_archive_dir: str = ""
+    # Messages loaded per page when a stored conversation is resumed
+    history_page_size: int = 50
+    # Messages rendered on the page; "Load earlier messages" adds this many more
+    render_window: int = 20
+
+    # Durable conversation store ("sqlite", "file", or empty to disable) written behind in batches
+    conversation_store: str = ""
+    conversation_store_path: str = ""
+    conversation_store_batch_size: int = 64
+    conversation_store_flush_interval: float = 0.05
+    # Secret used to sign the ?session= link that resumes a stored conversation, and how long a
+    # link stays valid; without a secret, stored conversations are never resumed from the URL
+    session_secret: str = ""
+    session_link_max_age: float = 43200.0
+
+    # Replace patient identifiers with placeholders before prompts leave the process
+    phi_redaction_enabled: bool = True
+
+    # Rolling summarization of older conversation turns
+    summary_enabled: bool = False
+    summary_trigger_messages: int = 10
+    summary_keep_recent: int = 6
+    summary_max_tokens: int = 400
+    summary_workers: int = 2
+
+    # HTTP connection settings
+    http_pool_size: int = 10
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 60.0
+    http_max_retries: int = 3
+    http_backoff_base: float = 0.5
+    http_backoff_max: float = 30.0
+
+    # Client-side rate limiting shared by every client using the same workspace token
+    rate_limit_enabled: bool = True
+    rate_limit_rps: float = 0.0
+    rate_limit_burst: float = 0.0
+    rate_limit_queue_timeout: float = 30.0
+    adaptive_concurrency_initial: int = 8
+    adaptive_concurrency_min: int = 1
+    adaptive_concurrency_max: int = 64
+    adaptive_latency_tolerance: float = 3.0
+
+    # Endpoint routing: circuit breakers and hedged requests
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    hedge_enabled: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = 0.05
+    hedge_workers: int = 32
+
+    # Priority scheduler for upstream calls: worker slots and the share background and bulk work may occupy
+    scheduler_enabled: bool = True
+    scheduler_workers: int = 16
+    scheduler_background_share: float = 0.25
+    scheduler_bulk_share: float = 0.5
+    # Seconds an interactive request may wait for a slot before it is dropped
+    scheduler_queue_timeout: float = 30.0
+
+    # Suggested follow-up questions shown after each answer (0 disables), and how many are
+    # answered ahead of time at background priority (opt-in: each costs an upstream completion)
+    # and for how long those answers are used
+    followup_suggestions: int = 3
+    followup_prefetch_budget: int = 0
+    followup_prefetch_ttl: float = 120.0
+
+    # Async batch settings
+    async_batch_concurrency: int = 16
+    async_request_timeout: float = 120.0
+
+    # Bulk question answering (python -m src.bulk_qa)
+    bulk_qa_concurrency: int = 8
+    bulk_qa_checkpoint_every: int = 100
+
+    # Response cache settings
+    response_cache_enabled: bool = True
+    response_cache_size: int = 1024
+    response_cache_ttl: float = 3600.0
+    response_cache_path: str = ""
+    response_cache_max_temperature: float = 0.5
+
+    # Semantic answer cache for paraphrased first questions (opt-in)
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.8
+    semantic_cache_size: int = 10000
+    semantic_cache_ttl: float = 3600.0
+    semantic_cache_dim: int = 256
+
+    # Coalesce identical in-flight completion requests into one upstream call
+    single_flight_enabled: bool = True
+
+    # Maximum number of distinct clients (workspace/API key pairs) kept per process
+    client_registry_size: int = 8
+
+    # Directory of entity term lists (medications.txt, conditions.txt, procedures.txt); bundled lists if empty
+    entity_terms_dir: str = ""
+
+    # Request-path metrics: Prometheus endpoint on localhost (0 disables) and per-request trace in the sidebar
+    metrics_port: int = 0
+    show_request_trace: bool = False
+
+    # Application settings
+    streaming_enabled: bool = True
+    debug_mode: bool = False
+    log_level: str = "INFO"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from environment variables, keeping defaults for unset ones.
+
+        Returns:
+            A new Settings instance
+        """
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(field.name.upper())
+            if raw is not None:
+                values[field.name] = _parse(field.type, raw)
+        return cls(**values)
+
+def _parse(kind: Any, raw: str) -> Any:
+    if kind is bool:
+        return raw.lower() == "true"
+    if kind is int:
+        return int(raw)
+    if kind is float:
+        return float(raw)
+    if kind == Tuple[str, ...]:
+        return tuple(item.strip() for item in raw.split(",") if item.strip())
+    return raw
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Return the process-wide settings, loading the .env file on first call.
+
+    Returns:
+        The frozen Settings instance
+    """
+    from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+    load_dotenv()
+    return Settings.from_env()
 
-# Databricks API configuration
-DATABRICKS_API_KEY = os.getenv("DATABRICKS_API_KEY", "")
-DATABRICKS_WORKSPACE_URL = os.getenv("DATABRICKS_WORKSPACE_URL", "https://dbc-xxxxxxxx-xxxx.cloud.databricks.com")
-DATABRICKS_GENIE_ENDPOINT = os.getenv("DATABRICKS_GENIE_ENDPOINT", "/api/2.0/genie/completions")
+_SETTING_NAMES = frozenset(field.name.upper() for field in fields(Settings))
 
-# Model configuration
-MODEL_NAME = os.getenv("MODEL_NAME", "genie-1-mistral")
-MAX_TOKENS = int(os.getenv("MAX_TOKENS", 2000))
-TEMPERATURE = float(os.getenv("TEMPERATURE", 0.3))
+def __getattr__(name: str) -> Any:
+    # Backwards-compatible module attributes, e.g. config.MODEL_NAME
+    if name in _SETTING_NAMES:
+        return getattr(get_settings(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Application settings
-DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | _SETTING_NAMES)
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+from src.databricks_client import BaseGenieClient, RETRYABLE_STATUS_CODES
+from src.endpoint_router import Endpoint
+from src.response_cache import ResponseCache
+from src.single_flight import AsyncSingleFlight, make_flight_key
+from src.rate_limiter import RateLimiter, RateLimitTimeout
+from src.metrics import RETRIES, time_stage
+import config
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabricksGenieClient(BaseGenieClient):
+    """Asynchronous client for the Databricks Genie API, suited to batch workloads."""
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 workspace_url: Optional[str] = None,
+                 endpoint: Optional[str] = None,
+                 pool_size: Optional[int] = None,
+                 timeout: Optional[Tuple[float, float]] = None,
+                 max_retries: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None,
+                 transport: Optional["httpx.AsyncBaseTransport"] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 endpoints: Optional[Sequence[str]] = None):
+        """
+        Initialize the async Databricks Genie client.
+
+        Args:
+            api_key: Databricks API key
+            workspace_url: Databricks workspace URL
+            endpoint: Genie API endpoint
+            pool_size: Maximum number of pooled keep-alive connections
+            timeout: (connect, read) timeout in seconds
+            max_retries: Number of retries for transient failures
+            cache: Optional cache of responses to repeated requests
+            transport: Optional httpx transport, mainly for testing
+            rate_limiter: Admission control shared with other clients of the same workspace token
+            endpoints: Interchangeable serving endpoints to route across
+        """
+        super().__init__(api_key, workspace_url, endpoint, timeout, max_retries, cache,
+                         rate_limiter, endpoints)
+        self.pool_size = pool_size or config.HTTP_POOL_SIZE
+        self._transport = transport
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._single_flight = AsyncSingleFlight() if config.SINGLE_FLIGHT_ENABLED else None
+
+    def _get_http_client(self) -> "httpx.AsyncClient":
+        """
+        Return the pooled HTTP client, creating it on first use.
+
+        The client is created lazily so that it binds to the running event loop.
+
+        Returns:
+            The shared httpx.AsyncClient
+        """
+        import httpx
+
+        if self._http is None or self._http.is_closed:
+            connect_timeout, read_timeout = self.timeout
+            self._http = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+                transport=self._transport
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client and release pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self) -> "AsyncDatabricksGenieClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def generate_completion(self,
+                                  prompt: str,
+                                  model: Optional[str] = None,
+                                  max_tokens: Optional[int] = None,
+                                  temperature: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Generate a completion using the Databricks Genie API.
+
+        Args:
+            prompt: The input text prompt
+            model: The model to use for completion
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature
+
+        Returns:
+            The API response as a dictionary
+        """
+        import httpx
+
+        payload = self._build_payload(prompt, model, max_tokens, temperature)
+
+        if config.DEBUG_MODE:
+            logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
+
+        cache_key = self._cache_key(payload)
+        if cache_key is not None and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        async def fetch() -> Dict[str, Any]:
+            with time_stage("http_total"):
+                response = await self._post(payload)
+            with time_stage("json_parse"):
+                result = response.json()
+            if cache_key is not None and self.cache is not None:
+                self.cache.set(cache_key, result)
+            return result
+
+        try:
+            if self._single_flight is None:
+                return await fetch()
+            # Identical concurrent requests share one upstream call
+            return await self._single_flight.do(make_flight_key(payload, self.base_url), fetch)
+
+        except (httpx.HTTPError, RateLimitTimeout) as e:
+            logger.error(f"API request failed: {str(e)}")
+            if isinstance(e, httpx.HTTPStatusError):
+                logger.error(f"Response status: {e.response.status_code}")
+                logger.error(f"Response body: {e.response.text}")
+
+            raise Exception(f"Failed to get response from Databricks API: {str(e)}")
+
+    async def batch_complete(self,
+                             prompts: Sequence[str],
+                             concurrency: Optional[int] = None,
+                             timeout: Optional[float] = None,
+                             **completion_kwargs: Any) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Run many completions concurrently with a bounded number in flight.
+
+        A failure or timeout for one prompt does not affect the others; its
+        slot in the result list holds the exception instead of a response.
+
+        Args:
+            prompts: The input prompts
+            concurrency: Maximum number of requests in flight at once
+            timeout: Per-request timeout in seconds, including retries
+            **completion_kwargs: Extra arguments passed to generate_completion
+
+        Returns:
+            API responses or exceptions, in the same order as the prompts
+        """
+        semaphore = asyncio.Semaphore(concurrency or config.ASYNC_BATCH_CONCURRENCY)
+        timeout = timeout or config.ASYNC_REQUEST_TIMEOUT
+
+        async def complete(prompt: str) -> Union[Dict[str, Any], Exception]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self.generate_completion(prompt, **completion_kwargs), timeout)
+                except asyncio.TimeoutError:
+                    return TimeoutError(f"Request timed out after {timeout}s")
+                except Exception as e:
+                    return e
+
+        return list(await asyncio.gather(*(complete(prompt) for prompt in prompts)))
+
+    async def _post(self, payload: Dict[str, Any]) -> "httpx.Response":
+        """
+        POST a payload to the Genie endpoint, retrying transient failures.
+
+        Args:
+            payload: The JSON request body
+
+        Returns:
+            The successful HTTP response
+        """
+        import httpx
+
+        http = self._get_http_client()
+        attempt = 0
+        failed: List[Endpoint] = []
+        while True:
+            admitted_at = (await self.rate_limiter.acquire_async()
+                           if self.rate_limiter is not None else None)
+            # Retries prefer an endpoint other than the one that just failed
+            target = self.router.choose(exclude=failed)
+            target.start()
+            status_code = latency = None
+            sent = time.monotonic()
+            try:
+                response = await http.post(target.url, json=payload)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                RETRIES.inc(reason="connection")
+                logger.warning(f"Request failed ({str(e)}), retrying in {delay:.2f}s")
+            else:
+                status_code = response.status_code
+                latency = time.monotonic() - sent
+                if status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                RETRIES.inc(reason=str(status_code))
+                logger.warning(f"Received HTTP {status_code}, retrying in {delay:.2f}s")
+            finally:
+                self._record_attempt(target, status_code, latency)
+                if admitted_at is not None and self.rate_limiter is not None:
+                    self.rate_limiter.release(admitted_at, status_code, latency)
+
+            failed = [target]
+            await asyncio.sleep(delay)
+            attempt += 1
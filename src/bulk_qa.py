@@ -0,0 +1,348 @@
+"""
+Bulk offline question answering.
+
+Streams questions from a JSONL or CSV file through DatabricksGenieClient with
+bounded concurrency and appends one JSON line per question (answer, extracted
+medical entities, timings) to the output in input order. Progress is
+checkpointed as byte offsets into both files, so an interrupted run resumes
+where it stopped and memory stays constant whatever the input size.
+
+Usage:
+    python -m src.bulk_qa questions.jsonl answers.jsonl --concurrency 16
+    python -m src.bulk_qa questions.csv answers.jsonl --resume
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from src.databricks_client import DatabricksGenieClient
+from src.metrics import trace_request
+from src.phi_redaction import PHIRedactor, RedactionMap, get_default_redactor, prepare_input
+from src.scheduler import Priority, RequestScheduler
+from src.utils import configure_logging, parse_medical_entities
+import config
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv")
+
+def detect_format(path: str) -> str:
+    """
+    Infer the input format from the file extension.
+
+    Args:
+        path: Input file path
+
+    Returns:
+        "csv" for .csv files, otherwise "jsonl"
+    """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def _read_lines(handle: BinaryIO, position: Dict[str, int]) -> Iterator[str]:
+    """
+    Decode lines one at a time, keeping position["offset"] at the end of the last line read.
+
+    Invalid UTF-8 is replaced with U+FFFD, so one stray byte does not abort the run.
+    """
+    for raw in iter(handle.readline, b""):
+        position["offset"] += len(raw)
+        yield raw.decode("utf-8", errors="replace").lstrip("\ufeff")
+
+def _csv_rows(lines: Iterator[str], header: List[str]) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """Parse CSV rows into fields keyed by the header, skipping empty rows."""
+    for row in csv.reader(lines):
+        if row:
+            yield dict(zip(header, row)), None
+
+def _jsonl_rows(lines: Iterator[str]) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """Parse JSON lines into fields and an error for unusable lines, skipping blank ones."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {}, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(fields, dict):
+            yield {}, "Record is not a JSON object"
+            continue
+        yield fields, None
+
+def iter_questions(path: str,
+                   fmt: Optional[str] = None,
+                   question_field: str = "question",
+                   id_field: str = "id",
+                   offset: int = 0,
+                   start_index: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    Stream question records from a JSONL or CSV file.
+
+    Only one record is held in memory at a time. CSV files need a header
+    row; quoted fields may span lines.
+
+    Args:
+        path: Input file path
+        fmt: "jsonl" or "csv"; inferred from the extension if omitted
+        question_field: Field holding the question text
+        id_field: Field holding the record id; the record number is used if absent
+        offset: Byte offset to start reading from, as stored in a checkpoint
+        start_index: Number of records before offset, used to number records
+
+    Yields:
+        (record, end_offset) pairs, where record has "id", "question" and,
+        for unusable rows, "error"; end_offset is the byte offset just past
+        the record
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+    index = start_index
+    with open(path, "rb") as handle:
+        position = {"offset": 0}
+        lines = _read_lines(handle, position)
+        header: Optional[List[str]] = None
+        if fmt == "csv":
+            header = next(csv.reader(lines), None)
+            if header is None:
+                return
+        if offset > position["offset"]:
+            handle.seek(offset)
+            position["offset"] = offset
+        rows = _csv_rows(lines, header) if header is not None else _jsonl_rows(lines)
+
+        for fields, error in rows:
+            index += 1
+            question = fields.get(question_field)
+            record = {"id": fields.get(id_field, index), "question": question}
+            if error is None and (not isinstance(question, str) or not question.strip()):
+                error = f"Missing '{question_field}' field"
+            if error is not None:
+                record["error"] = error
+            yield record, position["offset"]
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a checkpoint written by an earlier run.
+
+    Args:
+        path: Checkpoint file path
+
+    Returns:
+        The checkpoint, or None if there is none
+    """
+    try:
+        with open(path, encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    """
+    Atomically replace the checkpoint file.
+
+    Args:
+        path: Checkpoint file path
+        checkpoint: Offsets and counts to store
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary, path)
+
+class BulkQARunner:
+    """Answers a file of questions with bounded concurrency and resumable output."""
+
+    def __init__(self,
+                 client: DatabricksGenieClient,
+                 concurrency: Optional[int] = None,
+                 checkpoint_every: Optional[int] = None,
+                 max_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None,
+                 redactor: Optional[PHIRedactor] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            client: Client used for completions; shared by all worker threads
+            concurrency: Maximum number of questions in flight
+            checkpoint_every: Records written between checkpoints
+            max_tokens: Maximum number of tokens per answer
+            temperature: Sampling temperature
+            redactor: PHI redactor applied to questions; the shared default when PHI_REDACTION_ENABLED
+            scheduler: Scheduler questions are submitted to at bulk priority, such as the
+                process-wide one when running alongside chat sessions; a private
+                scheduler with `concurrency` workers if omitted
+        """
+        self.client = client
+        self.concurrency = max(1, concurrency or config.BULK_QA_CONCURRENCY)
+        self.checkpoint_every = max(1, checkpoint_every or config.BULK_QA_CHECKPOINT_EVERY)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        if redactor is None and config.PHI_REDACTION_ENABLED:
+            redactor = get_default_redactor()
+        self.redactor = redactor
+        self.scheduler = scheduler
+
+    def answer(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer a single question record.
+
+        Failures are recorded in the result rather than raised, so one bad
+        question does not stop the run.
+
+        Args:
+            record: Record from iter_questions
+
+        Returns:
+            The output line: id, question, answer, entities, timings and error
+        """
+        result = {"id": record["id"], "question": record["question"], "answer": None,
+                  "entities": [], "timings": {}, "error": record.get("error")}
+        if result["error"]:
+            return result
+
+        started = time.perf_counter()
+        with trace_request() as trace:
+            try:
+                # Each question gets its own mapping; answers are re-identified before writing
+                mapping = RedactionMap()
+                prompt = prepare_input(record["question"], self.redactor, mapping)
+                response = self.client.generate_completion(prompt,
+                                                           max_tokens=self.max_tokens,
+                                                           temperature=self.temperature)
+                result["answer"] = mapping.restore(self.client.extract_response_text(response))
+                result["entities"] = parse_medical_entities(result["answer"])
+            except Exception as e:
+                logger.error(f"Question {record['id']} failed: {str(e)}")
+                result["error"] = str(e)
+        result["timings"] = trace.as_dict()
+        result["timings"]["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def run(self,
+            input_path: str,
+            output_path: str,
+            checkpoint_path: Optional[str] = None,
+            resume: bool = False,
+            fmt: Optional[str] = None,
+            question_field: str = "question",
+            id_field: str = "id") -> Dict[str, Any]:
+        """
+        Answer every question in the input file.
+
+        At most twice the concurrency is submitted ahead of the writer, and
+        results are written in input order, so the checkpoint can describe
+        progress with two byte offsets.
+
+        Args:
+            input_path: JSONL or CSV file of questions
+            output_path: JSONL file answers are appended to
+            checkpoint_path: Checkpoint file; defaults to output_path + ".checkpoint"
+            resume: Continue from the checkpoint instead of starting over
+            fmt: Input format; inferred from the extension if omitted
+            question_field: Input field holding the question text
+            id_field: Input field holding the record id
+
+        Returns:
+            Summary with records processed in this run, errors and total records written
+        """
+        checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+        checkpoint = load_checkpoint(checkpoint_path) if resume else None
+        if checkpoint is not None and checkpoint.get("input") != os.path.abspath(input_path):
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('input')}")
+        checkpoint = checkpoint or {"input": os.path.abspath(input_path),
+                                    "input_offset": 0, "output_offset": 0, "records": 0}
+
+        summary = {"processed": 0, "errors": 0, "total": checkpoint["records"]}
+        started = time.perf_counter()
+        pending: Deque[Tuple[Future, int]] = deque()
+        window = self.concurrency * 2
+
+        with open(output_path, "ab" if resume else "wb") as output_file:
+            # Lines written after the last checkpoint are redone, so drop them
+            output_file.truncate(checkpoint["output_offset"])
+            output_file.seek(checkpoint["output_offset"])
+            scheduler = self.scheduler or RequestScheduler(workers=self.concurrency,
+                                                           shares={Priority.BULK: 1.0}, name="bulk-qa")
+
+            def write_next() -> None:
+                future, input_offset = pending.popleft()
+                result = future.result()
+                output_file.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+                summary["processed"] += 1
+                summary["errors"] += 1 if result["error"] else 0
+                checkpoint.update(input_offset=input_offset, output_offset=output_file.tell(),
+                                  records=checkpoint["records"] + 1)
+                if summary["processed"] % self.checkpoint_every == 0:
+                    self._checkpoint(output_file, checkpoint_path, checkpoint)
+
+            try:
+                records = iter_questions(input_path, fmt, question_field, id_field,
+                                         offset=checkpoint["input_offset"],
+                                         start_index=checkpoint["records"])
+                for record, input_offset in records:
+                    pending.append((scheduler.submit(self.answer, record, priority=Priority.BULK), input_offset))
+                    if len(pending) >= window:
+                        write_next()
+                while pending:
+                    write_next()
+            finally:
+                for future, _ in pending:
+                    future.cancel()
+                if scheduler is not self.scheduler:
+                    scheduler.shutdown(wait=True)
+                self._checkpoint(output_file, checkpoint_path, checkpoint)
+
+        summary["total"] = checkpoint["records"]
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return summary
+
+    @staticmethod
+    def _checkpoint(output_file: BinaryIO, checkpoint_path: str, checkpoint: Dict[str, Any]) -> None:
+        """Make written answers durable, then record how far input and output have got."""
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        save_checkpoint(checkpoint_path, checkpoint)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Answer a file of clinical questions with Databricks Genie")
+    parser.add_argument("input", help="JSONL or CSV file of questions")
+    parser.add_argument("output", help="JSONL file to append answers to")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from the file extension)")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--checkpoint-every", type=int, default=None, help="Records between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint of an earlier run")
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--temperature", type=float, default=None)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    if not config.DATABRICKS_API_KEY or not config.DATABRICKS_WORKSPACE_URL:
+        print("DATABRICKS_API_KEY and DATABRICKS_WORKSPACE_URL must be set", file=sys.stderr)
+        return 2
+
+    with DatabricksGenieClient(api_key=config.DATABRICKS_API_KEY,
+                               workspace_url=config.DATABRICKS_WORKSPACE_URL) as client:
+        runner = BulkQARunner(client, concurrency=args.concurrency, checkpoint_every=args.checkpoint_every,
+                              max_tokens=args.max_tokens, temperature=args.temperature)
+        summary = runner.run(args.input, args.output, checkpoint_path=args.checkpoint, resume=args.resume,
+                             fmt=args.format, question_field=args.question_field, id_field=args.id_field)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
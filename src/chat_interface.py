@@ -1,24 +1,158 @@
 import logging
-from typing import List, Dict, Any, Optional
-from src.databricks_client import DatabricksGenieClient
+import time
+from typing import TYPE_CHECKING, List, Any, Generator, Iterable, Iterator, Mapping, Optional, Tuple
+from src.context_builder import ContextBuilder
+from src.followups import FollowupPrefetcher, suggest_followups
+from src.history_store import HistoryStore, Message, history_bounds
+from src.phi_redaction import PHIRedactor, RedactionMap, get_default_redactor, normalize_input, prepare_input
+from src.scheduler import Priority, RequestScheduler, get_scheduler
+from src.summarizer import ConversationSummarizer
+from src.metrics import (ERRORS, REQUEST_SECONDS, RESPONSE_CHARS, RequestTrace,
+                         current_trace, observe_stage, time_stage, trace_request)
 import config
 
-# Configure logging
-logging.basicConfig(level=getattr(logging, config.LOG_LEVEL))
+if TYPE_CHECKING:
+    from src.conversation_store import ConversationStore
+    from src.databricks_client import DatabricksGenieClient
+    from src.semantic_cache import SemanticCache
+
 logger = logging.getLogger(__name__)
 
 class ChatInterface:
     """Handles chat interaction logic and message history management."""
     
-    def __init__(self, databricks_client: DatabricksGenieClient):
+    def __init__(self, 
+                 databricks_client: "DatabricksGenieClient",
+                 context_token_budget: Optional[int] = None,
+                 summarizer: Optional[ConversationSummarizer] = None,
+                 history_limit: Optional[int] = None,
+                 history_archive_path: Optional[str] = None,
+                 semantic_cache: Optional["SemanticCache"] = None,
+                 conversation_store: Optional["ConversationStore"] = None,
+                 session_id: Optional[str] = None,
+                 redactor: Optional[PHIRedactor] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 prefetcher: Optional[FollowupPrefetcher] = None):
         """
         Initialize the chat interface.
         
         Args:
             databricks_client: An initialized Databricks Genie client
+            context_token_budget: Maximum estimated tokens of conversation context per prompt
+            summarizer: Optional rolling summarizer; created from config when SUMMARY_ENABLED
+            history_limit: Maximum number of messages kept in memory
+            history_archive_path: Optional gzip file receiving messages evicted from memory
+            semantic_cache: Optional cache answering paraphrases of earlier opening questions
+            conversation_store: Optional durable store every message is appended to
+            session_id: Conversation to persist to and resume from the store
+            redactor: PHI redactor applied to everything sent upstream; the shared
+                default when PHI_REDACTION_ENABLED
+            scheduler: Scheduler upstream calls are queued through at interactive
+                priority; the shared one when SCHEDULER_ENABLED
+            prefetcher: Cache of follow-up answers computed ahead of time; created
+                when there is a scheduler and FOLLOWUP_PREFETCH_BUDGET is positive
         """
         self.client = databricks_client
-        self.history: List[Dict[str, str]] = []
+        self._history_limit = history_limit
+        self._history_archive_path = history_archive_path
+        self.conversation_store = conversation_store if session_id is not None else None
+        self.session_id = session_id
+        self._replace_history()
+        self._resume_history()
+        if redactor is None and config.PHI_REDACTION_ENABLED:
+            redactor = get_default_redactor()
+        self.redactor = redactor
+        if scheduler is None and config.SCHEDULER_ENABLED:
+            scheduler = get_scheduler()
+        self.scheduler = scheduler
+        if prefetcher is None and scheduler is not None and config.FOLLOWUP_PREFETCH_BUDGET > 0:
+            prefetcher = FollowupPrefetcher(scheduler)
+        self.prefetcher = prefetcher
+        # (history length, questions prefetched) for the answer prefetched last
+        self._prefetched_turn: Tuple[int, int] = (-1, 0)
+        # Placeholders are stable for the whole conversation and never leave this process
+        self.redaction_map = RedactionMap()
+        self._context_builder = ContextBuilder(token_budget=context_token_budget,
+                                               transform=self._prepare_turn)
+        if summarizer is None and config.SUMMARY_ENABLED:
+            summarizer = ConversationSummarizer(databricks_client)
+        if isinstance(summarizer, ConversationSummarizer) and summarizer.transform is None:
+            summarizer.transform = self._prepare_turn
+        self.summarizer = summarizer
+        self.semantic_cache = semantic_cache
+        self.last_trace: Optional[RequestTrace] = None
+    
+    @property
+    def history(self) -> HistoryStore:
+        """The bounded conversation history, shared with the UI."""
+        return self._history
+    
+    @history.setter
+    def history(self, messages: Iterable[Mapping[str, str]]) -> None:
+        self._replace_history(messages)
+    
+    def _replace_history(self, messages: Iterable[Mapping[str, str]] = (), offset: int = 0) -> None:
+        """Start a new bounded history holding the given messages."""
+        self._history = HistoryStore(messages,
+                                     max_messages=self._history_limit,
+                                     archive_path=self._history_archive_path,
+                                     offset=offset)
+    
+    def _resume_history(self) -> None:
+        """Load the newest page of a stored conversation; older pages are read on demand."""
+        if self.conversation_store is None or self.session_id is None:
+            return
+        page_size = min(config.HISTORY_PAGE_SIZE, self._history_limit or config.HISTORY_MAX_MESSAGES)
+        offset, messages = self.conversation_store.load_recent(self.session_id, page_size)
+        self._replace_history(messages, offset)
+    
+    def _prepare_turn(self, role: str, content: str) -> str:
+        """
+        Turn a history message into prompt text.
+        
+        User input is normalized, redacted and sanitized; assistant answers,
+        which are kept re-identified in history, are redacted again so the same
+        identifiers map to the same placeholders.
+        
+        Args:
+            role: "user" or "assistant"
+            content: The message as stored in history
+            
+        Returns:
+            The text sent upstream
+        """
+        if role == "user":
+            return prepare_input(content, self.redactor, self.redaction_map)
+        if self.redactor is not None:
+            return self.redactor.redact(content, self.redaction_map)[0]
+        return content
+    
+    def _record(self, role: str, content: str) -> None:
+        """Append a message to history and queue it for the conversation store."""
+        message = self.history.append({"role": role, "content": content})
+        if self.conversation_store is not None and self.session_id is not None:
+            try:
+                self.conversation_store.append(self.session_id, message)
+            except Exception as e:
+                logger.error(f"Failed to persist message: {str(e)}")
+    
+    def history_page(self, offset: int, limit: int) -> List[Message]:
+        """
+        Return messages by absolute index, reading turns no longer in memory from the store.
+        
+        Args:
+            offset: Absolute index of the first message
+            limit: Maximum number of messages
+            
+        Returns:
+            The messages, oldest first
+        """
+        memory_offset, total = history_bounds(self.history)
+        if offset < memory_offset and self.conversation_store is not None and self.session_id is not None:
+            return self.conversation_store.load_page(self.session_id, offset, limit)
+        start = max(offset, memory_offset) - memory_offset
+        end = max(0, min(offset + limit, total) - memory_offset)
+        return list(self.history[start:end])
     
     def get_response(self, user_message: str) -> str:
         """
@@ -31,54 +165,295 @@ class ChatInterface:
             The model's response text
         """
         # Add the user message to history
-        self.history.append({"role": "user", "content": user_message})
+        generation = history_bounds(self.history)[1]
+        self._record("user", user_message)
         
-        try:
-            # Create context with recent conversation history
-            context = self._create_context()
+        with trace_request() as trace:
+            try:
+                response_text = self._take_prefetched(user_message, generation)
+                if response_text is None:
+                    response_text = self._semantic_lookup(user_message)
+                if response_text is None:
+                    # Create context with recent conversation history
+                    with time_stage("context_build"):
+                        context = self._create_context()
+                    
+                    # Get response from the model
+                    response = self._schedule(self.client.generate_completion, context)
+                    with time_stage("extract"):
+                        response_text = self.redaction_map.restore(self.client.extract_response_text(response))
+                    self._semantic_store(user_message, response_text)
+                
+                # Add the assistant's response to history
+                self._record("assistant", response_text)
+                self._compact_history()
+                
+                return response_text
             
-            # Get response from the model
-            response = self.client.generate_completion(context)
-            response_text = self.client.extract_response_text(response)
+            except Exception as e:
+                logger.error(f"Error getting response: {str(e)}")
+                ERRORS.inc(stage="get_response")
+                trace.set("error", 1)
+                error_msg = "I'm sorry, I encountered an error processing your request. Please try again."
+                self._record("assistant", error_msg)
+                return error_msg
             
-            # Add the assistant's response to history
-            self.history.append({"role": "assistant", "content": response_text})
+            finally:
+                self._finish_trace(trace, "blocking", self.history[-1]["content"])
+    
+    def stream_response(self, user_message: str) -> Iterator[str]:
+        """
+        Stream a response from the Databricks Genie API for the user message.
+        
+        The complete response is added to history once the stream ends, or
+        when the consumer stops iterating early.
+        
+        Args:
+            user_message: The user's input message
             
-            return response_text
+        Yields:
+            Text deltas of the model's response
+        """
+        # Add the user message to history
+        generation = history_bounds(self.history)[1]
+        self._record("user", user_message)
+        chunks: List[str] = []
+        trace = RequestTrace()
+        upstream: Optional[Generator[str, None, None]] = None
+        
+        try:
+            # Create context with recent conversation history; the trace is only
+            # made current while this generator runs, never across a yield
+            with trace_request(trace):
+                cached = self._take_prefetched(user_message, generation)
+                if cached is None:
+                    cached = self._semantic_lookup(user_message)
+                if cached is not None:
+                    stream = iter([cached])
+                else:
+                    with time_stage("context_build"):
+                        context = self._create_context()
+                    upstream = self._scheduled_stream(context)
+                    stream = self.redaction_map.restore_stream(upstream)
+            
+            while True:
+                with trace_request(trace):
+                    delta = next(stream, None)
+                    if delta is not None and not chunks:
+                        observe_stage("time_to_first_token", time.perf_counter() - trace.started)
+                if delta is None:
+                    break
+                chunks.append(delta)
+                yield delta
         
         except Exception as e:
-            logger.error(f"Error getting response: {str(e)}")
+            logger.error(f"Error streaming response: {str(e)}")
+            ERRORS.inc(stage="stream_response")
+            trace.set("error", 1)
             error_msg = "I'm sorry, I encountered an error processing your request. Please try again."
-            self.history.append({"role": "assistant", "content": error_msg})
-            return error_msg
+            if chunks:
+                error_msg = "\n\n" + error_msg
+            chunks.append(error_msg)
+            yield error_msg
+        
+        else:
+            if cached is None:
+                self._semantic_store(user_message, "".join(chunks).strip())
+        
+        finally:
+            if upstream is not None:
+                # Give the scheduler slot back even if the consumer stopped early
+                upstream.close()
+            # Add the assistant's response to history
+            response_text = "".join(chunks).strip()
+            self._record("assistant", response_text)
+            self._compact_history()
+            self._finish_trace(trace, "streaming", response_text)
     
-    def _create_context(self, max_history: int = 5) -> str:
+    def _schedule(self, fn, *args, priority: Priority = Priority.INTERACTIVE, **kwargs) -> Any:
         """
-        Create a prompt context incorporating recent conversation history.
+        Run an upstream call through the request scheduler, if there is one.
         
         Args:
-            max_history: Maximum number of recent messages to include
+            fn: Client method to call
+            *args: Positional arguments for fn
+            priority: Request class
+            **kwargs: Keyword arguments for fn
             
         Returns:
-            A formatted prompt string with conversation context
+            The call's result
         """
-        # Get recent history (limited to max_history messages)
-        recent_history = self.history[-max_history*2:] if len(self.history) > 0 else []
+        if self.scheduler is None:
+            return fn(*args, **kwargs)
+        return self.scheduler.call(fn, *args, priority=priority,
+                                   timeout=config.SCHEDULER_QUEUE_TIMEOUT, **kwargs)
+    
+    def _scheduled_stream(self, context: str) -> Generator[str, None, None]:
+        """Stream a completion while holding an interactive scheduler slot."""
+        if self.scheduler is None:
+            yield from self.client.stream_completion(context)
+            return
+        with self.scheduler.slot(Priority.INTERACTIVE, timeout=config.SCHEDULER_QUEUE_TIMEOUT):
+            yield from self.client.stream_completion(context)
+    
+    def followup_suggestions(self, limit: Optional[int] = None) -> List[str]:
+        """
+        Suggest follow-up questions to the latest answer.
         
-        # Format the context with conversation history
-        context = "The following is a conversation with a clinical assistant.\n\n"
+        Args:
+            limit: Maximum number of suggestions; FOLLOWUP_SUGGESTIONS if omitted
+            
+        Returns:
+            Suggested questions, or an empty list if the last turn is not an answer
+        """
+        if not len(self.history) or self.history[-1]["role"] != "assistant":
+            return []
+        return suggest_followups(self.history[-1]["content"], self.history, limit)
+    
+    def prefetch_followups(self, questions: Iterable[str]) -> int:
+        """
+        Start answering suggested follow-ups at background priority.
         
-        for message in recent_history:
-            role = "User" if message["role"] == "user" else "Assistant"
-            context += f"{role}: {message['content']}\n\n"
+        Each prompt is built now, exactly as it would be if the question were
+        asked next, so asking one of them returns the prefetched answer.
+        Prefetching happens once per answer: calling this again before the
+        history changes does nothing.
         
-        # If the last message was from the user, we don't need to add anything else
-        # If the last message was from the assistant, we need to add a user message placeholder
-        if len(recent_history) > 0 and recent_history[-1]["role"] == "assistant":
-            context += "User: "
+        Args:
+            questions: Suggested questions, most likely first
+            
+        Returns:
+            Number of questions with a prefetch pending or done
+        """
+        if self.prefetcher is None:
+            return 0
+        generation = history_bounds(self.history)[1]
+        if generation == self._prefetched_turn[0]:
+            # Already done for this answer; reruns of the page must not rebuild prompts or refetch
+            return self._prefetched_turn[1]
+        prefetched = 0
+        for question in questions:
+            context = self._create_context(pending=question)
+            
+            def fetch(context: str = context) -> str:
+                response = self.client.generate_completion(context)
+                return self.redaction_map.restore(self.client.extract_response_text(response))
+            
+            if not self.prefetcher.prefetch(question, generation, fetch):
+                break
+            prefetched += 1
+        self._prefetched_turn = (generation, prefetched)
+        return prefetched
+    
+    def _take_prefetched(self, user_message: str, generation: int) -> Optional[str]:
+        """
+        Return the prefetched answer to this question, cancelling other prefetches.
         
-        return context
+        Args:
+            user_message: The user's input message
+            generation: Number of messages in history before the message was added
+            
+        Returns:
+            The prefetched answer, or None
+        """
+        if self.prefetcher is None:
+            return None
+        answer = self.prefetcher.take(user_message, generation)
+        trace = current_trace()
+        if trace is not None:
+            trace.set("prefetch_hit", int(answer is not None))
+        return answer
+    
+    def _semantic_lookup(self, user_message: str) -> Optional[str]:
+        """
+        Return a cached answer to a paraphrase of this question, if one applies.
+        
+        Only a conversation's opening question is looked up: later turns depend
+        on the conversation so far, which the cache does not capture.
+        
+        Args:
+            user_message: The user's input message, already added to history
+            
+        Returns:
+            The cached answer, or None
+        """
+        if self.semantic_cache is None or not self._semantic_cacheable(user_message):
+            return None
+        answer = self.semantic_cache.get(user_message)
+        trace = current_trace()
+        if trace is not None:
+            trace.set("semantic_cache_hit", int(answer is not None))
+        return answer
+    
+    def _semantic_store(self, user_message: str, response_text: str) -> None:
+        """Cache the answer to a conversation's opening question."""
+        if self.semantic_cache is not None and response_text and self._semantic_cacheable(user_message):
+            self.semantic_cache.set(user_message, response_text)
+    
+    def _semantic_cacheable(self, user_message: str) -> bool:
+        """
+        Check whether a turn may use the semantic cache, which is shared by all sessions.
+        
+        Questions mentioning patient identifiers are never cached, so their
+        answers cannot be served to another session.
+        """
+        if self.semantic_cache is None or history_bounds(self.history)[1] != 1:
+            return False
+        return not (self.redactor or get_default_redactor()).contains_phi(normalize_input(user_message))
+    
+    def _finish_trace(self, trace: RequestTrace, mode: str, response_text: str) -> None:
+        """
+        Record end-to-end metrics for a chat turn and keep its trace for display.
+        
+        Args:
+            trace: The turn's trace
+            mode: "blocking" or "streaming"
+            response_text: The text added to history for the turn
+        """
+        elapsed = time.perf_counter() - trace.started
+        REQUEST_SECONDS.observe(elapsed, mode=mode)
+        RESPONSE_CHARS.observe(len(response_text))
+        trace.add_span("total", elapsed)
+        trace.set("response_chars", len(response_text))
+        self.last_trace = trace
+    
+    def _create_context(self, token_budget: Optional[int] = None, pending: Optional[str] = None) -> str:
+        """
+        Create a prompt context incorporating recent conversation history.
+        
+        Turns are formatted once and cached; history is packed newest-first
+        until the token budget is reached.
+        
+        Args:
+            token_budget: Maximum estimated tokens, defaulting to the configured budget
+            pending: A question not yet in history, to build its prompt ahead of time
+            
+        Returns:
+            A formatted prompt string with conversation context
+        """
+        self._context_builder.sync(self.history)
+        if self.summarizer is None:
+            return self._context_builder.build(token_budget, pending=pending)
+        
+        summary, summarized_count = self.summarizer.snapshot()
+        if summarized_count > history_bounds(self.history)[1]:
+            # History was replaced since the summary was made
+            self.summarizer.reset()
+            summary, summarized_count = "", 0
+        return self._context_builder.build(token_budget, summary=summary, start=summarized_count, pending=pending)
+    
+    def _compact_history(self) -> None:
+        """Schedule a background summary refresh once enough turns have aged out."""
+        if self.summarizer is not None:
+            self.summarizer.maybe_refresh(self.history)
     
     def clear_history(self) -> None:
-        """Clear the conversation history."""
-        self.history = []
\ No newline at end of file
+        """Clear the conversation history, including any stored copy."""
+        self._replace_history()
+        if self.conversation_store is not None and self.session_id is not None:
+            self.conversation_store.delete(self.session_id)
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+            self._prefetched_turn = (-1, 0)
+        if self.summarizer is not None:
+            self.summarizer.reset()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from src.databricks_client import DatabricksGenieClient
+from src.response_cache import ResponseCache
+import config
+
+logger = logging.getLogger(__name__)
+
+class ClientRegistry:
+    """Process-wide, bounded LRU of Databricks Genie clients keyed by workspace and API key."""
+
+    def __init__(self,
+                 max_clients: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None):
+        """
+        Initialize the client registry.
+
+        Args:
+            max_clients: Maximum number of clients kept alive at once
+            cache: Response cache shared by every client; built from config if omitted
+        """
+        self.max_clients = max_clients or config.CLIENT_REGISTRY_SIZE
+        if cache is None and config.RESPONSE_CACHE_ENABLED:
+            cache = ResponseCache()
+        self.cache = cache
+        self._clients: "OrderedDict[Tuple[str, str, str], DatabricksGenieClient]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_client(self,
+                   api_key: Optional[str] = None,
+                   workspace_url: Optional[str] = None,
+                   endpoint: Optional[str] = None) -> DatabricksGenieClient:
+        """
+        Return the shared client for the given credentials, creating it if needed.
+
+        Args:
+            api_key: Databricks API key
+            workspace_url: Databricks workspace URL
+            endpoint: Genie API endpoint; when omitted the client routes across
+                the configured DATABRICKS_GENIE_ENDPOINTS
+
+        Returns:
+            A client whose connection pool is shared by all callers with the same key
+        """
+        api_key = api_key or config.DATABRICKS_API_KEY
+        workspace_url = workspace_url or config.DATABRICKS_WORKSPACE_URL
+        key = self._make_key(api_key, workspace_url,
+                             endpoint or ",".join(config.DATABRICKS_GENIE_ENDPOINTS)
+                             or config.DATABRICKS_GENIE_ENDPOINT)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+            client = DatabricksGenieClient(api_key=api_key,
+                                           workspace_url=workspace_url,
+                                           endpoint=endpoint,
+                                           cache=self.cache)
+            self._clients[key] = client
+
+            while len(self._clients) > self.max_clients:
+                _, evicted = self._clients.popitem(last=False)
+                evicted.close()
+                logger.debug("Evicted least recently used Databricks client")
+
+            return client
+
+    def clear(self) -> None:
+        """Close and drop every cached client."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @staticmethod
+    def _make_key(api_key: str, workspace_url: str, endpoint: str) -> Tuple[str, str, str]:
+        """
+        Build a registry key without keeping the raw API key in the key.
+
+        Args:
+            api_key: Databricks API key
+            workspace_url: Databricks workspace URL
+            endpoint: Genie API endpoint
+
+        Returns:
+            A hashable registry key
+        """
+        key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else ""
+        return (workspace_url.rstrip('/'), endpoint, key_digest)
@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence
+from src.history_store import history_bounds
+import config
+
+CONTEXT_HEADER = "The following is a conversation with a clinical assistant.\n\n"
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Uses the common ~4 characters per token approximation for English, which
+    is cheap enough to run on every turn and close enough for budgeting.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+class ContextBuilder:
+    """Builds conversation prompts from cached, pre-formatted turn segments within a token budget."""
+
+    def __init__(self,
+                 token_budget: Optional[int] = None,
+                 header: str = CONTEXT_HEADER,
+                 transform: Optional[Callable[[str, str], str]] = None):
+        """
+        Initialize the context builder.
+
+        Args:
+            token_budget: Maximum estimated tokens in a built prompt
+            header: Text placed at the start of every prompt
+            transform: Optional function of (role, content) applied once to each
+                turn before it is cached, such as PHI redaction
+        """
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.header = header
+        self.transform = transform
+        self._header_tokens = estimate_tokens(header)
+        self._segments: List[str] = []
+        self._roles: List[str] = []
+        # _cumulative[i] - _cumulative[0] is the token total of the first i segments
+        self._cumulative: List[int] = [0]
+        # Absolute history index of _segments[0]
+        self._first = 0
+        self._source: Optional[Sequence[Dict[str, str]]] = None
+
+    def append(self, role: str, content: str) -> None:
+        """
+        Format and cache a single turn.
+
+        Args:
+            role: "user" or "assistant"
+            content: The message text
+        """
+        if self.transform is not None:
+            content = self.transform(role, content)
+        segment = f"{ROLE_LABELS.get(role, 'Assistant')}: {content}\n\n"
+        self._segments.append(segment)
+        self._roles.append(role)
+        self._cumulative.append(self._cumulative[-1] + estimate_tokens(segment))
+
+    def reset(self) -> None:
+        """Drop all cached segments."""
+        self._segments = []
+        self._roles = []
+        self._cumulative = [0]
+        self._first = 0
+        self._source = None
+
+    def sync(self, history: Sequence[Dict[str, str]]) -> None:
+        """
+        Bring the cached segments up to date with a message history.
+
+        Only messages appended since the last sync are formatted. Segments
+        for messages the history has evicted are dropped. If the history was
+        replaced or shortened, the cache is rebuilt.
+
+        Args:
+            history: The conversation history
+        """
+        offset, total = history_bounds(history)
+        if history is not self._source or total < self._first + len(self._segments):
+            self.reset()
+            self._source = history
+            self._first = offset
+
+        if offset > self._first:
+            drop = min(offset - self._first, len(self._segments))
+            del self._segments[:drop]
+            del self._roles[:drop]
+            del self._cumulative[:drop]
+            self._first = offset if not self._segments else self._first + drop
+
+        for message in history[self._first + len(self._segments) - offset:]:
+            self.append(message["role"], message["content"])
+
+    def build(self,
+              token_budget: Optional[int] = None,
+              summary: str = "",
+              start: int = 0,
+              pending: Optional[str] = None) -> str:
+        """
+        Build a prompt from the newest turns that fit within the token budget.
+
+        The newest turn is always included, even if it alone exceeds the budget.
+
+        Args:
+            token_budget: Override for the configured token budget
+            summary: Running summary of earlier turns, placed before the verbatim turns
+            start: Absolute index of the first turn eligible for verbatim inclusion
+            pending: A user turn not yet in the history, built as if it had been
+                appended; used to prepare a prompt for a question before it is asked
+
+        Returns:
+            A formatted prompt string with conversation context
+        """
+        parts = [self.header]
+        budget = (token_budget or self.token_budget) - self._header_tokens
+        if summary:
+            summary_segment = f"Summary of the earlier conversation: {summary}\n\n"
+            parts.append(summary_segment)
+            budget -= estimate_tokens(summary_segment)
+
+        pending_segment = ""
+        if pending is not None:
+            if self.transform is not None:
+                pending = self.transform("user", pending)
+            pending_segment = f"{ROLE_LABELS['user']}: {pending}\n\n"
+            budget -= estimate_tokens(pending_segment)
+
+        count = len(self._segments)
+        if count == 0:
+            return "".join(parts) + pending_segment
+
+        total = self._cumulative[-1]
+        first = bisect_left(self._cumulative, total - budget)
+        first = min(max(first, start - self._first), count if pending_segment else count - 1)
+        parts.extend(self._segments[first:])
+
+        if pending_segment:
+            parts.append(pending_segment)
+        elif self._roles[-1] == "assistant":
+            # If the last message was from the assistant, add a user message placeholder
+            parts.append("User: ")
+
+        return "".join(parts)
+
+    def __len__(self) -> int:
+        return len(self._segments)
@@ -0,0 +1,492 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from src.history_store import Message
+from src.metrics import observe_stage
+import config
+
+logger = logging.getLogger(__name__)
+
+# Session ids become file names and SQL parameters; keep them to a safe alphabet
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+# Attempts made by the write-behind thread before a batch is dropped
+WRITE_ATTEMPTS = 3
+
+def validate_session_id(session_id: str) -> str:
+    """
+    Check that a session id is safe to use as a storage key.
+
+    Args:
+        session_id: Identifier of a conversation
+
+    Returns:
+        The session id
+
+    Raises:
+        ValueError: If it contains anything but letters, digits, "_" and "-"
+    """
+    if not isinstance(session_id, str) or not SESSION_ID_PATTERN.fullmatch(session_id):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    return session_id
+
+def sign_session_id(session_id: str, secret: str, issued: Optional[int] = None) -> str:
+    """
+    Build a resume token for a session, signed with a server secret.
+
+    The token is "<session id>.<issued unix time>.<signature>", so a link can
+    only resume a conversation this server handed out, and only until it expires.
+
+    Args:
+        session_id: Identifier of a conversation
+        secret: Server-side signing secret
+        issued: Issue time in seconds since the epoch; now if omitted
+
+    Returns:
+        The token
+    """
+    validate_session_id(session_id)
+    payload = f"{session_id}.{int(time.time()) if issued is None else issued}"
+    return f"{payload}.{_signature(payload, secret)}"
+
+def verify_session_token(token: Optional[str], secret: str, max_age: float) -> Optional[str]:
+    """
+    Check a resume token made by sign_session_id.
+
+    Args:
+        token: Token from the page URL
+        secret: Server-side signing secret
+        max_age: Seconds a token stays valid after it was issued
+
+    Returns:
+        The session id, or None if the token is missing, forged, malformed or expired
+    """
+    if not token or not secret:
+        return None
+    payload, _, signature = token.rpartition(".")
+    session_id, _, issued = payload.partition(".")
+    if not SESSION_ID_PATTERN.fullmatch(session_id) or not issued.isdigit():
+        return None
+    if not hmac.compare_digest(signature, _signature(payload, secret)):
+        return None
+    if time.time() - int(issued) > max_age:
+        return None
+    return session_id
+
+def _signature(payload: str, secret: str) -> str:
+    digest = hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+class ConversationStore(ABC):
+    """
+    Durable storage of conversation messages, keyed by session id.
+
+    Messages of a session are numbered from 0 in the order they were
+    appended, matching the absolute indexes used by HistoryStore.
+    """
+
+    @abstractmethod
+    def append_many(self, session_id: str, messages: Sequence[Mapping]) -> None:
+        """
+        Append messages to the end of a session.
+
+        Args:
+            session_id: Identifier of the conversation
+            messages: Mappings with "role" and "content"
+        """
+
+    @abstractmethod
+    def count(self, session_id: str) -> int:
+        """Return the number of messages stored for a session."""
+
+    @abstractmethod
+    def load_page(self, session_id: str, offset: int, limit: int) -> List[Message]:
+        """
+        Load a page of a session's messages.
+
+        Args:
+            session_id: Identifier of the conversation
+            offset: Absolute index of the first message
+            limit: Maximum number of messages
+
+        Returns:
+            The messages, oldest first
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove every message of a session."""
+
+    def append(self, session_id: str, message: Mapping) -> None:
+        self.append_many(session_id, [message])
+
+    def load_recent(self, session_id: str, limit: int) -> Tuple[int, List[Message]]:
+        """
+        Load the newest messages of a session, as done when it is resumed.
+
+        Args:
+            session_id: Identifier of the conversation
+            limit: Maximum number of messages
+
+        Returns:
+            (offset, messages) where offset is the absolute index of the first message returned
+        """
+        offset = max(0, self.count(session_id) - limit)
+        return offset, self.load_page(session_id, offset, limit)
+
+    def iter_pages(self, session_id: str, page_size: Optional[int] = None) -> Iterator[List[Message]]:
+        """
+        Lazily iterate over a session's messages one page at a time, oldest first.
+
+        Args:
+            session_id: Identifier of the conversation
+            page_size: Messages per page
+
+        Yields:
+            Pages of messages
+        """
+        page_size = page_size or config.HISTORY_PAGE_SIZE
+        offset = 0
+        while True:
+            page = self.load_page(session_id, offset, page_size)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+
+    def flush(self) -> None:
+        """Wait until every accepted append is durable. Synchronous stores have nothing to do."""
+
+    def close(self) -> None:
+        """Release resources held by the store."""
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversation store backed by a SQLite database in WAL mode."""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path of the SQLite database; created if missing
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets other processes read while a batch is being written
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages "
+            "(session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def append_many(self, session_id: str, messages: Sequence[Mapping]) -> None:
+        validate_session_id(session_id)
+        if not messages:
+            return
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so concurrent writers cannot reuse a seq
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._db.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, start + index, message["role"], message["content"], now)
+                     for index, message in enumerate(messages)]
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (validate_session_id(session_id),)
+            ).fetchone()[0]
+
+    def load_page(self, session_id: str, offset: int, limit: int) -> List[Message]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (validate_session_id(session_id), offset, limit)
+            ).fetchall()
+        return [Message(role, content) for role, content in rows]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (validate_session_id(session_id),))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+class FileConversationStore(ConversationStore):
+    """
+    Conversation store keeping one append-only JSONL file per session.
+
+    Line offsets are indexed lazily on first access to a session, so a page
+    can be read with a single seek however long the conversation is.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory holding the session files; created if missing
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # session id -> (start offset of every line, indexed file size)
+        self._index: Dict[str, Tuple[array, int]] = {}
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{validate_session_id(session_id)}.jsonl")
+
+    def _line_offsets(self, session_id: str) -> array:
+        """Return the session's line index, extending it with lines appended since. Caller holds the lock."""
+        offsets, indexed = self._index.get(session_id, (array("Q"), 0))
+        path = self._path(session_id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self._index.pop(session_id, None)
+            return array("Q")
+        if size < indexed:
+            # The file was replaced; index it again
+            offsets, indexed = array("Q"), 0
+        if size > indexed:
+            with open(path, "rb") as session_file:
+                session_file.seek(indexed)
+                position = indexed
+                for line in session_file:
+                    # A trailing partial line from an interrupted write is not a message
+                    if not line.endswith(b"\n"):
+                        break
+                    offsets.append(position)
+                    position += len(line)
+            indexed = position
+        self._index[session_id] = (offsets, indexed)
+        return offsets
+
+    def append_many(self, session_id: str, messages: Sequence[Mapping]) -> None:
+        if not messages:
+            return
+        data = "".join(json.dumps({"role": message["role"], "content": message["content"]},
+                                  ensure_ascii=False) + "\n"
+                       for message in messages).encode("utf-8")
+        with self._lock:
+            # One write per batch; O_APPEND keeps batches from different processes whole
+            with open(self._path(session_id), "ab") as session_file:
+                session_file.write(data)
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._line_offsets(session_id))
+
+    def load_page(self, session_id: str, offset: int, limit: int) -> List[Message]:
+        with self._lock:
+            offsets = self._line_offsets(session_id)
+            if offset >= len(offsets) or limit <= 0:
+                return []
+            messages = []
+            with open(self._path(session_id), "rb") as session_file:
+                session_file.seek(offsets[offset])
+                for _ in range(min(limit, len(offsets) - offset)):
+                    record = json.loads(session_file.readline())
+                    messages.append(Message(record["role"], record["content"]))
+            return messages
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._index.pop(session_id, None)
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+
+class WriteBehindStore(ConversationStore):
+    """
+    Wraps a store so appends are queued and written in batches by a background thread.
+
+    Chat turns return as soon as their messages are queued. Reads and
+    deletes first wait for the session's own queued appends, so a session
+    always reads back what was appended to it without waiting on others.
+    """
+
+    def __init__(self,
+                 store: ConversationStore,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 max_pending: int = 10000):
+        """
+        Initialize the write-behind wrapper.
+
+        Args:
+            store: The store that batches are written to
+            batch_size: Maximum number of queued appends written together
+            flush_interval: Seconds to wait for more appends before writing a partial batch
+            max_pending: Queued appends beyond which append blocks until the writer catches up
+        """
+        self.store = store
+        self.batch_size = batch_size or config.CONVERSATION_STORE_BATCH_SIZE
+        self.flush_interval = (config.CONVERSATION_STORE_FLUSH_INTERVAL
+                               if flush_interval is None else flush_interval)
+        self.dropped = 0
+        # Queued appends per session not yet written or dropped
+        self._pending: Dict[str, int] = {}
+        self._settled = threading.Condition()
+        self._queue: "queue.Queue[Optional[Tuple[str, List[Mapping]]]]" = queue.Queue(max_pending)
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._writer.start()
+
+    def append_many(self, session_id: str, messages: Sequence[Mapping]) -> None:
+        validate_session_id(session_id)
+        if self._stopped.is_set():
+            raise RuntimeError("Conversation store is closed")
+        if messages:
+            with self._settled:
+                self._pending[session_id] = self._pending.get(session_id, 0) + 1
+            self._queue.put((session_id, [dict(message) for message in messages]))
+
+    def count(self, session_id: str) -> int:
+        self.flush(session_id)
+        return self.store.count(session_id)
+
+    def load_page(self, session_id: str, offset: int, limit: int) -> List[Message]:
+        self.flush(session_id)
+        return self.store.load_page(session_id, offset, limit)
+
+    def delete(self, session_id: str) -> None:
+        self.flush(session_id)
+        self.store.delete(session_id)
+
+    def flush(self, session_id: Optional[str] = None) -> None:
+        """
+        Block until queued appends have been written or dropped.
+
+        Args:
+            session_id: Wait only for this session's appends; all appends if omitted
+        """
+        if session_id is None:
+            self._queue.join()
+            return
+        with self._settled:
+            self._settled.wait_for(lambda: session_id not in self._pending)
+
+    def close(self) -> None:
+        """Write queued appends, stop the writer thread and close the underlying store."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._queue.put(None)
+        self._writer.join()
+        self.store.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Gather whatever else arrives shortly so it shares one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            appends = [entry for entry in batch if entry is not None]
+            try:
+                if appends:
+                    self._write(appends)
+            finally:
+                # Always settle the batch, or flush() and every read would block forever
+                self._settle(appends)
+                for _ in batch:
+                    self._queue.task_done()
+            if len(appends) < len(batch):
+                return
+
+    def _write(self, appends: List[Tuple[str, List[Mapping]]]) -> None:
+        """Write a batch, one append_many call per session, retrying transient failures."""
+        sessions: Dict[str, List[Mapping]] = {}
+        for session_id, messages in appends:
+            sessions.setdefault(session_id, []).extend(messages)
+
+        started = time.perf_counter()
+        for session_id, messages in sessions.items():
+            for attempt in range(WRITE_ATTEMPTS):
+                try:
+                    self.store.append_many(session_id, messages)
+                    break
+                except (OSError, sqlite3.Error) as e:
+                    if attempt + 1 == WRITE_ATTEMPTS:
+                        self._drop(session_id, messages, e)
+                    else:
+                        logger.warning(f"Conversation store write failed ({str(e)}), retrying")
+                        time.sleep(0.1 * (attempt + 1))
+                except Exception as e:
+                    # Not transient, such as a message that cannot be encoded; retrying would not help
+                    self._drop(session_id, messages, e)
+                    break
+        observe_stage("store_write", time.perf_counter() - started)
+
+    def _settle(self, appends: List[Tuple[str, List[Mapping]]]) -> None:
+        """Mark appends as written or dropped and wake readers waiting on their sessions."""
+        with self._settled:
+            for session_id, _ in appends:
+                self._pending[session_id] -= 1
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+            self._settled.notify_all()
+
+    def _drop(self, session_id: str, messages: List[Mapping], error: Exception) -> None:
+        self.dropped += len(messages)
+        logger.error(f"Dropped {len(messages)} messages of session {session_id}: {str(error)}")
+
+def create_conversation_store(backend: Optional[str] = None, path: Optional[str] = None) -> Optional[ConversationStore]:
+    """
+    Create the configured conversation store, wrapped for write-behind.
+
+    Args:
+        backend: "sqlite", "file", or empty to disable persistence
+        path: Database file for "sqlite", directory for "file"
+
+    Returns:
+        The store, or None if persistence is disabled
+    """
+    backend = (config.CONVERSATION_STORE if backend is None else backend).lower()
+    path = path or config.CONVERSATION_STORE_PATH
+    if not backend:
+        return None
+    store: ConversationStore
+    if backend == "sqlite":
+        store = SQLiteConversationStore(path or "conversations.db")
+    elif backend == "file":
+        store = FileConversationStore(path or "conversations")
+    else:
+        raise ValueError(f"Unknown conversation store backend: {backend}")
+    return WriteBehindStore(store)
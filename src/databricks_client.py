@@ -1,27 +1,66 @@
-import requests
 import json
 import logging
-from typing import Dict, Any, Optional
+import random
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.response_cache import ResponseCache, make_cache_key
+from src.single_flight import SingleFlight, make_flight_key
+from src.endpoint_router import Endpoint, EndpointRouter, resolve_endpoint_urls
+from src.rate_limiter import RateLimiter, RateLimitTimeout, get_rate_limiter
+from src.metrics import HEDGED_REQUESTS, PROMPT_CHARS, RETRIES, current_trace, observe_stage, time_stage
 import config
 
-# Configure logging
-logging.basicConfig(level=getattr(logging, config.LOG_LEVEL))
+if TYPE_CHECKING:
+    import requests
+
 logger = logging.getLogger(__name__)
 
-class DatabricksGenieClient:
-    """Client for interacting with the Databricks Genie API."""
+# Status codes that indicate a transient upstream condition worth retrying
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Return the process-wide executor that runs hedged requests."""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=config.HEDGE_WORKERS,
+                                                 thread_name_prefix="hedge")
+        return _hedge_executor
+
+class BaseGenieClient:
+    """Payload construction and response parsing shared by the sync and async clients."""
     
     def __init__(self, 
                  api_key: Optional[str] = None, 
                  workspace_url: Optional[str] = None,
-                 endpoint: Optional[str] = None):
+                 endpoint: Optional[str] = None,
+                 timeout: Optional[Tuple[float, float]] = None,
+                 max_retries: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 endpoints: Optional[Sequence[str]] = None):
         """
-        Initialize the Databricks Genie client.
+        Resolve credentials, endpoint and retry settings shared by all clients.
         
         Args:
             api_key: Databricks API key
             workspace_url: Databricks workspace URL
             endpoint: Genie API endpoint
+            timeout: (connect, read) timeout in seconds
+            max_retries: Number of retries for transient failures
+            cache: Optional cache of responses to repeated requests
+            rate_limiter: Admission control for upstream requests; by default the
+                process-wide limiter for this workspace token when RATE_LIMIT_ENABLED
+            endpoints: Interchangeable serving endpoints (paths or full URLs) to route
+                across; defaults to DATABRICKS_GENIE_ENDPOINTS unless endpoint is given
         """
         self.api_key = api_key or config.DATABRICKS_API_KEY
         self.workspace_url = workspace_url or config.DATABRICKS_WORKSPACE_URL
@@ -30,19 +69,56 @@ class DatabricksGenieClient:
         if not self.api_key:
             raise ValueError("Databricks API key is required")
         
-        self.base_url = f"{self.workspace_url.rstrip('/')}/{self.endpoint.lstrip('/')}";
+        if endpoints is None:
+            endpoints = [endpoint] if endpoint else config.DATABRICKS_GENIE_ENDPOINTS
+        self.router = EndpointRouter(resolve_endpoint_urls(self.workspace_url, endpoints or [self.endpoint]))
+        # The primary endpoint also scopes cache and single-flight keys
+        self.base_url = self.router.primary.url
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.timeout = timeout or (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+        self.max_retries = config.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.cache = cache
+        if rate_limiter is None and config.RATE_LIMIT_ENABLED:
+            rate_limiter = get_rate_limiter(self.workspace_url, self.api_key)
+        self.rate_limiter = rate_limiter
     
-    def generate_completion(self, 
-                           prompt: str, 
-                           model: Optional[str] = None,
-                           max_tokens: Optional[int] = None,
-                           temperature: Optional[float] = None) -> Dict[str, Any]:
+    def _record_attempt(self, target: Endpoint, status_code: Optional[int], latency: Optional[float]) -> None:
         """
-        Generate a completion using the Databricks Genie API.
+        Feed the outcome of one upstream attempt back to the router.
+        
+        Args:
+            target: The endpoint the attempt was sent to
+            status_code: HTTP status, or None if no response arrived
+            latency: Time until the response headers arrived
+        """
+        healthy = status_code is not None and status_code < 500
+        # A 429 shows the endpoint is alive but says nothing about its latency
+        self.router.record(target, latency if healthy and status_code != 429 else None, healthy)
+    
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the cache key for a request, or None if it must not be cached.
+        
+        Args:
+            payload: The JSON request body
+            
+        Returns:
+            The cache key, or None when caching is disabled or bypassed
+        """
+        if self.cache is None or not self.cache.is_cacheable(payload):
+            return None
+        return make_cache_key(payload, namespace=self.base_url)
+    
+    def _build_payload(self, 
+                       prompt: str, 
+                       model: Optional[str] = None,
+                       max_tokens: Optional[int] = None,
+                       temperature: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Build the request body for a completion, applying configured defaults.
         
         Args:
             prompt: The input text prompt
@@ -51,43 +127,127 @@ class DatabricksGenieClient:
             temperature: Sampling temperature
             
         Returns:
-            The API response as a dictionary
+            The JSON request body
         """
         model = model or config.MODEL_NAME
-        max_tokens = max_tokens or config.MAX_TOKENS
-        temperature = temperature or config.TEMPERATURE
+        max_tokens = config.MAX_TOKENS if max_tokens is None else max_tokens
+        temperature = config.TEMPERATURE if temperature is None else temperature
+        
+        with time_stage("prompt_format"):
+            formatted_prompt = self._format_clinical_prompt(prompt)
+        PROMPT_CHARS.observe(len(formatted_prompt))
+        trace = current_trace()
+        if trace is not None:
+            trace.set("prompt_chars", len(formatted_prompt))
         
-        payload = {
+        return {
             "model": model,
-            "prompt": self._format_clinical_prompt(prompt),
+            "prompt": formatted_prompt,
             "max_tokens": max_tokens,
             "temperature": temperature
         }
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Compute the delay before the next retry.
         
-        if config.DEBUG_MODE:
-            logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            retry_after: Value of the Retry-After response header, if any
+            
+        Returns:
+            Delay in seconds
+        """
+        server_delay = self._parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, config.HTTP_BACKOFF_MAX)
         
+        # Full jitter spreads retries from concurrent sessions apart
+        ceiling = min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parse a Retry-After header given either in seconds or as an HTTP date.
+        
+        Args:
+            value: The raw header value
+            
+        Returns:
+            Delay in seconds, or None if the header is missing or invalid
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
         try:
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+    
+    @staticmethod
+    def _parse_stream(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+        """
+        Parse streamed lines into JSON chunks.
+        
+        Handles both server-sent events (``data:`` fields terminated by a blank
+        line, ending with ``[DONE]``) and newline-delimited JSON.
+        
+        Args:
+            lines: Raw response lines without trailing newlines
             
-            if config.DEBUG_MODE:
-                logger.debug(f"Response: {json.dumps(result, indent=2)}")
-                
-            return result
+        Yields:
+            Decoded JSON chunks
+        """
+        data_lines: List[str] = []
         
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API request failed: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response body: {e.response.text}")
+        for raw_line in lines:
+            line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
             
-            raise Exception(f"Failed to get response from Databricks API: {str(e)}")
+            if not line:
+                # A blank line dispatches the pending server-sent event
+                if data_lines:
+                    data = "\n".join(data_lines)
+                    data_lines = []
+                    if data == "[DONE]":
+                        return
+                    yield json.loads(data)
+                continue
+            
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            elif line.startswith(("event:", "id:", "retry:", ":")):
+                continue
+            else:
+                yield json.loads(line)
+        
+        if data_lines:
+            data = "\n".join(data_lines)
+            if data != "[DONE]":
+                yield json.loads(data)
+    
+    @staticmethod
+    def _extract_delta_text(chunk: Dict[str, Any]) -> str:
+        """
+        Extract the text delta from a streamed chunk.
+        
+        Args:
+            chunk: A decoded stream chunk
+            
+        Returns:
+            The delta text, or an empty string if the chunk carries none
+        """
+        choices = chunk.get("choices")
+        if choices:
+            choice = choices[0]
+            if "text" in choice:
+                return choice["text"] or ""
+            return (choice.get("delta") or {}).get("content") or ""
+        return chunk.get("result") or ""
     
     def _format_clinical_prompt(self, prompt: str) -> str:
         """
@@ -107,7 +267,7 @@ QUESTION: {prompt}
 
 ANSWER:
 """
-
+    
     def extract_response_text(self, api_response: Dict[str, Any]) -> str:
         """
         Extract the generated text from the API response.
@@ -130,4 +290,317 @@ ANSWER:
         
         except (KeyError, IndexError, AttributeError) as e:
             logger.error(f"Error extracting response text: {str(e)}")
-            return "Sorry, there was an error processing the response."
\ No newline at end of file
+            return "Sorry, there was an error processing the response."
+
+class DatabricksGenieClient(BaseGenieClient):
+    """Client for interacting with the Databricks Genie API."""
+    
+    def __init__(self, 
+                 api_key: Optional[str] = None, 
+                 workspace_url: Optional[str] = None,
+                 endpoint: Optional[str] = None,
+                 pool_size: Optional[int] = None,
+                 timeout: Optional[Tuple[float, float]] = None,
+                 max_retries: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 endpoints: Optional[Sequence[str]] = None):
+        """
+        Initialize the Databricks Genie client.
+        
+        Args:
+            api_key: Databricks API key
+            workspace_url: Databricks workspace URL
+            endpoint: Genie API endpoint
+            pool_size: Maximum number of pooled keep-alive connections
+            timeout: (connect, read) timeout in seconds
+            max_retries: Number of retries for transient failures
+            cache: Optional cache of responses to repeated requests
+            rate_limiter: Admission control shared with other clients of the same workspace token
+            endpoints: Interchangeable serving endpoints to route across
+        """
+        super().__init__(api_key, workspace_url, endpoint, timeout, max_retries, cache,
+                         rate_limiter, endpoints)
+        self.session = self._create_session(pool_size or config.HTTP_POOL_SIZE)
+        self._single_flight = SingleFlight() if config.SINGLE_FLIGHT_ENABLED else None
+    
+    def _create_session(self, pool_size: int) -> "requests.Session":
+        """
+        Create a keep-alive session with a connection pool sized for concurrent use.
+        
+        Args:
+            pool_size: Maximum number of connections kept open per host
+            
+        Returns:
+            A configured requests session
+        """
+        # Deferred so importing this module (e.g. for the async client) stays cheap
+        import requests
+        
+        session = requests.Session()
+        # Retries are handled in _post so that Retry-After and jitter are honored
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        return session
+    
+    def close(self) -> None:
+        """Close the underlying session and release pooled connections."""
+        self.session.close()
+    
+    def __enter__(self) -> "DatabricksGenieClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def generate_completion(self, 
+                           prompt: str, 
+                           model: Optional[str] = None,
+                           max_tokens: Optional[int] = None,
+                           temperature: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Generate a completion using the Databricks Genie API.
+        
+        Args:
+            prompt: The input text prompt
+            model: The model to use for completion
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature
+            
+        Returns:
+            The API response as a dictionary
+        """
+        import requests
+        
+        payload = self._build_payload(prompt, model, max_tokens, temperature)
+        
+        if config.DEBUG_MODE:
+            logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
+        
+        cache_key = self._cache_key(payload)
+        if cache_key is not None and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        def fetch() -> Dict[str, Any]:
+            with time_stage("http_total"):
+                response = self._post_hedged(payload) if config.HEDGE_ENABLED else self._post(payload)
+            with time_stage("json_parse"):
+                result = response.json()
+            
+            if config.DEBUG_MODE:
+                logger.debug(f"Response: {json.dumps(result, indent=2)}")
+            
+            if cache_key is not None and self.cache is not None:
+                self.cache.set(cache_key, result)
+            
+            return result
+        
+        try:
+            if self._single_flight is None:
+                return fetch()
+            # Identical concurrent requests share one upstream call
+            return self._single_flight.do(make_flight_key(payload, self.base_url), fetch)
+        
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            self._log_request_error(e)
+            raise Exception(f"Failed to get response from Databricks API: {str(e)}")
+    
+    def stream_completion(self, 
+                          prompt: str, 
+                          model: Optional[str] = None,
+                          max_tokens: Optional[int] = None,
+                          temperature: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream a completion from the Databricks Genie API as text deltas.
+        
+        Server-sent events and newline-delimited JSON bodies are parsed
+        incrementally. If the endpoint ignores the stream flag and returns a
+        single JSON document, its text is yielded as one delta.
+        
+        Args:
+            prompt: The input text prompt
+            model: The model to use for completion
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature
+            
+        Yields:
+            Generated text deltas in arrival order
+        """
+        import requests
+        
+        payload = self._build_payload(prompt, model, max_tokens, temperature)
+        
+        cache_key = self._cache_key(payload)
+        if cache_key is not None and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield self.extract_response_text(cached)
+                return
+        
+        payload["stream"] = True
+        
+        if config.DEBUG_MODE:
+            logger.debug(f"Streaming request payload: {json.dumps(payload, indent=2)}")
+        
+        started = time.perf_counter()
+        try:
+            response = self._post(payload, stream=True)
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            self._log_request_error(e)
+            raise Exception(f"Failed to get response from Databricks API: {str(e)}")
+        
+        try:
+            content_type = response.headers.get("Content-Type", "")
+            if "event-stream" not in content_type and "ndjson" not in content_type:
+                result = response.json()
+                if cache_key is not None and self.cache is not None:
+                    self.cache.set(cache_key, result)
+                yield self.extract_response_text(result)
+                return
+            
+            deltas: List[str] = []
+            lines = response.iter_lines(chunk_size=None)
+            for chunk in self._parse_stream(lines):
+                delta = self._extract_delta_text(chunk)
+                if delta:
+                    if not deltas:
+                        observe_stage("first_token", time.perf_counter() - started)
+                    deltas.append(delta)
+                    yield delta
+            observe_stage("http_total", time.perf_counter() - started)
+            
+            # Only a stream that ran to completion is cached
+            if cache_key is not None and self.cache is not None:
+                self.cache.set(cache_key, {"choices": [{"text": "".join(deltas)}]})
+        
+        except requests.exceptions.RequestException as e:
+            self._log_request_error(e)
+            raise Exception(f"Stream from Databricks API interrupted: {str(e)}")
+        
+        finally:
+            response.close()
+    
+    @staticmethod
+    def _log_request_error(error: Exception) -> None:
+        """
+        Log a failed request together with the upstream response, if any.
+        
+        Args:
+            error: The exception raised by requests or the rate limiter
+        """
+        logger.error(f"API request failed: {str(error)}")
+        if hasattr(error, 'response') and error.response is not None:
+            logger.error(f"Response status: {error.response.status_code}")
+            logger.error(f"Response body: {error.response.text}")
+    
+    def _post(self, payload: Dict[str, Any], stream: bool = False) -> "requests.Response":
+        """
+        POST a payload to the Genie endpoint, retrying transient failures.
+        
+        Connection errors, timeouts and retryable status codes are retried with
+        jittered exponential backoff, honoring any Retry-After header. Each
+        attempt first waits for capacity from the rate limiter, if any.
+        
+        Args:
+            payload: The JSON request body
+            stream: Whether to defer downloading the response body
+            
+        Returns:
+            The successful HTTP response
+        """
+        import requests
+        
+        attempt = 0
+        failed: List[Endpoint] = []
+        while True:
+            admitted_at = self.rate_limiter.acquire() if self.rate_limiter is not None else None
+            # Retries prefer an endpoint other than the one that just failed
+            target = self.router.choose(exclude=failed)
+            target.start()
+            status_code = latency = None
+            sent = time.monotonic()
+            try:
+                response = self.session.post(target.url, json=payload,
+                                             timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                RETRIES.inc(reason="connection")
+                logger.warning(f"Request failed ({str(e)}), retrying in {delay:.2f}s")
+            else:
+                status_code = response.status_code
+                # Time from sending the request until the response headers were parsed
+                if isinstance(response.elapsed, timedelta):
+                    latency = response.elapsed.total_seconds()
+                else:
+                    latency = time.monotonic() - sent
+                if status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    observe_stage("http_ttfb", latency)
+                    response.raise_for_status()
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                RETRIES.inc(reason=str(status_code))
+                response.close()
+                logger.warning(f"Received HTTP {status_code}, retrying in {delay:.2f}s")
+            finally:
+                self._record_attempt(target, status_code, latency)
+                if admitted_at is not None and self.rate_limiter is not None:
+                    self.rate_limiter.release(admitted_at, status_code, latency)
+            
+            failed = [target]
+            time.sleep(delay)
+            attempt += 1
+    
+    def _post_hedged(self, payload: Dict[str, Any]) -> "requests.Response":
+        """
+        POST a payload, sending a duplicate if no answer arrives by the hedge deadline.
+        
+        The deadline is a high quantile of recent latencies, so only the slowest
+        few percent of requests are duplicated. Least-outstanding routing sends
+        the duplicate to another endpoint when one is available. The first
+        successful response wins; the other request is left to finish and
+        its response is discarded.
+        
+        Args:
+            payload: The JSON request body
+            
+        Returns:
+            The first successful HTTP response
+        """
+        delay = self.router.hedge_delay()
+        if delay is None:
+            return self._post(payload)
+        
+        executor = _get_hedge_executor()
+        # Copy the context so stage timings still reach the caller's trace
+        primary = executor.submit(contextvars.copy_context().run, self._post, payload)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        
+        hedge = executor.submit(contextvars.copy_context().run, self._post, payload)
+        pending = {primary, hedge}
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    HEDGED_REQUESTS.inc(winner="hedge" if future is hedge else "primary")
+                    for loser in pending:
+                        loser.add_done_callback(self._close_discarded)
+                    return future.result()
+                errors.append(error)
+        # Both requests failed; report whichever failed first
+        raise errors[0]
+    
+    @staticmethod
+    def _close_discarded(future) -> None:
+        """Release the connection held by a response that lost a hedge race."""
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
@@ -0,0 +1,242 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Sequence
+from src.metrics import CIRCUIT_OPEN, ENDPOINT_REQUESTS
+import config
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest observation in an endpoint's latency average
+EWMA_ALPHA = 0.3
+
+# Number of recent latencies kept for hedge deadline estimates
+LATENCY_WINDOW = 200
+
+class CircuitBreaker:
+    """
+    Stops routing to an endpoint after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens and the
+    endpoint is skipped. Once reset_timeout has passed a single probe request
+    is let through (half-open); its success closes the circuit, its failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = config.CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent, claiming the probe slot when half-open.
+
+        Returns:
+            True if the endpoint may be used
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened after repeated endpoint failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+class Endpoint:
+    """A serving endpoint with its load and latency statistics."""
+
+    def __init__(self, url: str, breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the endpoint.
+
+        Args:
+            url: Full completions URL
+            breaker: Circuit breaker guarding the endpoint
+        """
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.ewma_latency: Optional[float] = None
+        self.outstanding = 0
+        self._lock = threading.Lock()
+
+    def score(self, default_latency: float) -> float:
+        """
+        Expected cost of sending one more request here.
+
+        Latency is scaled by the requests already queued on the endpoint, so
+        both a slow endpoint and a busy one are avoided.
+
+        Args:
+            default_latency: Latency assumed for endpoints without observations
+
+        Returns:
+            Lower is better
+        """
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        return latency * (self.outstanding + 1)
+
+    def start(self) -> None:
+        with self._lock:
+            self.outstanding += 1
+
+    def finish(self, latency: Optional[float]) -> None:
+        """
+        Mark a request as finished.
+
+        Args:
+            latency: Observed latency in seconds, or None if the request failed
+        """
+        with self._lock:
+            self.outstanding -= 1
+            if latency is not None:
+                if self.ewma_latency is None:
+                    self.ewma_latency = latency
+                else:
+                    self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+
+class EndpointRouter:
+    """Latency-aware, least-outstanding routing across interchangeable serving endpoints."""
+
+    def __init__(self,
+                 urls: Sequence[str],
+                 hedge_quantile: Optional[float] = None,
+                 hedge_min_samples: Optional[int] = None,
+                 hedge_min_delay: Optional[float] = None):
+        """
+        Initialize the router.
+
+        Args:
+            urls: Completions URLs of the endpoints; the first is the primary
+            hedge_quantile: Quantile of recent latencies used as the hedge deadline
+            hedge_min_samples: Observations needed before hedging starts
+            hedge_min_delay: Lower bound on the hedge deadline in seconds
+        """
+        if not urls:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints: List[Endpoint] = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.hedge_quantile = hedge_quantile or config.HEDGE_QUANTILE
+        self.hedge_min_samples = hedge_min_samples or config.HEDGE_MIN_SAMPLES
+        self.hedge_min_delay = config.HEDGE_MIN_DELAY if hedge_min_delay is None else hedge_min_delay
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> Endpoint:
+        return self.endpoints[0]
+
+    def choose(self, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """
+        Pick the endpoint with the lowest expected cost among those whose circuit allows it.
+
+        Args:
+            exclude: Endpoints to avoid, such as the one that just failed
+
+        Returns:
+            The chosen endpoint; if every circuit is open, the one that opened earliest
+        """
+        excluded = set(map(id, exclude))
+        candidates = [endpoint for endpoint in self.endpoints if id(endpoint) not in excluded] or self.endpoints
+        known = [endpoint.ewma_latency for endpoint in candidates if endpoint.ewma_latency is not None]
+        # Unmeasured endpoints are assumed average so they receive traffic and get measured
+        default_latency = sum(known) / len(known) if known else 1.0
+
+        for endpoint in sorted(candidates, key=lambda endpoint: endpoint.score(default_latency)):
+            if endpoint.breaker.allow_request():
+                return endpoint
+
+        # Fail open: trying the endpoint most likely to have recovered beats failing outright
+        return min(candidates, key=lambda endpoint: endpoint.breaker.opened_at)
+
+    def record(self, endpoint: Endpoint, latency: Optional[float], success: bool) -> None:
+        """
+        Record the outcome of a request sent to an endpoint.
+
+        Args:
+            endpoint: The endpoint used
+            latency: Time until response headers arrived, or None if no response arrived
+            success: False for connection failures and 5xx responses
+        """
+        if success:
+            endpoint.breaker.record_success()
+            if latency is not None:
+                with self._lock:
+                    self._latencies.append(latency)
+        else:
+            endpoint.breaker.record_failure()
+        endpoint.finish(latency if success else None)
+        ENDPOINT_REQUESTS.inc(endpoint=endpoint.url, outcome="success" if success else "failure")
+        CIRCUIT_OPEN.set(1 if endpoint.breaker.state == CircuitBreaker.OPEN else 0, endpoint=endpoint.url)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Deadline after which a duplicate request should be sent.
+
+        Returns:
+            The configured quantile of recent latencies in seconds, or None
+            until enough requests have been observed
+        """
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(self.hedge_quantile * len(ordered)) - 1)
+        return max(self.hedge_min_delay, ordered[index])
+
+def resolve_endpoint_urls(workspace_url: str, endpoints: Iterable[str]) -> List[str]:
+    """
+    Turn configured endpoints into full URLs.
+
+    Args:
+        workspace_url: Databricks workspace URL
+        endpoints: Paths relative to the workspace, or absolute URLs
+
+    Returns:
+        Full completions URLs, in order
+    """
+    urls = []
+    for endpoint in endpoints:
+        endpoint = endpoint.strip()
+        if not endpoint:
+            continue
+        if endpoint.startswith(("http://", "https://")):
+            urls.append(endpoint)
+        else:
+            urls.append(f"{workspace_url.rstrip('/')}/{endpoint.lstrip('/')}")
+    return urls
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from src.metrics import FOLLOWUP_PREFETCHES
+from src.scheduler import Priority, RequestScheduler
+from src.utils import parse_medical_entities
+import config
+
+logger = logging.getLogger(__name__)
+
+# Follow-ups clinicians commonly ask about each kind of entity, most common first
+FOLLOWUP_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    "medication": ("What is the usual dosing of {term}?",
+                   "What are the contraindications to {term}?",
+                   "What are the major drug interactions of {term}?"),
+    "condition": ("What is the first-line treatment for {term}?",
+                  "What are the diagnostic criteria for {term}?",
+                  "What follow-up monitoring is recommended for {term}?"),
+    "procedure": ("What are the main risks of {term}?",
+                  "How should a patient prepare for {term}?"),
+}
+
+# Earlier user questions checked so a suggestion does not repeat one
+RECENT_QUESTIONS = 20
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+def suggest_followups(answer: str,
+                      history: Sequence[Mapping[str, str]] = (),
+                      limit: Optional[int] = None) -> List[str]:
+    """
+    Suggest follow-up questions about the medical entities in an answer.
+
+    Entities are taken in order of first mention, falling back to the last
+    question if the answer names none. Suggestions alternate between entities
+    before moving to each entity's less common follow-ups, and questions
+    already asked in recent history are skipped.
+
+    Args:
+        answer: The assistant's latest answer
+        history: The conversation history, used to find the last question and
+            avoid repeating earlier ones
+        limit: Maximum number of suggestions
+
+    Returns:
+        Suggested questions, most likely first
+    """
+    limit = config.FOLLOWUP_SUGGESTIONS if limit is None else limit
+    if limit <= 0:
+        return []
+
+    recent = [message for message in history[-RECENT_QUESTIONS:] if message["role"] == "user"]
+    asked = {_normalize_question(message["content"]) for message in recent}
+    entities = parse_medical_entities(answer)
+    if not entities and recent:
+        entities = parse_medical_entities(recent[-1]["content"])
+
+    terms: Dict[str, Tuple[str, str]] = {}
+    for entity in entities:
+        if entity["type"] in FOLLOWUP_TEMPLATES:
+            terms.setdefault(entity["text"].lower(), (entity["type"], entity["text"]))
+
+    suggestions: List[str] = []
+    depth = max((len(templates) for templates in FOLLOWUP_TEMPLATES.values()), default=0)
+    for rank in range(depth):
+        for kind, term in terms.values():
+            templates = FOLLOWUP_TEMPLATES[kind]
+            if rank >= len(templates):
+                continue
+            question = templates[rank].format(term=term)
+            if _normalize_question(question) not in asked:
+                suggestions.append(question)
+                if len(suggestions) == limit:
+                    return suggestions
+    return suggestions
+
+class _Prefetch:
+    """A speculatively answered question, valid only for the history it was prepared from."""
+
+    __slots__ = ("future", "generation", "created")
+
+    def __init__(self, future: Future, generation: int):
+        self.future = future
+        self.generation = generation
+        self.created = time.monotonic()
+
+class FollowupPrefetcher:
+    """
+    Per-session cache of answers to suggested follow-ups, computed ahead of time.
+
+    Completions are queued at background priority, so they only use capacity
+    interactive requests leave free. An answer is used only if nothing was
+    added to the conversation since it was requested and it is younger than
+    the TTL; asking anything else cancels the prefetches still queued.
+    """
+
+    def __init__(self,
+                 scheduler: RequestScheduler,
+                 budget: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            scheduler: Scheduler the completions are submitted to
+            budget: Maximum number of follow-ups prefetched after each answer
+            ttl: Seconds a prefetched answer may be used for
+        """
+        self.scheduler = scheduler
+        self.budget = config.FOLLOWUP_PREFETCH_BUDGET if budget is None else budget
+        self.ttl = ttl or config.FOLLOWUP_PREFETCH_TTL
+        self._entries: Dict[str, _Prefetch] = {}
+        # History length the current prefetches were made for, and how many were started for it
+        self._generation: Optional[int] = None
+        self._spent = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def prefetch(self, question: str, generation: int, fetch: Callable[[], str]) -> bool:
+        """
+        Start answering a question in the background, within the budget.
+
+        Args:
+            question: The suggested question
+            generation: Number of messages in the history the answer is prepared from
+            fetch: Function producing the answer text
+
+        Returns:
+            Whether a prefetch for the question is now pending or done
+        """
+        key = _normalize_question(question)
+        with self._lock:
+            if generation != self._generation:
+                self._cancel_all()
+                self._generation = generation
+                self._spent = 0
+            if key in self._entries:
+                return True
+            if self._spent >= self.budget:
+                return False
+            self._spent += 1
+            self._entries[key] = _Prefetch(self.scheduler.submit(fetch, priority=Priority.BACKGROUND), generation)
+            FOLLOWUP_PREFETCHES.inc(outcome="started")
+            return True
+
+    def take(self, question: str, generation: int) -> Optional[str]:
+        """
+        Return the prefetched answer to a question and cancel every other prefetch.
+
+        An answer still being computed is waited for, since that is sooner
+        than starting over; one not yet started is cancelled instead.
+
+        Args:
+            question: The question being asked
+            generation: Number of messages in the history before the question
+
+        Returns:
+            The answer, or None if no usable prefetch exists
+        """
+        with self._lock:
+            entry = self._entries.pop(_normalize_question(question), None)
+            self._cancel_all()
+        if entry is None:
+            return None
+        if entry.generation != generation or time.monotonic() - entry.created > self.ttl \
+                or entry.future.cancel():
+            entry.future.cancel()
+            FOLLOWUP_PREFETCHES.inc(outcome="discarded")
+            return None
+        try:
+            answer = entry.future.result()
+        except Exception as e:
+            logger.warning(f"Prefetched answer unavailable: {str(e)}")
+            answer = None
+        FOLLOWUP_PREFETCHES.inc(outcome="used" if answer else "discarded")
+        return answer or None
+
+    def cancel(self) -> None:
+        """Cancel queued prefetches and forget all prefetched answers."""
+        with self._lock:
+            self._cancel_all()
+
+    def _cancel_all(self) -> None:
+        """Cancel and forget every prefetch. Caller holds the lock."""
+        for entry in self._entries.values():
+            entry.future.cancel()
+        FOLLOWUP_PREFETCHES.inc(len(self._entries), outcome="discarded")
+        self._entries.clear()
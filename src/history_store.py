@@ -0,0 +1,186 @@
+import gzip
+import json
+import logging
+import sys
+import threading
+from collections import deque
+from collections.abc import Mapping, Sequence
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union, overload
+import config
+
+logger = logging.getLogger(__name__)
+
+# Evicted messages are written to the archive in batches of this size
+ARCHIVE_BATCH_SIZE = 32
+
+def history_bounds(history: Sequence) -> Tuple[int, int]:
+    """
+    Return the absolute index range held by a history.
+
+    Plain lists hold every message; a HistoryStore may have evicted its oldest ones.
+
+    Args:
+        history: A list of messages or a HistoryStore
+
+    Returns:
+        (offset, total) where offset is the absolute index of history[0]
+    """
+    total = getattr(history, "total_count", len(history))
+    return total - len(history), total
+
+class Message(Mapping):
+    """A compact, read-only chat message that behaves like {"role": ..., "content": ...}."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        """
+        Initialize a message.
+
+        Args:
+            role: "user" or "assistant"; interned so all messages share one string
+            content: The message text
+        """
+        self.role = sys.intern(role)
+        self.content = content
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield "role"
+        yield "content"
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the message as a plain dictionary."""
+        return {"role": self.role, "content": self.content}
+
+class HistoryStore(Sequence):
+    """Bounded conversation history that optionally spills evicted turns to a gzip archive."""
+
+    def __init__(self,
+                 messages: Iterable[Mapping] = (),
+                 max_messages: Optional[int] = None,
+                 archive_path: Optional[str] = None,
+                 offset: int = 0):
+        """
+        Initialize the history store.
+
+        Args:
+            messages: Initial messages
+            max_messages: Maximum number of messages kept in memory
+            archive_path: Gzip JSONL file receiving evicted messages; evicted turns are dropped if unset
+            offset: Absolute index of the first initial message, when older ones were not loaded
+        """
+        self.max_messages = max_messages or config.HISTORY_MAX_MESSAGES
+        self.archive_path = archive_path
+        self._messages: Deque[Message] = deque()
+        self._evicted = offset
+        self._spill: List[Message] = []
+        self._lock = threading.Lock()
+        for message in messages:
+            self.append(message)
+
+    @property
+    def total_count(self) -> int:
+        """Number of messages ever appended, including evicted ones."""
+        return self._evicted + len(self._messages)
+
+    @property
+    def offset(self) -> int:
+        """Absolute index of the oldest message still held in memory."""
+        return self._evicted
+
+    def append(self, message: Union[Mapping, Message]) -> Message:
+        """
+        Append a message, evicting the oldest one if the store is full.
+
+        Args:
+            message: A Message or a mapping with "role" and "content"
+
+        Returns:
+            The stored message record
+        """
+        if not isinstance(message, Message):
+            message = Message(message["role"], message["content"])
+
+        with self._lock:
+            self._messages.append(message)
+            if len(self._messages) > self.max_messages:
+                evicted = self._messages.popleft()
+                self._evicted += 1
+                if self.archive_path:
+                    self._spill.append(evicted)
+                    if len(self._spill) >= ARCHIVE_BATCH_SIZE:
+                        self._flush_spill()
+        return message
+
+    def flush(self) -> None:
+        """Write any pending evicted messages to the archive."""
+        with self._lock:
+            self._flush_spill()
+
+    def archived(self) -> Iterator[Message]:
+        """
+        Iterate over messages that were evicted to the archive, oldest first.
+
+        Yields:
+            Archived messages
+        """
+        self.flush()
+        if not self.archive_path:
+            return
+        try:
+            with gzip.open(self.archive_path, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    record = json.loads(line)
+                    yield Message(record["role"], record["content"])
+        except FileNotFoundError:
+            return
+
+    @overload
+    def __getitem__(self, index: int) -> Message: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Message]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Message, List[Message]]:
+        if isinstance(index, slice):
+            return list(self._messages)[index]
+        return self._messages[index]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(list(self._messages))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (HistoryStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"HistoryStore({list(self._messages)!r})"
+
+    def _flush_spill(self) -> None:
+        """Append pending evicted messages to the archive as one gzip member. Caller holds the lock."""
+        if not self._spill or not self.archive_path:
+            return
+        lines = "".join(json.dumps(message.to_dict()) + "\n" for message in self._spill)
+        try:
+            with gzip.open(self.archive_path, "ab") as archive:
+                archive.write(lines.encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"Failed to archive evicted messages: {str(e)}")
+        self._spill = []
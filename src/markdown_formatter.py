@@ -0,0 +1,270 @@
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# Opening or closing code fence, with an optional info string such as a language name
+_FENCE_TOKEN_RE = re.compile(r'[ \t]*```\w*')
+
+# Whitespace before a run-on sub-heading, e.g. "...dosing. ## Contraindications"
+_MIDLINE_HEADER_RE = re.compile(r'[ \t]+(?=#{2,6} )')
+
+# Characters that may begin a marker spanning a chunk boundary; held back until disambiguated
+_HOLD_CHARS = "`# \t"
+
+class StreamingMarkdownFormatter:
+    """
+    Incrementally normalizes markdown as it streams in.
+
+    Text is processed once, left to right, and emitted as soon as it can no
+    longer change. Lines are classified as they start (header, list item,
+    code fence, code, text, blank) and the following rules are applied:
+
+    - headers are preceded by a blank line, and run-on ``## `` sub-headings
+      are moved onto their own line
+    - a blank line is inserted between a list and following paragraph text
+    - code fences always sit on their own line, and text inside a fence is
+      passed through untouched
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._in_fence = False
+        self._line_kind: Optional[str] = None
+        self._prev_kind: Optional[str] = None
+        self._line_len = 0
+        self._last_char = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add streamed text.
+
+        Args:
+            chunk: The next piece of the response
+
+        Returns:
+            Newly finalized markdown to append to the output so far
+        """
+        self._pending += chunk.replace("\r", "")
+        return self._drain(final=False)
+
+    def flush(self) -> str:
+        """
+        Finish the stream, emitting held-back text and closing any open code fence.
+
+        Returns:
+            The remaining markdown
+        """
+        out = self._drain(final=True)
+        if self._in_fence:
+            out += "\n```" if self._line_len else "```"
+            self._in_fence = False
+        self._line_kind = None
+        return out
+
+    def _drain(self, final: bool) -> str:
+        """Emit as much pending text as can be finalized."""
+        out: List[str] = []
+        pending = self._pending
+        pos = 0
+        while pos < len(pending):
+            newline = pending.find("\n", pos)
+
+            if self._line_kind is None:
+                head = pending[pos:] if newline < 0 else pending[pos:newline]
+                kind = self._classify(head, complete=newline >= 0 or final)
+                if kind is None:
+                    break
+                pos = self._start_line(kind, pending, pos, out)
+                continue
+
+            if newline >= 0:
+                segment = pending[pos:newline]
+            elif final:
+                segment = pending[pos:]
+            else:
+                segment = pending[pos:].rstrip(_HOLD_CHARS)
+                if not segment:
+                    break
+
+            consumed = self._emit_segment(segment, out)
+            pos += consumed
+            if self._line_kind is not None and consumed == len(segment) and newline >= 0:
+                pos += 1
+                self._end_line(out)
+
+        self._pending = pending[pos:]
+        return "".join(out)
+
+    def _classify(self, text: str, complete: bool) -> Optional[str]:
+        """
+        Classify the start of a line.
+
+        Args:
+            text: The line so far, without its newline
+            complete: Whether the whole line is known
+
+        Returns:
+            The line kind, or None if more text is needed to decide
+        """
+        stripped = text.lstrip(" \t")
+
+        if self._in_fence:
+            if stripped.startswith("```"):
+                return self._classify_fence(stripped, complete)
+            if not complete and "```".startswith(stripped):
+                return None
+            return "code"
+
+        if not stripped:
+            return "blank" if complete else None
+
+        first = stripped[0]
+        if first == "`":
+            if stripped.startswith("```"):
+                return self._classify_fence(stripped, complete)
+            if not complete and "```".startswith(stripped):
+                return None
+            return "text"
+
+        if first == "#":
+            hashes = len(stripped) - len(stripped.lstrip("#"))
+            if hashes == len(stripped):
+                if not complete:
+                    return None
+                return "header" if hashes <= 6 else "text"
+            return "header" if hashes <= 6 and stripped[hashes] in " \t" else "text"
+
+        if first in "-*+":
+            if len(stripped) == 1:
+                return None if not complete else "text"
+            return "list" if stripped[1] in " \t" else "text"
+
+        if first.isdigit():
+            digits = len(stripped) - len(stripped.lstrip("0123456789"))
+            if len(stripped) <= digits + 1:
+                return None if not complete else "text"
+            if stripped[digits] == "." and stripped[digits + 1] in " \t":
+                return "list"
+            return "text"
+
+        if len(text) - len(stripped) >= 2:
+            return "indent"
+        return "text"
+
+    @staticmethod
+    def _classify_fence(stripped: str, complete: bool) -> Optional[str]:
+        """Return "fence" once the fence's info string is complete."""
+        token = _FENCE_TOKEN_RE.match(stripped)
+        if token is None:
+            return "text"
+        if token.end() == len(stripped) and not complete:
+            return None
+        return "fence"
+
+    def _start_line(self, kind: str, pending: str, pos: int, out: List[str]) -> int:
+        """
+        Emit any separator required before a line of the given kind and begin it.
+
+        Args:
+            kind: The line kind from _classify
+            pending: Pending input text
+            pos: Position of the line start in pending
+            out: Output buffer
+
+        Returns:
+            Position in pending after anything consumed
+        """
+        prev = self._prev_kind
+        if kind == "header" and prev not in (None, "blank"):
+            out.append("\n")
+        elif kind == "text" and prev == "list":
+            out.append("\n")
+
+        self._line_kind = kind
+        token = _FENCE_TOKEN_RE.match(pending, pos) if kind == "fence" else None
+        if token is None:
+            return pos
+
+        out.append(token.group(0))
+        self._in_fence = not self._in_fence
+        # Anything after the fence token belongs on the next line
+        self._line_kind = "fence_tail"
+        self._line_len = token.end() - pos
+        self._last_char = "`"
+        return token.end()
+
+    def _emit_segment(self, segment: str, out: List[str]) -> int:
+        """
+        Emit part of the current line, splitting it where a fence or run-on header begins.
+
+        Args:
+            segment: Text from the current line, without a newline
+            out: Output buffer
+
+        Returns:
+            Number of characters of the segment consumed
+        """
+        kind = self._line_kind
+
+        if kind == "fence_tail":
+            stripped = segment.lstrip(" \t")
+            if stripped:
+                self._end_line(out)
+            return len(segment) - len(stripped)
+
+        if kind == "blank":
+            return len(segment)
+
+        split_at = segment.find("```")
+        resume_at = split_at
+        if kind != "code":
+            for match in _MIDLINE_HEADER_RE.finditer(segment, 0, split_at if split_at >= 0 else len(segment)):
+                before = segment[match.start() - 1] if match.start() > 0 else self._last_char
+                if before and not before.isspace():
+                    split_at, resume_at = match.start(), match.end()
+                    break
+
+        if split_at < 0:
+            self._write(segment, out)
+            return len(segment)
+
+        self._write(segment[:split_at], out)
+        if self._line_len:
+            self._end_line(out)
+        else:
+            self._line_kind = None
+        return resume_at
+
+    def _write(self, text: str, out: List[str]) -> None:
+        """Append text to the current line."""
+        if text:
+            out.append(text)
+            self._line_len += len(text)
+            self._last_char = text[-1]
+
+    def _end_line(self, out: List[str]) -> None:
+        """Terminate the current line; any remaining text is classified as a new line."""
+        out.append("\n")
+        kind = self._line_kind
+        self._prev_kind = "fence" if kind == "fence_tail" else kind
+        self._line_kind = None
+        self._line_len = 0
+        self._last_char = ""
+
+def format_markdown_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Normalize a stream of markdown chunks.
+
+    Args:
+        chunks: Text deltas in arrival order
+
+    Yields:
+        Normalized markdown deltas
+    """
+    formatter = StreamingMarkdownFormatter()
+    for chunk in chunks:
+        formatted = formatter.feed(chunk)
+        if formatted:
+            yield formatted
+    tail = formatter.flush()
+    if tail:
+        yield tail
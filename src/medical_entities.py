@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Pattern
+import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TERMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Entity types in match priority order, each loaded from <type>s.txt in the terms directory
+ENTITY_TYPES = ("medication", "condition", "procedure")
+
+# Drug classes recognizable by suffix even when the name is not in the term list
+MEDICATION_SUFFIX_PATTERN = r'[a-z]*(?:mab|nib|zumab|ximab|limus|prazole|sartan|statin)'
+
+def load_terms(path: str) -> List[str]:
+    """
+    Load a term list file.
+
+    Args:
+        path: Path to a UTF-8 file with one term per line; blank lines and # comments are ignored
+
+    Returns:
+        Lowercased terms
+    """
+    terms = []
+    with open(path, encoding="utf-8") as term_file:
+        for line in term_file:
+            term = line.strip()
+            if term and not term.startswith("#"):
+                terms.append(term.lower())
+    return terms
+
+def build_trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Compile a list of literal terms into a single prefix-trie regular expression.
+
+    Shared prefixes are matched once, so the regex engine does work
+    proportional to the text rather than to the number of terms.
+
+    Args:
+        terms: Literal terms to match
+
+    Returns:
+        A regex pattern (without word boundaries) matching any of the terms
+    """
+    trie: Dict[str, Any] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_node_pattern(trie)
+
+def _trie_node_pattern(node: Dict[str, Any]) -> str:
+    """Return the regex for the suffixes below a trie node."""
+    branches = []
+    leaves = []
+    for char in sorted(key for key in node if key):
+        suffix = _trie_node_pattern(node[char])
+        if suffix:
+            branches.append(re.escape(char) + suffix)
+        else:
+            leaves.append(re.escape(char))
+
+    if leaves:
+        branches.append(leaves[0] if len(leaves) == 1 else "[" + "".join(leaves) + "]")
+    if not branches:
+        return ""
+
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+class MedicalEntityExtractor:
+    """Extracts medications, conditions and procedures from text in a single regex pass."""
+
+    def __init__(self, terms_dir: Optional[str] = None):
+        """
+        Initialize the extractor and compile its combined pattern.
+
+        Args:
+            terms_dir: Directory holding medications.txt, conditions.txt and procedures.txt
+        """
+        self.terms_dir = terms_dir or config.ENTITY_TERMS_DIR or DEFAULT_TERMS_DIR
+        self.pattern = self._compile()
+
+    def _compile(self) -> Pattern[str]:
+        """
+        Build one alternation with a named group per entity type.
+
+        Returns:
+            The compiled pattern
+        """
+        groups = []
+        for entity_type in ENTITY_TYPES:
+            path = os.path.join(self.terms_dir, f"{entity_type}s.txt")
+            try:
+                terms = load_terms(path)
+            except FileNotFoundError:
+                logger.warning(f"No term list for {entity_type} at {path}")
+                terms = []
+
+            alternatives = [build_trie_pattern(terms)] if terms else []
+            if entity_type == "medication":
+                alternatives.append(MEDICATION_SUFFIX_PATTERN)
+            if alternatives:
+                groups.append(f"(?P<{entity_type}>{'|'.join(alternatives)})")
+
+        return re.compile(r'\b(?:' + "|".join(groups) + r')\b', re.IGNORECASE)
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Extract all entities from text in one scan.
+
+        Args:
+            text: The text to parse for medical entities
+
+        Returns:
+            Entities in order of appearance, each with type, text, start and end
+        """
+        return [
+            {
+                "type": match.lastgroup,
+                "text": match.group(0),
+                "start": match.start(),
+                "end": match.end()
+            }
+            for match in self.pattern.finditer(text)
+        ]
+
+    def extract_batch(self, texts: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Extract entities from many texts with the same compiled pattern.
+
+        Args:
+            texts: Texts to parse
+
+        Returns:
+            One entity list per input text, in input order
+        """
+        extract = self.extract
+        return [extract(text) for text in texts]
+
+_default_extractor: Optional[MedicalEntityExtractor] = None
+_default_lock = threading.Lock()
+
+def get_default_extractor() -> MedicalEntityExtractor:
+    """
+    Return the process-wide extractor, compiling it on first use.
+
+    Returns:
+        The shared MedicalEntityExtractor
+    """
+    global _default_extractor
+    if _default_extractor is None:
+        with _default_lock:
+            if _default_extractor is None:
+                _default_extractor = MedicalEntityExtractor()
+    return _default_extractor
@@ -0,0 +1,437 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    """Render a Prometheus label set such as {stage="http_total",le="0.5"}."""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+class _Metric:
+    """Base class holding a metric's name, help text and label names."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations with quantile estimates."""
+
+    metric_type = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation within buckets.
+
+        Args:
+            q: Quantile between 0 and 1
+            **labels: Label values identifying the series
+
+        Returns:
+            The estimated value, or None if nothing was observed
+        """
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if not series or not series[2]:
+                return None
+            counts, total = list(series[0]), series[2]
+
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total_sum, total_count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+                lines.append(f"{self.name}_count{labels} {total_count}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    "clinical_chatbot_stage_seconds",
+    "Time spent in each stage of the request path",
+    ("stage",)
+)
+REQUEST_SECONDS = METRICS.histogram(
+    "clinical_chatbot_request_seconds",
+    "End-to-end time to answer a chat turn",
+    ("mode",)
+)
+PROMPT_CHARS = METRICS.histogram(
+    "clinical_chatbot_prompt_chars",
+    "Size of prompts sent upstream in characters",
+    buckets=SIZE_BUCKETS
+)
+RESPONSE_CHARS = METRICS.histogram(
+    "clinical_chatbot_response_chars",
+    "Size of model responses in characters",
+    buckets=SIZE_BUCKETS
+)
+CACHE_LOOKUPS = METRICS.counter(
+    "clinical_chatbot_cache_lookups_total",
+    "Response cache lookups by result",
+    ("result",)
+)
+SEMANTIC_CACHE_LOOKUPS = METRICS.counter(
+    "clinical_chatbot_semantic_cache_lookups_total",
+    "Semantic answer cache lookups by result",
+    ("result",)
+)
+RETRIES = METRICS.counter(
+    "clinical_chatbot_retries_total",
+    "Upstream request retries by reason",
+    ("reason",)
+)
+ERRORS = METRICS.counter(
+    "clinical_chatbot_errors_total",
+    "Failed chat turns by stage",
+    ("stage",)
+)
+CONCURRENCY_LIMIT = METRICS.gauge(
+    "clinical_chatbot_concurrency_limit",
+    "Current adaptive limit on upstream requests in flight",
+    ("limiter",)
+)
+IN_FLIGHT = METRICS.gauge(
+    "clinical_chatbot_in_flight_requests",
+    "Upstream requests currently in flight",
+    ("limiter",)
+)
+RATE_LIMIT_TIMEOUTS = METRICS.counter(
+    "clinical_chatbot_rate_limit_timeouts_total",
+    "Requests that gave up waiting for upstream capacity"
+)
+ENDPOINT_REQUESTS = METRICS.counter(
+    "clinical_chatbot_endpoint_requests_total",
+    "Upstream attempts by serving endpoint and outcome",
+    ("endpoint", "outcome")
+)
+CIRCUIT_OPEN = METRICS.gauge(
+    "clinical_chatbot_circuit_open",
+    "1 while an endpoint's circuit breaker is open",
+    ("endpoint",)
+)
+HEDGED_REQUESTS = METRICS.counter(
+    "clinical_chatbot_hedged_requests_total",
+    "Duplicate requests sent after the hedge deadline, by which request answered first",
+    ("winner",)
+)
+SCHEDULER_QUEUE_DEPTH = METRICS.gauge(
+    "clinical_chatbot_scheduler_queue_depth",
+    "Requests waiting in the scheduler queue by priority class",
+    ("scheduler", "priority")
+)
+SCHEDULER_RUNNING = METRICS.gauge(
+    "clinical_chatbot_scheduler_running",
+    "Requests holding a scheduler worker slot by priority class",
+    ("scheduler", "priority")
+)
+SCHEDULER_WAIT_SECONDS = METRICS.histogram(
+    "clinical_chatbot_scheduler_wait_seconds",
+    "Time requests waited in the scheduler queue by priority class",
+    ("priority",)
+)
+SCHEDULER_DROPPED = METRICS.counter(
+    "clinical_chatbot_scheduler_dropped_total",
+    "Queued requests dropped unrun, by priority class and reason (deadline or cancelled)",
+    ("priority", "reason")
+)
+FOLLOWUP_PREFETCHES = METRICS.counter(
+    "clinical_chatbot_followup_prefetches_total",
+    "Speculatively answered follow-up questions by outcome (started, used or discarded)",
+    ("outcome",)
+)
+
+class RequestTrace:
+    """Timings and sizes recorded for a single chat turn."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, float] = {}
+
+    def add_span(self, stage: str, seconds: float) -> None:
+        self.spans.append((stage, seconds))
+
+    def set(self, name: str, value: float) -> None:
+        self.attributes[name] = value
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Return stage timings in milliseconds together with recorded attributes.
+
+        Returns:
+            A flat mapping suitable for display
+        """
+        result = {f"{stage}_ms": round(seconds * 1000, 2) for stage, seconds in self.spans}
+        result.update(self.attributes)
+        return result
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+def current_trace() -> Optional[RequestTrace]:
+    """Return the trace for the chat turn being processed, if any."""
+    return _current_trace.get()
+
+@contextmanager
+def trace_request(trace: Optional[RequestTrace] = None) -> Iterator[RequestTrace]:
+    """
+    Make a trace current for the enclosed block.
+
+    Generators should re-enter this around each step rather than holding it
+    across a yield, so the trace never leaks into the consumer's context.
+
+    Args:
+        trace: An existing trace to resume; a new one is created if omitted
+
+    Yields:
+        The active RequestTrace
+    """
+    trace = trace or RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """
+    Record the duration of a request-path stage in the histogram and the active trace.
+
+    Args:
+        stage: Stage name, e.g. "context_build" or "http_total"
+        seconds: Duration in seconds
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, seconds)
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a request-path stage.
+
+    Args:
+        stage: Stage name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def stage_percentiles(quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Summarize stage latency percentiles in milliseconds.
+
+    Args:
+        quantiles: Quantiles to estimate
+
+    Returns:
+        A mapping of stage name to {"p50": ..., "p95": ..., "p99": ...}
+    """
+    summary: Dict[str, Dict[str, Optional[float]]] = {}
+    for (stage,) in list(STAGE_SECONDS._series):
+        summary[stage] = {}
+        for q in quantiles:
+            value = STAGE_SECONDS.quantile(q, stage=stage)
+            summary[stage][f"p{int(q * 100)}"] = None if value is None else round(value * 1000, 2)
+    return summary
+
+_server: Optional["ThreadingHTTPServer"] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: MetricsRegistry = METRICS) -> "ThreadingHTTPServer":
+    """
+    Serve /metrics in Prometheus text format from a daemon thread.
+
+    Only one server is started per process; later calls return it.
+
+    Args:
+        port: Port to listen on; 0 picks a free port
+        host: Interface to bind, local-only by default
+        registry: Metrics to expose
+
+    Returns:
+        The running server
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{_server.server_address[1]}/metrics")
+        return _server
@@ -0,0 +1,323 @@
+import logging
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Placeholders look like [NAME_1]; anything longer than this after a "[" cannot be one
+MAX_PLACEHOLDER_LENGTH = 24
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Z]+)_(\d+)\]")
+
+# Control characters other than tab and newline, and runs of horizontal whitespace
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b-\x1f\x7f-\x9f\u200b-\u200f\u2028\u2029\ufeff]")
+_HORIZONTAL_SPACE = re.compile(r"[^\S\n]+")
+
+_MONTHS = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+_NAME = r"[A-Z](?:[a-z]+|'[A-Z][a-z]+)(?:-[A-Z][a-z]+)?"
+
+class Detector:
+    """
+    A kind of identifier to redact, described by a regular expression.
+
+    Matches can only start at the beginning of a word. If the pattern has a
+    group named "value", only that group is replaced and the rest of the
+    match (such as a "Patient" prefix) is kept.
+    """
+
+    def __init__(self,
+                 label: str,
+                 pattern: str,
+                 flags: int = 0,
+                 remember: Union[bool, Callable[[str], bool]] = False):
+        """
+        Initialize the detector.
+
+        Args:
+            label: Upper-case placeholder label, e.g. "PHONE"
+            pattern: Regular expression matching the identifier
+            flags: re flags applied to this pattern only (IGNORECASE is supported)
+            remember: Whether a found value is also redacted wherever it appears
+                later in the conversation without the context the pattern needs;
+                a function of the value to decide per value. Only safe for
+                values that cannot be ordinary words.
+        """
+        if not re.fullmatch(r"[A-Z]+", label):
+            raise ValueError(f"Detector label must be upper-case letters: {label!r}")
+        self.label = label
+        self.pattern = pattern
+        self.flags = flags
+        self.remember = remember
+        re.compile(pattern, flags)
+
+    def remembers(self, value: str) -> bool:
+        """Return whether later bare mentions of a found value should be redacted too."""
+        return self.remember(value) if callable(self.remember) else bool(self.remember)
+
+def is_full_name(value: str) -> bool:
+    """
+    Return whether a value looks like a full proper-noun name, such as "John Smith".
+
+    Single words found after "Dr." or "Patient" may be ordinary words ("Dr. May",
+    "Pt Denies"), so only names of two or more capitalised words are remembered.
+    """
+    tokens = value.split()
+    return len(tokens) >= 2 and all(re.fullmatch(_NAME, token) for token in tokens)
+
+DEFAULT_DETECTORS: Tuple[Detector, ...] = (
+    Detector("EMAIL", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b", remember=True),
+    Detector("SSN", r"\b\d{3}-\d{2}-\d{4}\b", remember=True),
+    Detector("MRN", r"\b(?:MRN|medical record(?: number| no\.?)?)\s*(?:[:#]|is)?\s*(?P<value>[A-Z]{0,3}\d{5,12})\b",
+             re.IGNORECASE, remember=True),
+    Detector("PHONE", r"(?<![\w-])(?:\+?1[-.\s]?)?(?:\(\d{3}\)\s?|\d{3}[-.\s])\d{3}[-.\s]\d{4}\b",
+             remember=True),
+    Detector("DATE", r"\b(?:\d{1,2}[/-]\d{1,2}[/-](?:\d{4}|\d{2})|\d{4}-\d{2}-\d{2}"
+                     rf"|{_MONTHS}\.? \d{{1,2}}(?:st|nd|rd|th)?,? \d{{4}}|\d{{1,2}} {_MONTHS}\.? \d{{4}})\b"),
+    Detector("NAME", rf"\b(?:(?:Mr|Mrs|Ms|Miss|Dr)\.?|(?i:patient|pt\.?|named|name is|name:))\s+"
+                     rf"(?P<value>{_NAME}(?:\s+{_NAME})?)", remember=is_full_name),
+)
+
+def normalize_input(text: str) -> str:
+    """
+    Normalize user input before it is redacted and sanitized.
+
+    Compatibility forms (full-width digits, ligatures) are folded so
+    detectors see plain ASCII digits, invisible control characters are
+    removed and runs of spaces collapsed.
+
+    Args:
+        text: Raw user input
+
+    Returns:
+        Normalized text
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    text = _CONTROL_CHARS.sub("", text)
+    return _HORIZONTAL_SPACE.sub(" ", text).strip()
+
+class RedactionMap:
+    """
+    Reversible mapping between identifiers and placeholders for one conversation.
+
+    The same identifier always gets the same placeholder, so the model sees a
+    consistent conversation, and answers can be re-identified locally.
+    """
+
+    def __init__(self):
+        self._placeholders: Dict[Tuple[str, str], str] = {}
+        self._originals: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}
+        # Values re-matched in later text, exactly as found (whitespace collapsed)
+        self._remembered: Dict[str, str] = {}
+        self._known: Optional[Tuple["re.Pattern", Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._originals)
+
+    def placeholder(self, label: str, value: str, remember: bool = False) -> str:
+        """
+        Return the placeholder for an identifier, allocating one on first sight.
+
+        Args:
+            label: Detector label
+            value: The identifier as found in the text
+            remember: Also redact later mentions of this exact value (see redact_known)
+
+        Returns:
+            A placeholder such as "[NAME_1]"
+        """
+        key = (label, " ".join(value.split()).lower())
+        with self._lock:
+            placeholder = self._placeholders.get(key)
+            if placeholder is None:
+                self._counts[label] = count = self._counts.get(label, 0) + 1
+                placeholder = f"[{label}_{count}]"
+                self._placeholders[key] = placeholder
+                self._originals[placeholder] = value
+            exact = " ".join(value.split())
+            if remember and exact not in self._remembered:
+                self._remembered[exact] = placeholder
+                self._known = None
+            return placeholder
+
+    def redact_known(self, text: str) -> str:
+        """
+        Replace later mentions of remembered identifiers.
+
+        Detectors rely on context such as "Patient" or "MRN:"; once a value from
+        a high-precision detector or a full name has been found that way, a bare
+        mention of it in a later turn is redacted too. Matching is
+        case-sensitive, so a remembered "John Smith" never masks "john" or "smith".
+
+        Args:
+            text: Text to redact
+
+        Returns:
+            The text with remembered identifiers replaced by their placeholders
+        """
+        with self._lock:
+            if not self._remembered:
+                return text
+            if self._known is None:
+                lookup = dict(self._remembered)
+                alternatives = "|".join(r"\s+".join(map(re.escape, value.split()))
+                                        for value in sorted(lookup, key=len, reverse=True))
+                self._known = (re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)"), lookup)
+            pattern, lookup = self._known
+        return pattern.sub(lambda match: lookup[" ".join(match.group(0).split())], text)
+
+    def restore(self, text: str) -> str:
+        """
+        Replace known placeholders with the identifiers they stand for.
+
+        Args:
+            text: Text produced from redacted input, such as a model answer
+
+        Returns:
+            The re-identified text; unknown placeholders are left unchanged
+        """
+        if "[" not in text or not self._originals:
+            return text
+        return PLACEHOLDER_PATTERN.sub(lambda match: self._originals.get(match.group(0), match.group(0)), text)
+
+    def restore_stream(self, deltas: Iterable[str]) -> Iterator[str]:
+        """
+        Re-identify streamed text, holding back a placeholder split across deltas.
+
+        Args:
+            deltas: Text deltas in arrival order
+
+        Yields:
+            Re-identified deltas
+        """
+        pending = ""
+        for delta in deltas:
+            pending += delta
+            cut = pending.rfind("[")
+            if cut != -1 and "]" not in pending[cut:] and len(pending) - cut < MAX_PLACEHOLDER_LENGTH:
+                ready, pending = pending[:cut], pending[cut:]
+            else:
+                ready, pending = pending, ""
+            if ready:
+                yield self.restore(ready)
+        if pending:
+            yield self.restore(pending)
+
+class PHIRedactor:
+    """
+    Replaces protected health information with placeholders in a single regex pass.
+
+    All detectors are compiled into one alternation, so text is scanned once
+    however many detectors there are, and text without identifiers comes
+    back unchanged from that scan.
+    """
+
+    def __init__(self, detectors: Optional[Sequence[Detector]] = None):
+        """
+        Initialize the redactor.
+
+        Args:
+            detectors: Identifier kinds to redact, earlier ones winning on overlap;
+                DEFAULT_DETECTORS if omitted
+        """
+        self.detectors = tuple(DEFAULT_DETECTORS if detectors is None else detectors)
+        alternatives = []
+        self._labels: Dict[str, Tuple[Detector, Optional[str]]] = {}
+        for index, detector in enumerate(self.detectors):
+            group = f"d{index}"
+            pattern = detector.pattern
+            value_group = None
+            if "(?P<value>" in pattern:
+                value_group = f"v{index}"
+                pattern = pattern.replace("(?P<value>", f"(?P<{value_group}>")
+            if detector.flags & re.IGNORECASE:
+                pattern = f"(?i:{pattern})"
+            alternatives.append(f"(?P<{group}>{pattern})")
+            self._labels[group] = (detector, value_group)
+        # Rejecting positions inside words up front halves the scan time
+        self._pattern = re.compile(f"(?<!\\w)(?:{'|'.join(alternatives)})") if alternatives else None
+
+    def contains_phi(self, text: str) -> bool:
+        """Return whether any detector matches the text."""
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+    def redact(self, text: str, mapping: Optional[RedactionMap] = None) -> Tuple[str, RedactionMap]:
+        """
+        Replace identifiers in text with placeholders.
+
+        Args:
+            text: Text to redact
+            mapping: Mapping to extend, shared across a conversation; a new one if omitted
+
+        Returns:
+            (redacted text, mapping able to restore it)
+        """
+        mapping = RedactionMap() if mapping is None else mapping
+        if self._pattern is None:
+            return mapping.redact_known(text), mapping
+
+        def replace(match: "re.Match") -> str:
+            if match.lastgroup is None:
+                return match.group(0)
+            detector, value_group = self._labels[match.lastgroup]
+            if value_group is None:
+                value = match.group(0)
+                return mapping.placeholder(detector.label, value, detector.remembers(value))
+            start, end = match.span(value_group)
+            whole_start, whole_end = match.span()
+            source = match.string
+            value = source[start:end]
+            return (source[whole_start:start] + mapping.placeholder(detector.label, value, detector.remembers(value))
+                    + source[end:whole_end])
+
+        return mapping.redact_known(self._pattern.sub(replace, text)), mapping
+
+    def redact_batch(self, texts: Iterable[str]) -> List[Tuple[str, RedactionMap]]:
+        """
+        Redact many independent texts, such as a bulk question file.
+
+        Args:
+            texts: Texts to redact; each gets its own mapping
+
+        Returns:
+            One (redacted text, mapping) pair per text
+        """
+        return [self.redact(text) for text in texts]
+
+def prepare_input(text: str,
+                  redactor: Optional[PHIRedactor] = None,
+                  mapping: Optional[RedactionMap] = None) -> str:
+    """
+    Run user input through the prompt pipeline: normalize, redact, then sanitize.
+
+    Redaction comes before sanitization because sanitizing strips characters
+    such as "@" that detectors rely on; placeholders survive sanitizing.
+
+    Args:
+        text: Raw user input
+        redactor: Redactor to apply; redaction is skipped if omitted
+        mapping: Conversation mapping that receives new placeholders
+
+    Returns:
+        Text safe to send upstream
+    """
+    from src.utils import sanitize_input
+
+    text = normalize_input(text)
+    if redactor is not None:
+        text, _ = redactor.redact(text, mapping)
+    return sanitize_input(text)
+
+_default_redactor: Optional[PHIRedactor] = None
+_default_redactor_lock = threading.Lock()
+
+def get_default_redactor() -> PHIRedactor:
+    """Return the process-wide redactor using the default detectors."""
+    global _default_redactor
+    with _default_redactor_lock:
+        if _default_redactor is None:
+            _default_redactor = PHIRedactor()
+        return _default_redactor
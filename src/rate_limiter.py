@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, NoReturn, Optional
+from src.metrics import CONCURRENCY_LIMIT, IN_FLIGHT, RATE_LIMIT_TIMEOUTS, observe_stage
+import config
+
+logger = logging.getLogger(__name__)
+
+# How often an async caller re-checks a full limiter; sync callers are woken directly
+ASYNC_POLL_INTERVAL = 0.01
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than the queue timeout for capacity."""
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the sustained request rate while allowing bursts."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Initialize the bucket, starting full.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity; defaults to one second's worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add tokens for the time elapsed since the last update. Caller holds the lock."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one will be available
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take a token, waiting for one if necessary.
+
+        Args:
+            timeout: Maximum seconds to wait; None waits indefinitely
+
+        Returns:
+            True if a token was taken, False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        sleeper = threading.Event()
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            sleeper.wait(wait)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on the number of requests in flight.
+
+    The limit grows by about one per window of successful requests and is
+    cut multiplicatively when the upstream signals overload (429/5xx) or
+    latency rises well above its smoothed baseline. Only one cut is applied
+    per window: requests that started before the last cut cannot cut again,
+    so a burst of simultaneous 429s halves the limit once rather than
+    collapsing it.
+    """
+
+    def __init__(self,
+                 initial_limit: Optional[int] = None,
+                 min_limit: Optional[int] = None,
+                 max_limit: Optional[int] = None,
+                 backoff_ratio: float = 0.5,
+                 latency_tolerance: Optional[float] = None,
+                 name: str = ""):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Starting concurrency limit
+            min_limit: Lower bound of the limit
+            max_limit: Upper bound of the limit
+            backoff_ratio: Factor applied to the limit on overload
+            latency_tolerance: Latency above this multiple of the baseline counts as overload
+            name: Label used for the exported gauges
+        """
+        self.min_limit = max(1, min_limit or config.ADAPTIVE_CONCURRENCY_MIN)
+        self.max_limit = max(self.min_limit, max_limit or config.ADAPTIVE_CONCURRENCY_MAX)
+        initial = initial_limit or config.ADAPTIVE_CONCURRENCY_INITIAL
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance or config.ADAPTIVE_LATENCY_TOLERANCE
+        self.name = name
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        """The current whole-number concurrency limit."""
+        return int(self._limit)
+
+    def try_acquire(self) -> Optional[float]:
+        """
+        Take a slot if one is free.
+
+        Returns:
+            The admission time to pass to release, or None if the limiter is full
+        """
+        with self._condition:
+            if self.in_flight >= int(self._limit):
+                return None
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, limiter=self.name)
+            return time.monotonic()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Take a slot, waiting for one to be released if necessary.
+
+        Args:
+            timeout: Maximum seconds to wait; None waits indefinitely
+
+        Returns:
+            The admission time to pass to release, or None if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self._limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, limiter=self.name)
+            return time.monotonic()
+
+    def release(self, admitted_at: float, overloaded: bool = False,
+                latency: Optional[float] = None) -> None:
+        """
+        Return a slot and adjust the limit from the request's outcome.
+
+        Args:
+            admitted_at: Value returned by acquire or try_acquire
+            overloaded: Whether the upstream signalled overload (429 or 5xx)
+            latency: Upstream latency of a completed request, in seconds
+        """
+        with self._condition:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight, limiter=self.name)
+
+            spiked = False
+            if latency is not None and not overloaded:
+                baseline = self.baseline_latency
+                spiked = baseline is not None and latency > baseline * self.latency_tolerance
+                # Slow-moving average, so a lasting shift in latency becomes the new baseline
+                self.baseline_latency = latency if baseline is None else 0.9 * baseline + 0.1 * latency
+
+            if overloaded or spiked:
+                if admitted_at >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                    self._last_decrease = time.monotonic()
+                    logger.info(f"Concurrency limit reduced to {self.limit}"
+                                f" ({'overload' if overloaded else 'latency spike'})")
+            elif latency is not None:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+            self._publish()
+            self._condition.notify_all()
+
+    def _publish(self) -> None:
+        CONCURRENCY_LIMIT.set(self.limit, limiter=self.name)
+
+class RateLimiter:
+    """Admission control combining a token bucket with an adaptive concurrency limit."""
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+                 queue_timeout: Optional[float] = None,
+                 name: str = ""):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate: Sustained requests per second; 0 disables the token bucket
+            burst: Requests allowed in a burst above the sustained rate
+            concurrency: Concurrency limiter; built from config if omitted
+            queue_timeout: Maximum seconds a request waits for capacity
+            name: Label used for the exported gauges
+        """
+        rate = config.RATE_LIMIT_RPS if rate is None else rate
+        self.bucket = TokenBucket(rate, burst or config.RATE_LIMIT_BURST) if rate > 0 else None
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter(name=name)
+        self.queue_timeout = config.RATE_LIMIT_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+
+    def acquire(self) -> float:
+        """
+        Wait for a concurrency slot and a token.
+
+        Returns:
+            The admission time to pass to release
+
+        Raises:
+            RateLimitTimeout: If capacity did not free up within the queue timeout
+        """
+        started = time.monotonic()
+        admitted_at = self.concurrency.acquire(self.queue_timeout)
+        if admitted_at is None:
+            self._timed_out()
+        if self.bucket is not None:
+            remaining = self.queue_timeout - (time.monotonic() - started)
+            if not self.bucket.acquire(max(0.0, remaining)):
+                self.concurrency.release(admitted_at)
+                self._timed_out()
+        observe_stage("queue_wait", time.monotonic() - started)
+        return admitted_at
+
+    async def acquire_async(self) -> float:
+        """
+        Wait for a concurrency slot and a token without blocking the event loop.
+
+        Returns:
+            The admission time to pass to release
+
+        Raises:
+            RateLimitTimeout: If capacity did not free up within the queue timeout
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        admitted_at = self.concurrency.try_acquire()
+        while admitted_at is None:
+            if time.monotonic() >= deadline:
+                self._timed_out()
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+            admitted_at = self.concurrency.try_acquire()
+        if self.bucket is not None:
+            try:
+                wait = self.bucket.try_acquire()
+                while wait:
+                    if time.monotonic() + wait > deadline:
+                        self._timed_out()
+                    await asyncio.sleep(wait)
+                    wait = self.bucket.try_acquire()
+            except BaseException:
+                # Timed out or cancelled while holding a slot
+                self.concurrency.release(admitted_at)
+                raise
+        observe_stage("queue_wait", time.monotonic() - started)
+        return admitted_at
+
+    def release(self, admitted_at: float, status_code: Optional[int] = None,
+                latency: Optional[float] = None) -> None:
+        """
+        Release capacity taken by acquire.
+
+        Args:
+            admitted_at: Value returned by acquire
+            status_code: HTTP status of the response, or None if no response arrived
+            latency: Time until the response headers arrived, in seconds
+        """
+        overloaded = status_code is not None and (status_code == 429 or status_code >= 500)
+        self.concurrency.release(admitted_at, overloaded=overloaded,
+                                 latency=latency if status_code is not None else None)
+
+    def _timed_out(self) -> NoReturn:
+        RATE_LIMIT_TIMEOUTS.inc()
+        raise RateLimitTimeout(f"No upstream capacity available within {self.queue_timeout:g}s")
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(workspace_url: str, api_key: str) -> RateLimiter:
+    """
+    Return the process-wide limiter for a workspace token, creating it on first use.
+
+    Every client using the same credentials shares one quota upstream, so they
+    share one limiter here regardless of which session or thread created them.
+
+    Args:
+        workspace_url: Databricks workspace URL
+        api_key: Databricks API key
+
+    Returns:
+        The shared RateLimiter
+    """
+    key = f"{workspace_url.rstrip('/')}#{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(name=workspace_url.rstrip('/'))
+        return limiter
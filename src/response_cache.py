@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from src.metrics import CACHE_LOOKUPS
+import config
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of expired rows from the SQLite tier
+PURGE_INTERVAL = 300.0
+
+def make_cache_key(payload: Dict[str, Any], namespace: str = "") -> str:
+    """
+    Build a cache key for a completion request.
+
+    Whitespace in the formatted prompt is normalized so trivially different
+    spacing shares an entry. Case is kept, since it can change a clinical
+    question's meaning ("MS" is not "ms").
+
+    Args:
+        payload: The completion request body
+        namespace: Extra scope for the key, such as the endpoint URL
+
+    Returns:
+        A hex digest identifying the request
+    """
+    prompt = " ".join(payload.get("prompt", "").split())
+    material = json.dumps(
+        [namespace, payload.get("model"), prompt, payload.get("max_tokens"), payload.get("temperature")],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """In-memory LRU cache of completion responses with TTL and an optional SQLite tier."""
+
+    def __init__(self,
+                 max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 db_path: Optional[str] = None,
+                 max_temperature: Optional[float] = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl: Time to live of an entry in seconds
+            db_path: Path of a SQLite database used as a persistent second tier
+            max_temperature: Requests sampled above this temperature bypass the cache
+        """
+        self.max_entries = max_entries or config.RESPONSE_CACHE_SIZE
+        self.ttl = ttl or config.RESPONSE_CACHE_TTL
+        self.max_temperature = (config.RESPONSE_CACHE_MAX_TEMPERATURE
+                                if max_temperature is None else max_temperature)
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.bypassed = 0
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._next_purge = 0.0
+
+        db_path = db_path if db_path is not None else config.RESPONSE_CACHE_PATH
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def is_cacheable(self, payload: Dict[str, Any]) -> bool:
+        """
+        Check whether a request is deterministic enough to be served from cache.
+
+        Args:
+            payload: The completion request body
+
+        Returns:
+            True if the request's temperature is within the configured threshold
+        """
+        cacheable = (payload.get("temperature") or 0) <= self.max_temperature
+        if not cacheable:
+            CACHE_LOOKUPS.inc(result="bypass")
+            with self._lock:
+                self.bypassed += 1
+        return cacheable
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            The cached API response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(result="hit")
+                    return response
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    response = json.loads(row[0])
+                    self._store_in_memory(key, row[1], response)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    CACHE_LOOKUPS.inc(result="disk_hit")
+                    return response
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+    def set(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response in every cache tier.
+
+        Args:
+            key: Cache key from make_cache_key
+            response: The API response to cache
+        """
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_in_memory(key, expires_at, response)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(response), expires_at)
+                    )
+                    now = time.time()
+                    if now >= self._next_purge:
+                        # Expired rows are ignored on read, so sweeping them now and then is enough
+                        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                        self._next_purge = now + PURGE_INTERVAL
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist cached response: {str(e)}")
+
+    def clear(self) -> None:
+        """Remove every entry from all tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+            self.hits = self.misses = self.disk_hits = self.bypassed = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache counters.
+
+        Returns:
+            Hit, miss, disk hit and bypass counts plus the in-memory size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "bypassed": self.bypassed,
+                "size": len(self._memory)
+            }
+
+    def _store_in_memory(self, key: str, expires_at: float, response: Dict[str, Any]) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries. Caller holds the lock."""
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,357 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
+from src.metrics import (SCHEDULER_DROPPED, SCHEDULER_QUEUE_DEPTH, SCHEDULER_RUNNING, SCHEDULER_WAIT_SECONDS,
+                         observe_stage)
+import config
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Request classes, most urgent first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BULK = 2
+
+class DeadlineExceeded(Exception):
+    """Raised when a request waited in the queue past its deadline and was dropped."""
+
+class _Entry:
+    """A queued request: a task for a worker thread, or a caller waiting for a slot."""
+
+    __slots__ = ("priority", "deadline", "enqueued", "future", "call", "admitted")
+
+    def __init__(self, priority: Priority, deadline: Optional[float],
+                 future: Future, call: Optional[Callable[[], Any]] = None):
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = future
+        self.call = call
+        self.admitted = False
+
+class RequestScheduler:
+    """
+    Priority scheduler in front of upstream calls, backed by a bounded worker pool.
+
+    Each priority class may occupy at most its share of the workers, and a
+    freed worker always goes to the most urgent class with queued work, so
+    interactive requests never wait behind more than the capacity reserved for
+    lower classes. Requests are dropped unrun if their deadline passes or
+    their future is cancelled while they are queued.
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 shares: Optional[Mapping[Priority, float]] = None,
+                 name: str = "scheduler"):
+        """
+        Initialize the scheduler.
+
+        Args:
+            workers: Maximum number of requests running at once
+            shares: Fraction of the workers each priority may occupy; unspecified
+                classes use the configured shares (interactive may use all workers)
+            name: Thread name prefix
+        """
+        self.workers = max(1, workers or config.SCHEDULER_WORKERS)
+        configured = {Priority.INTERACTIVE: 1.0,
+                      Priority.BACKGROUND: config.SCHEDULER_BACKGROUND_SHARE,
+                      Priority.BULK: config.SCHEDULER_BULK_SHARE}
+        configured.update(shares or {})
+        self.limits: Dict[Priority, int] = {priority: max(1, min(self.workers, round(self.workers * share)))
+                                            for priority, share in configured.items()}
+        self.name = name
+        self._queues: Dict[Priority, Deque[_Entry]] = {priority: deque() for priority in Priority}
+        self._running: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._ready: Deque[_Entry] = deque()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+        self._cond = threading.Condition()
+
+    def submit(self,
+               fn: Callable[..., Any],
+               *args: Any,
+               priority: Priority = Priority.INTERACTIVE,
+               timeout: Optional[float] = None,
+               **kwargs: Any) -> Future:
+        """
+        Queue a call to run on a worker thread.
+
+        The call runs in a copy of the caller's context, so the current request
+        trace records its stages. Cancelling the future before the call starts
+        drops it from the queue.
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for fn
+            priority: Request class
+            timeout: Seconds the call may wait in the queue before it is dropped
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            A future for the call's result; DeadlineExceeded if it was dropped
+        """
+        context = contextvars.copy_context()
+        future: Future = Future()
+        entry = _Entry(priority, self._deadline(timeout), future,
+                       lambda: context.run(self._run, entry, fn, args, kwargs))
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a scheduler that has been shut down")
+            self._start_workers()
+            self._queues[priority].append(entry)
+            self._admit()
+        return future
+
+    def call(self,
+             fn: Callable[..., Any],
+             *args: Any,
+             priority: Priority = Priority.INTERACTIVE,
+             timeout: Optional[float] = None,
+             **kwargs: Any) -> Any:
+        """
+        Run a call through the queue and wait for its result on the caller's thread.
+
+        If the caller gives up while the call is still queued, because the
+        deadline passed or the caller was interrupted (a Streamlit rerun stops
+        the script when the user navigates away), the call is dropped unrun.
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for fn
+            priority: Request class
+            timeout: Seconds the call may wait in the queue; once it starts it runs to completion
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The call's result
+
+        Raises:
+            DeadlineExceeded: If the call did not start within the timeout
+        """
+        future = self.submit(fn, *args, priority=priority, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise DeadlineExceeded(f"No {priority.name.lower()} capacity available within {timeout:g}s")
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    @contextmanager
+    def slot(self, priority: Priority = Priority.INTERACTIVE, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Occupy a worker slot on the caller's thread, such as while consuming a stream.
+
+        Args:
+            priority: Request class
+            timeout: Seconds to wait for a slot
+
+        Raises:
+            DeadlineExceeded: If no slot became available in time
+            RuntimeError: If the scheduler is shut down before a slot became available
+        """
+        entry = _Entry(priority, self._deadline(timeout), Future())
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            self._queues[priority].append(entry)
+            self._admit()
+            while not entry.admitted:
+                if self._shutdown:
+                    # shutdown() already emptied the queues
+                    raise RuntimeError("Scheduler has been shut down")
+                remaining = None if entry.deadline is None else entry.deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._queues[priority].remove(entry)
+                    self._drop(entry, "deadline")
+                    self._update_gauges(priority)
+                    raise DeadlineExceeded(f"No {priority.name.lower()} slot available within {timeout:g}s")
+                self._cond.wait(remaining)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def executor(self, priority: Priority) -> Executor:
+        """
+        Return a view of this scheduler as an Executor submitting at one priority.
+
+        Args:
+            priority: Request class for every call submitted through the view
+
+        Returns:
+            An Executor whose submit() queues calls here
+        """
+        return _PriorityExecutor(self, priority)
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        """Return the number of queued requests of one class, or of all classes."""
+        with self._cond:
+            if priority is not None:
+                return len(self._queues[priority])
+            return sum(len(queue) for queue in self._queues.values())
+
+    def running(self, priority: Optional[Priority] = None) -> int:
+        """Return the number of running requests of one class, or of all classes."""
+        with self._cond:
+            if priority is not None:
+                return self._running[priority]
+            return sum(self._running.values())
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the workers, cancelling queued calls and failing callers waiting for a slot.
+
+        Args:
+            wait: Wait for running calls to finish
+        """
+        with self._cond:
+            self._shutdown = True
+            for priority, queue in self._queues.items():
+                while queue:
+                    entry = queue.popleft()
+                    if entry.call is not None:
+                        entry.future.cancel()
+                        entry.future.set_running_or_notify_cancel()
+                self._update_gauges(priority)
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def _deadline(timeout: Optional[float]) -> Optional[float]:
+        return None if timeout is None else time.monotonic() + timeout
+
+    def _start_workers(self) -> None:
+        """Start the worker threads on first use. Caller holds the lock."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _admit(self) -> None:
+        """
+        Hand free slots to queued requests, most urgent class first. Caller holds the lock.
+
+        Requests whose deadline has passed, or whose future was cancelled,
+        are dropped here without taking a slot.
+        """
+        now = time.monotonic()
+        admitted = False
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue and sum(self._running.values()) < self.workers \
+                    and self._running[priority] < self.limits[priority]:
+                entry = queue.popleft()
+                if entry.future.cancelled():
+                    self._drop(entry, "cancelled")
+                    continue
+                if entry.deadline is not None and now >= entry.deadline:
+                    self._drop(entry, "deadline")
+                    continue
+                self._running[priority] += 1
+                entry.admitted = True
+                wait = now - entry.enqueued
+                SCHEDULER_WAIT_SECONDS.observe(wait, priority=priority.name.lower())
+                if entry.call is not None:
+                    self._ready.append(entry)
+                admitted = True
+            self._update_gauges(priority)
+        if admitted:
+            self._cond.notify_all()
+
+    def _drop(self, entry: _Entry, reason: str) -> None:
+        """Record a request removed from the queue unrun. Caller holds the lock."""
+        SCHEDULER_DROPPED.inc(priority=entry.priority.name.lower(), reason=reason)
+        if entry.call is not None and reason == "deadline" and entry.future.set_running_or_notify_cancel():
+            entry.future.set_exception(DeadlineExceeded(
+                f"{entry.priority.name.lower()} request waited longer than its deadline"))
+
+    def _release(self, priority: Priority) -> None:
+        with self._cond:
+            self._running[priority] -= 1
+            self._admit()
+
+    def _update_gauges(self, priority: Priority) -> None:
+        label = priority.name.lower()
+        SCHEDULER_QUEUE_DEPTH.set(len(self._queues[priority]), priority=label, scheduler=self.name)
+        SCHEDULER_RUNNING.set(self._running[priority], priority=label, scheduler=self.name)
+
+    def _work(self) -> None:
+        """Worker thread loop: run admitted calls until shut down."""
+        while True:
+            with self._cond:
+                while not self._ready and not self._shutdown:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                entry = self._ready.popleft()
+            call = entry.call
+            if call is None:
+                # Slot entries are handed to their waiting caller, never to a worker
+                continue
+            outcome = None
+            try:
+                outcome = call()
+            finally:
+                # Free the slot before waking the caller, so it never sees its own call as running
+                self._release(entry.priority)
+            if outcome is not None:
+                succeeded, value = outcome
+                if succeeded:
+                    entry.future.set_result(value)
+                else:
+                    entry.future.set_exception(value)
+
+    @staticmethod
+    def _run(entry: _Entry, fn: Callable[..., Any], args: tuple,
+             kwargs: Dict[str, Any]) -> Optional[Tuple[bool, Any]]:
+        """
+        Run an admitted call in the submitter's context.
+
+        Returns:
+            (True, result) or (False, exception), or None if the future was cancelled
+        """
+        if not entry.future.set_running_or_notify_cancel():
+            return None
+        observe_stage("scheduler_wait", time.monotonic() - entry.enqueued)
+        try:
+            return True, fn(*args, **kwargs)
+        except BaseException as e:
+            return False, e
+
+class _PriorityExecutor(Executor):
+    """Executor view of a RequestScheduler that submits at a fixed priority."""
+
+    def __init__(self, scheduler: RequestScheduler, priority: Priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self._scheduler.submit(lambda: fn(*args, **kwargs), priority=self._priority)
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide scheduler shared by chat sessions and background jobs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
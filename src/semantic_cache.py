@@ -0,0 +1,405 @@
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, List, Optional, Protocol, Sequence, Set, Tuple
+import numpy as np
+from src.medical_entities import get_default_extractor
+from src.metrics import SEMANTIC_CACHE_LOOKUPS, time_stage
+import config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning for matching clinical questions
+STOP_WORDS = frozenset("""
+a an and are as at be by can could do does for from how i in is it its me my of on or should
+the to was what when which who why will with would you your about any there their this that
+""".split())
+
+# Common paraphrases rewritten to one canonical phrasing before embedding
+SYNONYMS = tuple((re.compile(pattern), replacement) for pattern, replacement in (
+    (r"\badverse (?:effects?|reactions?)\b", "side effects"),
+    (r"\bdos(?:age|ing|es)\b", "dose"),
+    (r"\bckd\b", "chronic kidney disease"),
+    (r"\bhtn\b", "hypertension"),
+))
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercase a question and rewrite common paraphrases to a canonical form.
+
+    Args:
+        text: The user's question
+
+    Returns:
+        The normalized question
+    """
+    text = text.lower()
+    for pattern, replacement in SYNONYMS:
+        text = pattern.sub(replacement, text)
+    return text
+
+def entity_signature(text: str) -> FrozenSet[str]:
+    """
+    Return the set of medical entities mentioned in a normalized question.
+
+    Two questions can only share an answer when they mention the same
+    medications, conditions and procedures, however similar the rest of
+    their wording is.
+
+    Args:
+        text: A normalized question
+
+    Returns:
+        Lowercased entity texts
+    """
+    return frozenset(entity["text"].lower() for entity in get_default_extractor().extract(text))
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of a fixed dimension."""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+class HashingEmbedder:
+    """
+    Offline embedder using hashed word and character n-gram features.
+
+    Word unigrams capture vocabulary overlap and down-weighted character
+    n-grams make inflections ("effect"/"effects") land close together.
+    Features are hashed with a stable hash into a fixed
+    number of dimensions, so no vocabulary has to be fitted or stored.
+    """
+
+    def __init__(self, dim: Optional[int] = None, char_ngrams: Tuple[int, int] = (3, 5)):
+        """
+        Initialize the embedder.
+
+        Args:
+            dim: Number of hashed feature dimensions
+            char_ngrams: Inclusive range of character n-gram lengths taken within words
+        """
+        self.dim = dim or config.SEMANTIC_CACHE_DIM
+        self.char_ngrams = char_ngrams
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = [word for word in _TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
+        features = [(f"w:{word}", 1.0) for word in words]
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features.extend((padded[i:i + n], 0.25) for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            A (len(texts), dim) float32 array of unit-length rows (zero rows for empty texts)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                # The top bit picks a sign so colliding features tend to cancel rather than add up
+                vectors[row, digest % self.dim] += weight if digest & 0x80000000 else -weight
+        # Sublinear term frequency keeps repeated words from dominating
+        np.copysign(np.log1p(np.abs(vectors)), vectors, out=vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+class SemanticCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    Vectors live in one preallocated float32 matrix. Candidates are found with
+    random-hyperplane LSH (several tables of hash_bits-bit signatures) and then
+    scored exactly with a single matrix-vector product, so lookups touch a few
+    hundred rows even at 100k entries. LSH is approximate: near-duplicates
+    (similarity 0.95) are found almost always, borderline matches less often.
+    Entries expire after a TTL and the least recently used entry is evicted
+    when the cache is full. Caching a question that already matches an entry
+    replaces that entry's answer instead of adding a duplicate.
+
+    Questions are normalized first, and a hit also requires the same set of
+    medical entities, so "hypertension" never answers "hypotension" however
+    close the vectors are.
+    """
+
+    def __init__(self,
+                 embedder: Optional[Embedder] = None,
+                 threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 num_tables: int = 16,
+                 hash_bits: Optional[int] = None,
+                 seed: int = 0,
+                 signature: Optional[Callable[[str], FrozenSet[str]]] = entity_signature):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            embedder: Embedder for questions; a HashingEmbedder by default
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of cached answers
+            ttl: Time to live of an entry in seconds
+            num_tables: Number of LSH tables; more tables raise recall
+            hash_bits: Signature bits per table; by default sized so buckets hold
+                about 16 entries when the cache is full
+            seed: Seed for the LSH hyperplanes
+            signature: Function of the normalized question that must match exactly
+                for a hit; None disables the check
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.signature = signature
+        self.threshold = config.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_entries = max_entries or config.SEMANTIC_CACHE_SIZE
+        self.ttl = ttl or config.SEMANTIC_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+
+        dim = self.embedder.dim
+        hash_bits = hash_bits or max(4, min(16, int(math.log2(max(self.max_entries, 16) / 16))))
+        planes = np.random.default_rng(seed).standard_normal((num_tables * hash_bits, dim))
+        self._planes = planes.astype(np.float32)
+        self._num_tables = num_tables
+        self._bit_weights = (1 << np.arange(hash_bits, dtype=np.int64))
+        self._hash_bits = hash_bits
+
+        capacity = min(self.max_entries, 1024)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        # Rows holding an entry, kept in step with _free so eviction needs no scan in Python
+        self._live = np.zeros(capacity, dtype=bool)
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._codes: List[Optional[np.ndarray]] = [None] * capacity
+        self._entry_signatures: List[Optional[FrozenSet[str]]] = [None] * capacity
+        self._buckets: List[Dict[int, Set[int]]] = [defaultdict(set) for _ in range(num_tables)]
+        self._free: List[int] = []
+        self._size = 0
+        self._used_rows = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _embed(self, question: str) -> Tuple[np.ndarray, Optional[FrozenSet[str]]]:
+        normalized = normalize_question(question)
+        signature = self.signature(normalized) if self.signature is not None else None
+        return self.embedder.embed([normalized])[0], signature
+
+    def _signatures(self, vector: np.ndarray) -> np.ndarray:
+        """Return one bucket code per LSH table."""
+        bits = (self._planes @ vector > 0).reshape(self._num_tables, self._hash_bits)
+        return bits @ self._bit_weights
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Look up an answer to a question with the same meaning.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        with time_stage("semantic_lookup"):
+            vector, signature = self._embed(question)
+            answer = self.lookup(vector, signature)[0] if vector.any() else None
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        SEMANTIC_CACHE_LOOKUPS.inc(result="miss" if answer is None else "hit")
+        return answer
+
+    def lookup(self, vector: np.ndarray,
+               signature: Optional[FrozenSet[str]] = None) -> Tuple[Optional[str], float]:
+        """
+        Find the most similar live entry to an embedded question.
+
+        Args:
+            vector: Unit-length query vector
+            signature: Entity signature an entry must have to match
+
+        Returns:
+            The answer and its similarity, or (None, best similarity) below the threshold
+        """
+        codes = self._signatures(vector)
+        with self._lock:
+            row, score = self._nearest(vector, codes, signature)
+            if row is None or score < self.threshold:
+                return None, score
+            self._last_used[row] = time.monotonic()
+            return self._answers[row], score
+
+    def set(self, question: str, answer: str) -> None:
+        """
+        Cache an answer for a question.
+
+        Args:
+            question: The user's question
+            answer: The answer to return for questions with the same meaning
+        """
+        vector, signature = self._embed(question)
+        if not vector.any():
+            return
+        self.add(vector, answer, signature)
+
+    def add(self, vector: np.ndarray, answer: str,
+            signature: Optional[FrozenSet[str]] = None) -> None:
+        """
+        Cache an answer under an embedded question.
+
+        Args:
+            vector: Unit-length question vector
+            answer: The answer
+            signature: Entity signature of the question
+        """
+        codes = self._signatures(vector)
+        with self._lock:
+            row, score = self._nearest(vector, codes, signature)
+            if row is not None and score >= self.threshold:
+                # The question already has an entry; refresh it rather than store a duplicate
+                self._answers[row] = answer
+                self._expires[row] = time.time() + self.ttl
+                self._last_used[row] = time.monotonic()
+                return
+            row = self._allocate_row()
+            self._vectors[row] = vector
+            self._expires[row] = time.time() + self.ttl
+            self._last_used[row] = time.monotonic()
+            self._answers[row] = answer
+            self._codes[row] = codes
+            self._entry_signatures[row] = signature
+            self._live[row] = True
+            for table, code in enumerate(codes):
+                self._buckets[table][int(code)].add(row)
+            self._size += 1
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            for bucket in self._buckets:
+                bucket.clear()
+            self._answers = [None] * len(self._answers)
+            self._codes = [None] * len(self._codes)
+            self._entry_signatures = [None] * len(self._entry_signatures)
+            self._expires[:] = 0
+            self._live[:] = False
+            self._free = []
+            self._size = self._used_rows = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache counters.
+
+        Returns:
+            Hit and miss counts plus the number of entries
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": self._size}
+
+    def _nearest(self, vector: np.ndarray, codes: np.ndarray,
+                 signature: Optional[FrozenSet[str]]) -> Tuple[Optional[int], float]:
+        """
+        Find the most similar live entry among the LSH candidates. Caller holds the lock.
+
+        Expired candidates are removed on the way.
+
+        Returns:
+            The row and its similarity, or (None, 0.0) if there is no candidate
+        """
+        candidates: Set[int] = set()
+        for table, code in enumerate(codes):
+            bucket = self._buckets[table].get(int(code))
+            if bucket:
+                candidates.update(bucket)
+        if signature is not None:
+            candidates = {row for row in candidates if self._entry_signatures[row] == signature}
+        if not candidates:
+            return None, 0.0
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        now = time.time()
+        expired = rows[self._expires[rows] <= now]
+        for row in expired:
+            self._remove(int(row))
+        if len(expired):
+            rows = rows[self._expires[rows] > now]
+            if not len(rows):
+                return None, 0.0
+
+        scores = self._vectors[rows] @ vector
+        best = int(np.argmax(scores))
+        return int(rows[best]), float(scores[best])
+
+    def _allocate_row(self) -> int:
+        """Return a free row, growing the matrix or evicting as needed. Caller holds the lock."""
+        if self._free:
+            return self._free.pop()
+        if self._used_rows < len(self._answers):
+            self._used_rows += 1
+            return self._used_rows - 1
+        if self._used_rows < self.max_entries:
+            self._grow(min(self.max_entries, 2 * len(self._answers)))
+            self._used_rows += 1
+            return self._used_rows - 1
+
+        # Full: drop everything expired, otherwise the least recently used entry
+        used = slice(0, self._used_rows)
+        expired = np.flatnonzero((self._expires[used] <= time.time()) & self._live[used])
+        if len(expired):
+            for row in expired:
+                self._remove(int(row))
+            return self._free.pop()
+        last_used = np.where(self._live[used], self._last_used[used], np.inf)
+        victim = int(np.argmin(last_used))
+        self._remove(victim)
+        return self._free.pop()
+
+    def _grow(self, capacity: int) -> None:
+        """Enlarge the preallocated arrays. Caller holds the lock."""
+        extra = capacity - len(self._answers)
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self._vectors.shape[1]), dtype=np.float32)])
+        self._expires = np.concatenate([self._expires, np.zeros(extra)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(extra)])
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+        self._answers.extend([None] * extra)
+        self._codes.extend([None] * extra)
+        self._entry_signatures.extend([None] * extra)
+
+    def _remove(self, row: int) -> None:
+        """Drop an entry and free its row. Caller holds the lock."""
+        codes = self._codes[row]
+        if codes is None:
+            return
+        for table, code in enumerate(codes):
+            bucket = self._buckets[table].get(int(code))
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del self._buckets[table][int(code)]
+        self._codes[row] = None
+        self._entry_signatures[row] = None
+        self._answers[row] = None
+        self._expires[row] = 0
+        self._live[row] = False
+        self._free.append(row)
+        self._size -= 1
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+def make_flight_key(payload: Dict[str, Any], namespace: str = "") -> str:
+    """
+    Build a key that is identical only for byte-for-byte identical requests.
+
+    Args:
+        payload: The request body
+        namespace: Extra scope for the key, such as the endpoint URL
+
+    Returns:
+        A string key for the request
+    """
+    return namespace + "\x00" + json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution across threads."""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn, or wait for the identical call already in flight and share its outcome.
+
+        Args:
+            key: Identity of the call
+            fn: The function to run if no identical call is in flight
+
+        Returns:
+            The result of the single execution; its exception is raised to every caller
+        """
+        with self._lock:
+            pending = self._calls.get(key)
+            if pending is None:
+                future: Future = Future()
+                self._calls[key] = future
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Return the number of distinct calls currently executing."""
+        with self._lock:
+            return len(self._calls)
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutine calls with the same key into a single task."""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn(), or the identical call already in flight, and share its outcome.
+
+        The shared task is shielded so one caller timing out or being cancelled
+        does not cancel the request for the others. When the last caller goes
+        away the task is cancelled, and that caller returns only once it has
+        finished, so a bound on callers (such as a semaphore) also bounds the
+        requests actually running.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine factory run if no identical call is in flight
+
+        Returns:
+            The result of the single execution
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    self._forget(key, task)
+                    task.cancel()
+                    await asyncio.wait({task})
+
+    def in_flight(self) -> int:
+        """Return the number of distinct calls currently executing."""
+        return len(self._tasks)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drop a finished task unless a newer call already replaced it."""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
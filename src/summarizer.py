@@ -0,0 +1,163 @@
+import logging
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from src.context_builder import ROLE_LABELS
+from src.history_store import history_bounds
+from src.scheduler import Priority, get_scheduler
+import config
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the clinical conversation below so it can replace the original turns as "
+    "context for later questions. Preserve patient details, diagnoses, medications, doses, "
+    "allergies and any unresolved questions. Be concise and do not add new information."
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> Executor:
+    """
+    Return the process-wide executor used for background summarization.
+
+    With the request scheduler enabled, summaries run at background priority
+    so they never delay interactive requests.
+    """
+    if config.SCHEDULER_ENABLED:
+        return get_scheduler().executor(Priority.BACKGROUND)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.SUMMARY_WORKERS,
+                                           thread_name_prefix="summarizer")
+        return _executor
+
+class ConversationSummarizer:
+    """Folds older conversation turns into a running summary in the background."""
+
+    def __init__(self,
+                 client,
+                 trigger_messages: Optional[int] = None,
+                 keep_recent: Optional[int] = None,
+                 executor: Optional[Executor] = None,
+                 transform: Optional[Callable[[str, str], str]] = None):
+        """
+        Initialize the summarizer.
+
+        Args:
+            client: Databricks Genie client used to produce summaries
+            trigger_messages: Unsummarized messages (beyond the recent ones) that trigger a refresh
+            keep_recent: Number of most recent messages always kept verbatim
+            executor: Executor for background work; a shared pool is used if omitted
+            transform: Optional function of (role, content) applied to turns before
+                they are sent for summarization, such as PHI redaction
+        """
+        self.client = client
+        self.trigger_messages = trigger_messages or config.SUMMARY_TRIGGER_MESSAGES
+        self.keep_recent = config.SUMMARY_KEEP_RECENT if keep_recent is None else keep_recent
+        self._executor = executor
+        self.transform = transform
+        self._summary = ""
+        self._summarized_count = 0
+        self._generation = 0
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Tuple[str, int]:
+        """
+        Return the current summary and how many leading messages it covers.
+
+        Returns:
+            A (summary, summarized_count) pair read atomically; the count is an
+            absolute message index
+        """
+        with self._lock:
+            return self._summary, self._summarized_count
+
+    def maybe_refresh(self, history: Sequence[Dict[str, str]]) -> Optional[Future]:
+        """
+        Schedule a background refresh if enough turns have aged out of the recent window.
+
+        Args:
+            history: The full conversation history
+
+        Returns:
+            The scheduled future, or None if no refresh was needed or one is running
+        """
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return None
+
+            offset, total = history_bounds(history)
+            fold_end = total - self.keep_recent
+            if fold_end - self._summarized_count < self.trigger_messages:
+                return None
+
+            # Turns evicted from a bounded history before being summarized are skipped
+            fold_start = max(self._summarized_count, offset)
+            turns = list(history[fold_start - offset:fold_end - offset])
+            executor = self._executor or _get_executor()
+            self._future = executor.submit(self._refresh, self._summary, turns,
+                                           fold_end, self._generation)
+            return self._future
+
+    def reset(self) -> None:
+        """Forget the summary; any refresh still running is discarded when it finishes."""
+        with self._lock:
+            self._summary = ""
+            self._summarized_count = 0
+            self._generation += 1
+            self._future = None
+
+    def _refresh(self,
+                 previous_summary: str,
+                 turns: Sequence[Dict[str, str]],
+                 fold_end: int,
+                 generation: int) -> None:
+        """
+        Produce a new summary covering the previous summary plus the given turns.
+
+        Args:
+            previous_summary: Summary of everything before the turns
+            turns: Messages to fold into the summary
+            fold_end: Number of leading history messages covered once done
+            generation: Reset counter at scheduling time
+        """
+        if self.transform is not None:
+            turns = [{"role": message["role"], "content": self.transform(message["role"], message["content"])}
+                     for message in turns]
+        prompt = self._build_prompt(previous_summary, turns)
+        try:
+            response = self.client.generate_completion(prompt, max_tokens=config.SUMMARY_MAX_TOKENS)
+            summary = self.client.extract_response_text(response)
+        except Exception as e:
+            logger.warning(f"Conversation summarization failed, keeping verbatim turns: {str(e)}")
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._summary = summary
+            self._summarized_count = fold_end
+
+    @staticmethod
+    def _build_prompt(previous_summary: str, turns: Sequence[Dict[str, str]]) -> str:
+        """
+        Build the summarization request.
+
+        Args:
+            previous_summary: Existing running summary, possibly empty
+            turns: Messages to fold into the summary
+
+        Returns:
+            The prompt text
+        """
+        parts = [SUMMARY_INSTRUCTIONS, "\n\n"]
+        if previous_summary:
+            parts.extend(["Existing summary:\n", previous_summary, "\n\n"])
+        parts.append("Conversation:\n")
+        for message in turns:
+            parts.extend([ROLE_LABELS.get(message["role"], "Assistant"), ": ", message["content"], "\n"])
+        return "".join(parts)
@@ -0,0 +1,100 @@
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Mapping, Optional, Tuple
+from src.history_store import history_bounds
+from src.utils import format_markdown_response
+import config
+
+if TYPE_CHECKING:
+    from src.chat_interface import ChatInterface
+
+logger = logging.getLogger(__name__)
+
+class TranscriptView:
+    """
+    The window of a conversation rendered on the page.
+
+    Only the newest messages are shown, growing a page at a time on request,
+    and each message's markdown is formatted once and reused across reruns, so
+    the cost of a rerun depends on the window size rather than the length of
+    the conversation.
+    """
+
+    def __init__(self,
+                 window: Optional[int] = None,
+                 formatter: Callable[[str], str] = format_markdown_response,
+                 cache_size: Optional[int] = None):
+        """
+        Initialize the view.
+
+        Args:
+            window: Messages shown initially and added by each load_earlier()
+            formatter: Function turning message content into markdown
+            cache_size: Formatted messages kept; four windows if omitted
+        """
+        self.window = max(1, window or config.RENDER_WINDOW)
+        self.shown = self.window
+        self.formatter = formatter
+        self.cache_size = cache_size or self.window * 4
+        # Absolute index -> (content, formatted markdown), least recently used first
+        self._formatted: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        # Messages older than the in-memory history, read from the conversation store once
+        self._stored: Dict[int, Mapping[str, str]] = {}
+
+    def load_earlier(self) -> None:
+        """Extend the window by one page of older messages."""
+        self.shown += self.window
+
+    def reset(self) -> None:
+        """Return to the initial window and forget cached messages, e.g. after clearing history."""
+        self.shown = self.window
+        self._formatted.clear()
+        self._stored.clear()
+
+    def visible(self, chat_interface: "ChatInterface") -> Tuple[List[Tuple[int, Mapping[str, str]]], bool]:
+        """
+        Return the messages to render and whether earlier ones can be loaded.
+
+        Args:
+            chat_interface: The session's chat interface
+
+        Returns:
+            ((absolute index, message) pairs oldest first, whether older messages exist)
+        """
+        offset, total = history_bounds(chat_interface.history)
+        start = max(0, total - self.shown)
+        earliest = offset
+        messages: List[Tuple[int, Mapping[str, str]]] = []
+        if chat_interface.conversation_store is not None:
+            earliest = 0
+            if start < offset:
+                missing = [index for index in range(start, offset) if index not in self._stored]
+                if missing:
+                    page = chat_interface.history_page(missing[0], missing[-1] + 1 - missing[0])
+                    self._stored.update(enumerate(page, missing[0]))
+                messages = [(index, self._stored[index]) for index in range(start, offset) if index in self._stored]
+        first = max(start, offset)
+        messages.extend(enumerate(chat_interface.history_page(first, total - first), first))
+        return messages, start > earliest
+
+    def format(self, index: int, message: Mapping[str, str]) -> str:
+        """
+        Return a message's markdown, formatting it only the first time it is shown.
+
+        Args:
+            index: Absolute index of the message
+            message: The message
+
+        Returns:
+            Formatted markdown
+        """
+        content = message["content"]
+        cached = self._formatted.get(index)
+        if cached is not None and cached[0] == content:
+            self._formatted.move_to_end(index)
+            return cached[1]
+        formatted = self.formatter(content)
+        self._formatted[index] = (content, formatted)
+        if len(self._formatted) > self.cache_size:
+            self._formatted.popitem(last=False)
+        return formatted
@@ -1,9 +1,24 @@
 import logging
 import re
 from typing import Dict, List, Any, Optional
+from src.markdown_formatter import StreamingMarkdownFormatter
+from src.medical_entities import get_default_extractor
+import config
 
 logger = logging.getLogger(__name__)
 
+# Characters removed from user input; clinical notation such as 140/90, 7.5% and +2 is kept
+_UNSAFE_CHARS = re.compile(r'[^\w\s.,?!:;()\[\]{}\'"/%+=-]')
+
+def configure_logging() -> None:
+    """
+    Configure root logging at LOG_LEVEL.
+    
+    Library modules never configure logging on import; entry points such as
+    the Streamlit app and the command-line tools call this instead.
+    """
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL))
+
 def sanitize_input(text: str) -> str:
     """
     Sanitize user input to prevent injection attacks.
@@ -15,65 +30,49 @@ def sanitize_input(text: str) -> str:
         Sanitized text
     """
     # Remove any potentially harmful characters or sequences
-    sanitized = re.sub(r'[^\w\s.,?!:;()\[\]{}\'"-]', '', text)
-    return sanitized
+    return _UNSAFE_CHARS.sub('', text)
 
 def format_markdown_response(text: str) -> str:
     """
     Format the response text with proper markdown.
     
+    Uses the same single-pass formatter that normalizes streamed responses,
+    so complete and streamed answers render identically.
+    
     Args:
         text: The response text to format
         
     Returns:
         Formatted markdown text
     """
-    # Add some basic markdown formatting improvements
-    
-    # Ensure proper spacing for headers
-    text = re.sub(r'(?<!\n)#', '\n#', text)
-    
-    # Ensure proper spacing after lists
-    text = re.sub(r'(\n\d+\..+)(\n[^\d*-])', r'\1\n\2', text)
-    
-    # Ensure code blocks are properly formatted
-    text = re.sub(r'```(\w+)?\n?', r'```\1\n', text)
-    text = re.sub(r'\n?```', r'\n```', text)
-    
-    return text
+    formatter = StreamingMarkdownFormatter()
+    return formatter.feed(text) + formatter.flush()
 
 def parse_medical_entities(text: str) -> List[Dict[str, Any]]:
     """
-    Parse medical entities from text using regex patterns.
-    This is a simple implementation - a more robust solution would use
+    Parse medical entities from text using the shared term-list extractor.
+    This is a dictionary-based implementation - a more robust solution would use
     a medical NER model or medical knowledge base.
     
     Args:
         text: The text to parse for medical entities
         
     Returns:
-        List of extracted medical entities
+        List of extracted medical entities in order of appearance
     """
-    entities = []
-    
-    # Example patterns for medical entities
-    patterns = {
-        "medication": r'\b[A-Z][a-z]*(?:mab|nib|zumab|ximab|limus|prazole|sartan|statin)\b',
-        "condition": r'\b(?:diabetes|hypertension|asthma|cancer|depression|anxiety)\b',
-        "procedure": r'\b(?:surgery|biopsy|transplant|resection|angioplasty)\b'
-    }
-    
-    for entity_type, pattern in patterns.items():
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            entities.append({
-                "type": entity_type,
-                "text": match.group(0),
-                "start": match.start(),
-                "end": match.end()
-            })
+    return get_default_extractor().extract(text)
+
+def parse_medical_entities_batch(texts: List[str]) -> List[List[Dict[str, Any]]]:
+    """
+    Parse medical entities from many texts at once.
     
-    return entities
+    Args:
+        texts: The texts to parse for medical entities
+        
+    Returns:
+        One list of extracted medical entities per input text
+    """
+    return get_default_extractor().extract_batch(texts)
 
 def get_medical_disclaimer() -> str:
     """
@@ -0,0 +1,17 @@
+import pytest
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmarks", action="store_true", default=False,
+                     help="Also run wall-clock benchmark tests")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock timing test, only run with --benchmarks")
+
+def pytest_collection_modifyitems(config, items):
+    """Skip timing tests unless asked for, since their thresholds depend on the machine."""
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="wall-clock benchmark; run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import pytest
+import httpx
+from unittest.mock import patch
+from src.async_databricks_client import AsyncDatabricksGenieClient
+
+class TestAsyncDatabricksGenieClient:
+    """Test cases for the AsyncDatabricksGenieClient class."""
+    
+    def test_init_raises_error_without_api_key(self):
+        """Test that initialization raises an error without an API key."""
+        with patch('config.DATABRICKS_API_KEY', ''):
+            with pytest.raises(ValueError, match="Databricks API key is required"):
+                AsyncDatabricksGenieClient()
+    
+    def test_generate_completion_uses_shared_payload(self):
+        """Test that the async client sends the same payload as the sync client."""
+        seen = []
+        
+        def handler(request):
+            seen.append(json.loads(request.content))
+            return httpx.Response(200, json={"choices": [{"text": "Async response"}]})
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", transport=httpx.MockTransport(handler))
+        result = asyncio.run(client.generate_completion("Test prompt"))
+        
+        assert client.extract_response_text(result) == "Async response"
+        assert seen[0]["prompt"] == client._format_clinical_prompt("Test prompt")
+        assert "max_tokens" in seen[0] and "temperature" in seen[0]
+    
+    def test_generate_completion_retries_transient_status(self):
+        """Test that 503 responses are retried before succeeding."""
+        statuses = [503, 200]
+        
+        def handler(request):
+            status = statuses.pop(0)
+            return httpx.Response(status, json={"result": "ok"})
+        
+        async def no_sleep(delay):
+            return None
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", max_retries=2,
+                                            transport=httpx.MockTransport(handler))
+        with patch('asyncio.sleep', no_sleep):
+            result = asyncio.run(client.generate_completion("Test prompt"))
+        
+        assert result == {"result": "ok"}
+        assert statuses == []
+    
+    def test_generate_completion_error(self):
+        """Test that non-retryable errors are wrapped like the sync client."""
+        client = AsyncDatabricksGenieClient(
+            api_key="test_key",
+            transport=httpx.MockTransport(lambda request: httpx.Response(400, text="bad"))
+        )
+        with pytest.raises(Exception, match="Failed to get response from Databricks API"):
+            asyncio.run(client.generate_completion("Test prompt"))
+    
+    def test_batch_complete_preserves_order_and_bounds_concurrency(self):
+        """Test that batch results are ordered and in-flight requests are bounded."""
+        in_flight = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            prompt = json.loads(request.content)["prompt"]
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={"result": prompt})
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", transport=httpx.MockTransport(handler))
+        prompts = [f"Question {i}" for i in range(12)]
+        results = asyncio.run(client.batch_complete(prompts, concurrency=3))
+        
+        assert [f"QUESTION: {p}" in r["result"] for p, r in zip(prompts, results)] == [True] * 12
+        assert peak <= 3
+    
+    def test_batch_complete_returns_errors_in_place(self):
+        """Test that a timed-out request yields an exception in its slot."""
+        async def handler(request):
+            if "slow" in json.loads(request.content)["prompt"]:
+                await asyncio.sleep(1)
+            return httpx.Response(200, json={"result": "fast"})
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", transport=httpx.MockTransport(handler))
+        results = asyncio.run(client.batch_complete(["fast", "slow", "fast"], timeout=0.1))
+        
+        assert results[0] == {"result": "fast"}
+        assert isinstance(results[1], TimeoutError)
+        assert results[2] == {"result": "fast"}
+    
+    def test_batch_complete_timeouts_do_not_exceed_concurrency(self):
+        """Test that a timed-out request keeps its slot until the upstream call has ended."""
+        in_flight = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(1)
+                return httpx.Response(200, json={"result": "slow"})
+            finally:
+                in_flight -= 1
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", transport=httpx.MockTransport(handler))
+        prompts = [f"Question {i}" for i in range(10)]
+        results = asyncio.run(client.batch_complete(prompts, concurrency=2, timeout=0.05))
+        
+        assert all(isinstance(result, TimeoutError) for result in results)
+        assert peak <= 2
+        assert in_flight == 0
@@ -0,0 +1,58 @@
+import pytest
+from benchmarks.mock_genie_server import LatencyModel, MockGenieServer
+from benchmarks.run_benchmarks import percentile, run_benchmarks, compare_to_baseline
+from src.databricks_client import DatabricksGenieClient
+
+class TestBenchmarks:
+    """Test cases for the mock Genie server and benchmark harness."""
+
+    def test_mock_server_completion_and_stream(self):
+        """Test that the real client can complete and stream against the mock server."""
+        with MockGenieServer(latency=LatencyModel("fixed", 1.0), response_words=12) as server:
+            client = DatabricksGenieClient(api_key="test", workspace_url=server.url)
+
+            response = client.generate_completion("What is hypertension?")
+            streamed = "".join(client.stream_completion("What is hypertension?"))
+            client.close()
+
+        assert len(client.extract_response_text(response).split()) == 12
+        assert len(streamed.split()) == 12
+        assert server.stats["completions"] == 1
+        assert server.stats["streams"] == 1
+
+    def test_mock_server_throttling_is_retried(self):
+        """Test that injected 429s carry Retry-After and are retried by the client."""
+        with MockGenieServer(latency=LatencyModel("fixed", 0.0), throttle_rate=1.0, retry_after=0) as server:
+            client = DatabricksGenieClient(api_key="test", workspace_url=server.url, max_retries=2)
+
+            with pytest.raises(Exception) as excinfo:
+                client.generate_completion("What is hypertension?")
+            client.close()
+
+        assert "429" in str(excinfo.value)
+        assert server.stats["throttled"] == 3
+
+    def test_run_benchmarks_reports_percentiles(self):
+        """Test a small end-to-end benchmark run."""
+        results = run_benchmarks(concurrency=2, requests_per_scenario=6, session_turns=2,
+                                 latency=LatencyModel("fixed", 1.0), seed=7)
+
+        scenarios = {result["scenario"]: result for result in results["scenarios"]}
+        assert set(scenarios) == {"client_blocking", "client_streaming", "chat_session"}
+        assert scenarios["client_blocking"]["requests"] == 6
+        assert scenarios["chat_session"]["requests"] == 4
+        for result in scenarios.values():
+            assert result["errors"] == 0
+            assert result["throughput_rps"] > 0
+            assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+            assert result["peak_memory_kib"] > 0
+        assert compare_to_baseline(results, results)[0].startswith("client_blocking: throughput +0.0%")
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([5.0], 95) == 5.0
+        assert percentile([], 50) is None
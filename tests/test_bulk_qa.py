@@ -0,0 +1,147 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from benchmarks.mock_genie_server import LatencyModel, MockGenieServer
+from src.bulk_qa import BulkQARunner, iter_questions, load_checkpoint, main
+from src.databricks_client import DatabricksGenieClient
+
+def write_jsonl(path, questions):
+    with open(path, "w", encoding="utf-8") as input_file:
+        for index, question in enumerate(questions, 1):
+            input_file.write(json.dumps({"id": f"q{index}", "question": question}) + "\n")
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as output_file:
+        return [json.loads(line) for line in output_file]
+
+class TestIterQuestions:
+    """Test cases for streaming question input."""
+
+    def test_jsonl_offsets_resume_mid_file(self, tmp_path):
+        """Test that the offset after a record resumes reading at the next one."""
+        path = tmp_path / "questions.jsonl"
+        write_jsonl(path, ["What is hypertension?", "What is metformin?", "What is asthma?"])
+
+        records = list(iter_questions(str(path)))
+        resumed = list(iter_questions(str(path), offset=records[0][1], start_index=1))
+
+        assert [record["id"] for record, _ in records] == ["q1", "q2", "q3"]
+        assert [record["id"] for record, _ in resumed] == ["q2", "q3"]
+        assert records[-1][1] == path.stat().st_size
+
+    def test_csv_with_multiline_field(self, tmp_path):
+        """Test CSV input with a header, a quoted multi-line question and a resume offset."""
+        path = tmp_path / "questions.csv"
+        path.write_text('id,question\n1,"Dose of\nlisinopril?"\n2,What is asthma?\n', encoding="utf-8")
+
+        records = list(iter_questions(str(path)))
+        resumed = list(iter_questions(str(path), offset=records[0][1], start_index=1))
+
+        assert [record["question"] for record, _ in records] == ["Dose of\nlisinopril?", "What is asthma?"]
+        assert [record["id"] for record, _ in resumed] == ["2"]
+
+    def test_invalid_records_are_reported(self, tmp_path):
+        """Test that unusable lines become error records instead of stopping the run."""
+        path = tmp_path / "questions.jsonl"
+        path.write_text('{"question": "Ok?"}\nnot json\n\n{"text": "wrong field"}\n', encoding="utf-8")
+
+        records = [record for record, _ in iter_questions(str(path))]
+
+        assert [record["id"] for record in records] == [1, 2, 3]
+        assert "error" not in records[0]
+        assert records[1]["error"].startswith("Invalid JSON")
+        assert records[2]["error"] == "Missing 'question' field"
+
+    def test_invalid_utf8_does_not_stop_reading(self, tmp_path):
+        """Test that a stray non-UTF-8 byte is replaced instead of aborting the run."""
+        path = tmp_path / "questions.jsonl"
+        path.write_bytes(b'{"id": "a", "question": "Dose of caf\xe9ine?"}\n{"id": "b", "question": "Next"}\n')
+
+        records = [record for record, _ in iter_questions(str(path))]
+
+        assert records == [{"id": "a", "question": "Dose of caf\ufffdine?"}, {"id": "b", "question": "Next"}]
+
+class TestBulkQARunner:
+    """Test cases for the BulkQARunner class."""
+
+    def test_answers_in_input_order_with_entities(self, tmp_path):
+        """Test a concurrent run against the mock server."""
+        input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+        questions = [f"What is the dose of metformin for patient {index}?" for index in range(20)]
+        write_jsonl(input_path, questions)
+
+        with MockGenieServer(latency=LatencyModel("uniform", 5.0, 5.0, seed=1)) as server:
+            client = DatabricksGenieClient(api_key="bulk", workspace_url=server.url, cache=None)
+            summary = BulkQARunner(client, concurrency=4).run(str(input_path), str(output_path))
+            client.close()
+
+        results = read_jsonl(output_path)
+        assert summary["processed"] == 20 and summary["errors"] == 0
+        assert [result["question"] for result in results] == questions
+        assert all(result["answer"] and result["timings"]["total_ms"] > 0 for result in results)
+        assert "http_total_ms" in results[0]["timings"]
+        assert load_checkpoint(f"{output_path}.checkpoint")["records"] == 20
+
+    def test_resume_skips_finished_and_drops_partial_output(self, tmp_path):
+        """Test that a resumed run redoes only unfinished records."""
+        input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+        write_jsonl(input_path, [f"Question {index}" for index in range(6)])
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+        client.extract_response_text.return_value = "Answer"
+        calls = 0
+
+        def flaky(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 4:
+                raise KeyboardInterrupt
+            return {"choices": [{"text": "Answer"}]}
+
+        client.generate_completion.side_effect = flaky
+        with pytest.raises(KeyboardInterrupt):
+            BulkQARunner(client, concurrency=1, checkpoint_every=2).run(str(input_path), str(output_path))
+        # Simulate a line written after the last checkpoint before the crash
+        with open(output_path, "a", encoding="utf-8") as output_file:
+            output_file.write('{"id": "partial"')
+
+        client.generate_completion.side_effect = None
+        summary = BulkQARunner(client, concurrency=2).run(str(input_path), str(output_path), resume=True)
+
+        assert summary["processed"] == 3
+        assert [result["id"] for result in read_jsonl(output_path)] == [f"q{index}" for index in range(1, 7)]
+
+    def test_failed_question_is_recorded(self, tmp_path):
+        """Test that an API failure is written as an error line and the run continues."""
+        input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+        write_jsonl(input_path, ["First", "Second"])
+        client = MagicMock()
+        client.generate_completion.side_effect = [Exception("Failed to get response"),
+                                                  {"choices": [{"text": "Answer"}]}]
+        client.extract_response_text.return_value = "Answer"
+
+        summary = BulkQARunner(client, concurrency=1).run(str(input_path), str(output_path))
+
+        results = read_jsonl(output_path)
+        assert summary["errors"] == 1
+        assert results[0]["error"] == "Failed to get response"
+        assert results[1]["answer"] == "Answer"
+
+class TestMain:
+    """Test cases for the bulk question-answering command line."""
+
+    @patch('requests.Session.post')
+    def test_zero_temperature_is_sent(self, mock_post, tmp_path):
+        """Test that --temperature 0 is not replaced by the configured default."""
+        input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+        write_jsonl(input_path, ["What is the dose of metformin?"])
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {"choices": [{"text": "Answer"}]}
+
+        with patch('config.DATABRICKS_API_KEY', 'test_key'), \
+                patch('config.DATABRICKS_WORKSPACE_URL', 'https://example.databricks.com'), \
+                patch('config.TEMPERATURE', 0.7):
+            assert main([str(input_path), str(output_path), "--temperature", "0"]) == 0
+
+        assert mock_post.call_args.kwargs["json"]["temperature"] == 0
+        assert read_jsonl(output_path)[0]["answer"] == "Answer"
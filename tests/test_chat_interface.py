@@ -57,6 +57,35 @@ class TestChatInterface:
         assert interface.history[1]["role"] == "assistant"
         assert "I'm sorry, I encountered an error" in interface.history[1]["content"]
     
+    def test_stream_response_success(self, mock_client):
+        """Test that streamed deltas are yielded and recorded in history."""
+        mock_client.stream_completion.return_value = iter(["Test ", "streamed ", "response"])
+        
+        interface = ChatInterface(mock_client)
+        deltas = list(interface.stream_response("Test question"))
+        
+        assert deltas == ["Test ", "streamed ", "response"]
+        assert len(interface.history) == 2
+        assert interface.history[0]["content"] == "Test question"
+        assert interface.history[1]["role"] == "assistant"
+        assert interface.history[1]["content"] == "Test streamed response"
+    
+    def test_stream_response_error(self, mock_client):
+        """Test error handling when the stream fails part way through."""
+        def failing_stream(context):
+            yield "Partial"
+            raise Exception("Stream broke")
+        
+        mock_client.stream_completion.side_effect = failing_stream
+        
+        interface = ChatInterface(mock_client)
+        deltas = list(interface.stream_response("Test question"))
+        
+        assert deltas[0] == "Partial"
+        assert "I'm sorry, I encountered an error" in deltas[-1]
+        assert interface.history[1]["content"].startswith("Partial")
+        assert "I'm sorry, I encountered an error" in interface.history[1]["content"]
+    
     def test_create_context(self, mock_client):
         """Test context creation with conversation history."""
         interface = ChatInterface(mock_client)
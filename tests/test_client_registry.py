@@ -0,0 +1,47 @@
+from unittest.mock import patch
+from src.client_registry import ClientRegistry
+from src.databricks_client import DatabricksGenieClient
+
+class TestClientRegistry:
+    """Test cases for the ClientRegistry class."""
+    
+    def test_get_client_reuses_instance(self):
+        """Test that the same credentials return the same client."""
+        registry = ClientRegistry(max_clients=2)
+        first = registry.get_client(api_key="key_a")
+        second = registry.get_client(api_key="key_a")
+        
+        assert isinstance(first, DatabricksGenieClient)
+        assert first is second
+        assert len(registry) == 1
+    
+    def test_get_client_separates_keys_and_workspaces(self):
+        """Test that different API keys or workspaces get their own clients."""
+        registry = ClientRegistry(max_clients=4)
+        a = registry.get_client(api_key="key_a")
+        b = registry.get_client(api_key="key_b")
+        c = registry.get_client(api_key="key_a", workspace_url="https://other.cloud.databricks.com")
+        
+        assert a is not b
+        assert a is not c
+        assert len(registry) == 3
+    
+    def test_lru_eviction_closes_client(self):
+        """Test that the least recently used client is evicted and closed."""
+        registry = ClientRegistry(max_clients=2)
+        a = registry.get_client(api_key="key_a")
+        registry.get_client(api_key="key_b")
+        registry.get_client(api_key="key_a")
+        
+        with patch.object(DatabricksGenieClient, "close") as mock_close:
+            registry.get_client(api_key="key_c")
+        
+        mock_close.assert_called_once()
+        assert len(registry) == 2
+        assert registry.get_client(api_key="key_a") is a
+    
+    def test_key_does_not_contain_raw_api_key(self):
+        """Test that the raw API key is never stored in the registry key."""
+        key = ClientRegistry._make_key("secret", "https://ws/", "/api")
+        assert "secret" not in key
+        assert key[0] == "https://ws"
@@ -0,0 +1,42 @@
+import dataclasses
+import pytest
+from unittest.mock import patch
+import config
+from config import Settings, get_settings
+
+class TestSettings:
+    """Test cases for the Settings object and the config module attributes."""
+
+    def test_from_env_parses_types(self, monkeypatch):
+        """Test that environment variables override defaults with the field's type."""
+        monkeypatch.setenv("MAX_TOKENS", "512")
+        monkeypatch.setenv("TEMPERATURE", "0.1")
+        monkeypatch.setenv("HEDGE_ENABLED", "True")
+        monkeypatch.setenv("DATABRICKS_GENIE_ENDPOINTS", "/api/a, ,https://other/api/b")
+
+        settings = Settings.from_env()
+
+        assert settings.max_tokens == 512
+        assert settings.temperature == 0.1
+        assert settings.hedge_enabled is True
+        assert settings.databricks_genie_endpoints == ("/api/a", "https://other/api/b")
+        assert settings.model_name == Settings.model_name
+
+    def test_settings_are_frozen_and_shared(self):
+        """Test that settings are read once and cannot be mutated."""
+        settings = get_settings()
+
+        assert get_settings() is settings
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            settings.max_tokens = 1
+
+    def test_module_attributes(self):
+        """Test backwards-compatible module attributes, including patching them."""
+        assert config.MODEL_NAME == get_settings().model_name
+        assert "HEDGE_ENABLED" in dir(config)
+        with pytest.raises(AttributeError):
+            config.NOT_A_SETTING
+
+        with patch('config.HEDGE_ENABLED', not get_settings().hedge_enabled):
+            assert config.HEDGE_ENABLED != get_settings().hedge_enabled
+        assert config.HEDGE_ENABLED == get_settings().hedge_enabled
@@ -0,0 +1,70 @@
+from src.context_builder import ContextBuilder, CONTEXT_HEADER, estimate_tokens
+
+class TestContextBuilder:
+    """Test cases for the ContextBuilder class."""
+    
+    def test_build_formats_history(self):
+        """Test that turns are formatted in order after the header."""
+        builder = ContextBuilder(token_budget=1000)
+        builder.sync([
+            {"role": "user", "content": "Question 1"},
+            {"role": "assistant", "content": "Answer 1"}
+        ])
+        
+        context = builder.build()
+        assert context == CONTEXT_HEADER + "User: Question 1\n\nAssistant: Answer 1\n\nUser: "
+    
+    def test_sync_only_formats_new_turns(self):
+        """Test that syncing an appended history reuses cached segments."""
+        history = [{"role": "user", "content": "Question 1"}]
+        builder = ContextBuilder(token_budget=1000)
+        builder.sync(history)
+        cached = builder._segments[0]
+        
+        history.append({"role": "assistant", "content": "Answer 1"})
+        builder.sync(history)
+        
+        assert len(builder) == 2
+        assert builder._segments[0] is cached
+    
+    def test_sync_rebuilds_when_history_replaced(self):
+        """Test that a replaced history list invalidates the cache."""
+        builder = ContextBuilder(token_budget=1000)
+        builder.sync([{"role": "user", "content": "Old"}])
+        builder.sync([{"role": "user", "content": "New"}])
+        
+        assert "Old" not in builder.build()
+        assert "User: New" in builder.build()
+    
+    def test_build_packs_newest_turns_within_budget(self):
+        """Test that older turns are dropped once the token budget is reached."""
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "x" * 40}
+                   for i in range(20)]
+        builder = ContextBuilder(token_budget=100)
+        builder.sync(history)
+        
+        context = builder.build()
+        assert estimate_tokens(context) <= 100
+        assert "message 19" in context
+        assert "message 0 " not in context
+    
+    def test_build_always_includes_newest_turn(self):
+        """Test that an oversized latest question is still sent."""
+        builder = ContextBuilder(token_budget=20)
+        builder.sync([{"role": "user", "content": "y" * 400}])
+        
+        assert "y" * 400 in builder.build()
+    
+    def test_pending_turn_matches_asking_it(self):
+        """Test that a prompt built for a pending question equals the one built once it is asked."""
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "x" * 40}
+                   for i in range(20)]
+        question = "What is the usual dosing of metformin?"
+        builder = ContextBuilder(token_budget=100, transform=lambda role, content: content.upper())
+        builder.sync(history)
+        
+        pending = builder.build(pending=question)
+        builder.sync(history + [{"role": "user", "content": question}])
+        
+        assert pending == builder.build()
+        assert pending.endswith("User: WHAT IS THE USUAL DOSING OF METFORMIN?\n\n")
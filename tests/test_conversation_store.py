@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.conversation_store import (ConversationStore, FileConversationStore, SQLiteConversationStore,
+                                    WriteBehindStore, create_conversation_store, sign_session_id,
+                                    verify_session_token)
+from src.history_store import history_bounds
+
+def make_messages(count, start=0):
+    return [{"role": "user" if index % 2 == 0 else "assistant", "content": f"Message {index}"}
+            for index in range(start, start + count)]
+
+@pytest.fixture(params=["sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+    else:
+        backend = FileConversationStore(str(tmp_path / "conversations"))
+    yield backend
+    backend.close()
+
+class TestConversationStores:
+    """Test cases shared by the built-in conversation store backends."""
+
+    def test_append_and_paginate(self, store):
+        """Test appending in batches and reading pages back by absolute index."""
+        store.append_many("session-1", make_messages(5))
+        store.append_many("session-1", make_messages(3, start=5))
+        store.append("session-2", {"role": "user", "content": "Other session"})
+
+        assert store.count("session-1") == 8
+        assert [m["content"] for m in store.load_page("session-1", 6, 10)] == ["Message 6", "Message 7"]
+        assert [len(page) for page in store.iter_pages("session-1", page_size=3)] == [3, 3, 2]
+        offset, recent = store.load_recent("session-1", 3)
+        assert offset == 5
+        assert [m["content"] for m in recent] == ["Message 5", "Message 6", "Message 7"]
+        assert store.count("session-2") == 1
+
+    def test_delete_and_invalid_session_id(self, store):
+        """Test removing a session and rejecting unsafe ids."""
+        store.append_many("session-1", make_messages(2))
+        store.delete("session-1")
+
+        assert store.count("session-1") == 0
+        assert store.load_page("session-1", 0, 10) == []
+        with pytest.raises(ValueError):
+            store.append("../etc/passwd", {"role": "user", "content": "x"})
+
+    def test_file_store_ignores_partial_trailing_line(self, tmp_path):
+        """Test that a line cut short by a crash is not read as a message."""
+        store = FileConversationStore(str(tmp_path))
+        store.append_many("session-1", make_messages(2))
+        with open(tmp_path / "session-1.jsonl", "ab") as session_file:
+            session_file.write(b'{"role": "user", "cont')
+
+        assert store.count("session-1") == 2
+
+class TestSessionTokens:
+    """Test cases for signed session resume tokens."""
+
+    def test_only_fresh_tokens_signed_with_the_secret_resume(self):
+        """Test that bare, forged, tampered and expired tokens are rejected."""
+        token = sign_session_id("abc123", "secret")
+
+        assert verify_session_token(token, "secret", max_age=60) == "abc123"
+        assert verify_session_token("abc123", "secret", max_age=60) is None
+        assert verify_session_token(token, "other-secret", max_age=60) is None
+        assert verify_session_token(token.replace("abc123", "abc124"), "secret", max_age=60) is None
+        assert verify_session_token(token, "", max_age=60) is None
+        assert verify_session_token(sign_session_id("abc123", "secret", issued=0), "secret", max_age=60) is None
+
+class TestWriteBehindStore:
+    """Test cases for the WriteBehindStore class."""
+
+    def test_appends_are_batched(self, tmp_path):
+        """Test that queued appends are written together and read back in order."""
+        backend = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        backend.append_many = MagicMock(wraps=backend.append_many)
+        store = WriteBehindStore(backend, batch_size=100, flush_interval=0.05)
+
+        for message in make_messages(50):
+            store.append("session-1", message)
+        store.flush()
+
+        assert backend.append_many.call_count < 50
+        assert [m["content"] for m in store.load_page("session-1", 0, 50)] == \
+            [m["content"] for m in make_messages(50)]
+        store.close()
+
+    def test_failed_writes_are_retried(self, tmp_path):
+        """Test that a transient backend failure does not lose messages."""
+        backend = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        real_append = backend.append_many
+        failures = iter([sqlite3.OperationalError("database is locked")])
+
+        def flaky(session_id, messages):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            real_append(session_id, messages)
+
+        backend.append_many = flaky
+        store = WriteBehindStore(backend, flush_interval=0)
+        store.append("session-1", {"role": "user", "content": "Hello"})
+
+        assert store.count("session-1") == 1
+        assert store.dropped == 0
+        store.close()
+
+    def test_unexpected_write_error_does_not_block_flush(self, tmp_path):
+        """Test that a non-transient backend failure drops the batch without wedging the writer."""
+        backend = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        real_append = backend.append_many
+        failures = iter([TypeError("Object of type bytes is not JSON serializable")])
+
+        def broken(session_id, messages):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            real_append(session_id, messages)
+
+        backend.append_many = broken
+        store = WriteBehindStore(backend, flush_interval=0)
+        store.append("session-1", {"role": "user", "content": "Unencodable"})
+        store.flush()
+        store.append("session-1", {"role": "user", "content": "Hello"})
+
+        assert store.count("session-1") == 1
+        assert store.dropped == 1
+        store.close()
+
+    def test_reads_wait_only_for_their_own_session(self, tmp_path):
+        """Test that a busy session cannot keep another session's reads waiting."""
+        backend = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        real_append = backend.append_many
+
+        def slow(session_id, messages):
+            time.sleep(0.005)
+            real_append(session_id, messages)
+
+        backend.append_many = slow
+        store = WriteBehindStore(backend, batch_size=1, flush_interval=0, max_pending=50)
+        stop = threading.Event()
+
+        def keep_appending():
+            while not stop.is_set():
+                store.append("session-a", {"role": "user", "content": "Busy"})
+
+        appender = threading.Thread(target=keep_appending, daemon=True)
+        appender.start()
+        store.append("session-b", {"role": "user", "content": "Hello"})
+        pages = []
+        reader = threading.Thread(target=lambda: pages.append(store.load_page("session-b", 0, 10)), daemon=True)
+        reader.start()
+        reader.join(timeout=5)
+        stop.set()
+        appender.join()
+
+        assert not reader.is_alive()
+        assert [m["content"] for m in pages[0]] == ["Hello"]
+        store.close()
+
+    def test_create_conversation_store(self, tmp_path):
+        """Test backend selection from settings."""
+        assert create_conversation_store(backend="") is None
+        store = create_conversation_store(backend="file", path=str(tmp_path))
+        assert isinstance(store, WriteBehindStore)
+        assert isinstance(store.store, FileConversationStore)
+        store.close()
+        with pytest.raises(ValueError):
+            create_conversation_store(backend="redis", path=str(tmp_path))
+
+class TestChatInterfacePersistence:
+    """Test cases for persisting and resuming conversations in ChatInterface."""
+
+    def test_resume_loads_newest_page_lazily(self, tmp_path):
+        """Test that a new interface for the same session resumes with the newest page only."""
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+        client.extract_response_text.return_value = "Answer"
+        store = create_conversation_store(backend="sqlite", path=str(tmp_path / "conversations.db"))
+        first = ChatInterface(client, conversation_store=store, session_id="abc")
+        for index in range(30):
+            first.get_response(f"Question {index}")
+
+        resumed = ChatInterface(client, history_limit=20, conversation_store=store, session_id="abc")
+
+        assert history_bounds(resumed.history) == (40, 60)
+        assert resumed.history[-1]["content"] == "Answer"
+        assert [m["content"] for m in resumed.history_page(0, 2)] == ["Question 0", "Answer"]
+        assert [m["content"] for m in resumed.history_page(58, 5)] == ["Question 29", "Answer"]
+
+        resumed.get_response("Follow-up")
+        assert store.count("abc") == 62
+        resumed.clear_history()
+        assert store.count("abc") == 0
+        store.close()
+
+    def test_store_requires_session_id(self):
+        """Test that without a session id nothing is persisted."""
+        store = MagicMock(spec=ConversationStore)
+        interface = ChatInterface(MagicMock(), conversation_store=store)
+
+        assert interface.conversation_store is None
+        store.load_recent.assert_not_called()
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 import json
+import requests
 from src.databricks_client import DatabricksGenieClient
 
 class TestDatabricksGenieClient:
@@ -19,7 +20,7 @@ class TestDatabricksGenieClient:
         assert "Authorization" in client.headers
         assert client.headers["Authorization"] == "Bearer test_key"
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_completion_success(self, mock_post):
         """Test successful API call to generate completion."""
         # Mock a successful API response
@@ -41,13 +42,13 @@ class TestDatabricksGenieClient:
         mock_post.assert_called_once()
         assert result["choices"][0]["text"] == "This is a test response"
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_completion_error(self, mock_post):
         """Test error handling in generate_completion."""
         # Mock a failed API response
-        mock_post.side_effect = Exception("API error")
+        mock_post.side_effect = requests.exceptions.ConnectionError("API error")
         
-        client = DatabricksGenieClient(api_key="test_key")
+        client = DatabricksGenieClient(api_key="test_key", max_retries=0)
         with pytest.raises(Exception, match="Failed to get response from Databricks API"):
             client.generate_completion("Test prompt")
     
@@ -92,4 +93,102 @@ class TestDatabricksGenieClient:
         }
         
         text = client.extract_response_text(api_response)
-        assert "Sorry, I couldn't process that request" in text
\ No newline at end of file
+        assert "Sorry, I couldn't process that request" in text
+    
+    def test_session_uses_pooled_adapter(self):
+        """Test that the client owns a keep-alive session with a sized pool."""
+        client = DatabricksGenieClient(api_key="test_key", pool_size=4)
+        adapter = client.session.get_adapter("https://example.com")
+        
+        assert adapter._pool_maxsize == 4
+        assert client.session.headers["Authorization"] == "Bearer test_key"
+    
+    @patch('requests.Session.post')
+    def test_generate_completion_passes_timeout(self, mock_post):
+        """Test that connect/read timeouts are applied to every request."""
+        mock_post.return_value = MagicMock(status_code=200)
+        
+        client = DatabricksGenieClient(api_key="test_key", timeout=(1.0, 2.0))
+        client.generate_completion("Test prompt")
+        
+        assert mock_post.call_args.kwargs["timeout"] == (1.0, 2.0)
+    
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_generate_completion_retries_transient_status(self, mock_post, mock_sleep):
+        """Test that retryable status codes are retried with Retry-After honored."""
+        throttled = MagicMock(status_code=429, headers={"Retry-After": "2"})
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {"result": "ok"}
+        mock_post.side_effect = [throttled, ok]
+        
+        client = DatabricksGenieClient(api_key="test_key", max_retries=2)
+        result = client.generate_completion("Test prompt")
+        
+        assert result == {"result": "ok"}
+        assert mock_post.call_count == 2
+        mock_sleep.assert_called_once_with(2.0)
+    
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_generate_completion_gives_up_after_max_retries(self, mock_post, mock_sleep):
+        """Test that retries stop after max_retries attempts."""
+        mock_post.side_effect = requests.exceptions.Timeout("timed out")
+        
+        client = DatabricksGenieClient(api_key="test_key", max_retries=2)
+        with pytest.raises(Exception, match="Failed to get response from Databricks API"):
+            client.generate_completion("Test prompt")
+        
+        assert mock_post.call_count == 3
+        assert mock_sleep.call_count == 2
+    
+    def test_backoff_delay_is_bounded(self):
+        """Test that jittered backoff never exceeds the exponential ceiling."""
+        client = DatabricksGenieClient(api_key="test_key")
+        with patch('config.HTTP_BACKOFF_BASE', 0.5), patch('config.HTTP_BACKOFF_MAX', 3.0):
+            for attempt in range(6):
+                delay = client._backoff_delay(attempt)
+                assert 0 <= delay <= min(3.0, 0.5 * 2 ** attempt)
+    
+    @patch('requests.Session.post')
+    def test_stream_completion_parses_server_sent_events(self, mock_post):
+        """Test that SSE chunks are yielded as text deltas until [DONE]."""
+        mock_response = MagicMock(status_code=200, headers={"Content-Type": "text/event-stream"})
+        mock_response.iter_lines.return_value = [
+            b'data: {"choices": [{"text": "Metformin "}]}',
+            b'',
+            b': keep-alive',
+            b'data: {"choices": [{"delta": {"content": "is first-line."}}]}',
+            b'',
+            b'data: [DONE]',
+            b'',
+        ]
+        mock_post.return_value = mock_response
+        
+        client = DatabricksGenieClient(api_key="test_key")
+        deltas = list(client.stream_completion("Test prompt"))
+        
+        assert deltas == ["Metformin ", "is first-line."]
+        assert mock_post.call_args.kwargs["stream"] is True
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        mock_response.close.assert_called_once()
+    
+    @patch('requests.Session.post')
+    def test_stream_completion_parses_ndjson(self, mock_post):
+        """Test that newline-delimited JSON chunks are parsed incrementally."""
+        mock_response = MagicMock(status_code=200, headers={"Content-Type": "application/x-ndjson"})
+        mock_response.iter_lines.return_value = [b'{"result": "Hello"}', b'{"result": " world"}']
+        mock_post.return_value = mock_response
+        
+        client = DatabricksGenieClient(api_key="test_key")
+        assert list(client.stream_completion("Test prompt")) == ["Hello", " world"]
+    
+    @patch('requests.Session.post')
+    def test_stream_completion_falls_back_to_full_response(self, mock_post):
+        """Test that a non-streamed JSON body is yielded as a single delta."""
+        mock_response = MagicMock(status_code=200, headers={"Content-Type": "application/json"})
+        mock_response.json.return_value = {"choices": [{"text": " Full answer "}]}
+        mock_post.return_value = mock_response
+        
+        client = DatabricksGenieClient(api_key="test_key")
+        assert list(client.stream_completion("Test prompt")) == ["Full answer"]
@@ -0,0 +1,118 @@
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from benchmarks.mock_genie_server import LatencyModel, MockGenieServer
+from src.endpoint_router import CircuitBreaker, EndpointRouter, resolve_endpoint_urls
+from src.databricks_client import DatabricksGenieClient
+from src.metrics import HEDGED_REQUESTS
+
+class TestCircuitBreaker:
+    """Test cases for the CircuitBreaker class."""
+
+    def test_opens_and_probes(self):
+        """Test that the circuit opens after repeated failures and lets one probe through later."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+class TestEndpointRouter:
+    """Test cases for the EndpointRouter class."""
+
+    def test_prefers_fast_and_idle_endpoints(self):
+        """Test EWMA latency and outstanding-request aware selection."""
+        router = EndpointRouter(["https://a/x", "https://b/x"])
+        fast, slow = router.endpoints[1], router.endpoints[0]
+        fast.ewma_latency, slow.ewma_latency = 0.1, 0.3
+
+        assert router.choose() is fast
+
+        fast.start()
+        fast.start()
+        fast.start()
+        assert router.choose() is slow
+
+    def test_skips_open_circuits_and_fails_open(self):
+        """Test that open circuits are avoided unless every endpoint is open."""
+        router = EndpointRouter(["https://a/x", "https://b/x"])
+        for endpoint in router.endpoints:
+            endpoint.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        router.endpoints[0].start()
+        router.record(router.endpoints[0], None, success=False)
+
+        assert router.choose() is router.endpoints[1]
+
+        router.endpoints[1].start()
+        router.record(router.endpoints[1], None, success=False)
+        assert router.choose() is router.endpoints[0]
+
+    def test_hedge_delay_uses_recent_quantile(self):
+        """Test that no hedging happens until enough samples exist."""
+        router = EndpointRouter(["https://a/x"], hedge_quantile=0.9, hedge_min_samples=10, hedge_min_delay=0)
+        endpoint = router.primary
+        for latency in range(1, 10):
+            endpoint.start()
+            router.record(endpoint, latency / 100, success=True)
+        assert router.hedge_delay() is None
+
+        endpoint.start()
+        router.record(endpoint, 0.10, success=True)
+        assert router.hedge_delay() == pytest.approx(0.09)
+
+    def test_resolve_endpoint_urls(self):
+        """Test that paths are joined to the workspace and full URLs kept."""
+        urls = resolve_endpoint_urls("https://ws.example.com/", ["/api/a", " ", "https://other/api/b"])
+
+        assert urls == ["https://ws.example.com/api/a", "https://other/api/b"]
+
+class TestClientRouting:
+    """Test cases for multi-endpoint routing in DatabricksGenieClient."""
+
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_retry_moves_to_another_endpoint(self, mock_post, mock_sleep):
+        """Test that a failed attempt is retried on a different endpoint."""
+        client = DatabricksGenieClient(api_key="test_key", workspace_url="https://test.databricks.com",
+                                       endpoints=["/api/a", "/api/b"], max_retries=1)
+        unavailable = MagicMock(status_code=503, headers={})
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {"choices": [{"text": "Answer"}]}
+        mock_post.side_effect = [unavailable, ok]
+
+        client.generate_completion("Question")
+
+        urls = [call.args[0] for call in mock_post.call_args_list]
+        assert len(set(urls)) == 2
+        assert client.base_url == "https://test.databricks.com/api/a"
+
+    def test_hedged_request_beats_slow_endpoint(self):
+        """Test that a duplicate sent after the hedge deadline answers first."""
+        with MockGenieServer(latency=LatencyModel("fixed", 1000.0)) as slow, \
+                MockGenieServer(latency=LatencyModel("fixed", 10.0)) as fast:
+            client = DatabricksGenieClient(api_key="hedge_key", workspace_url=slow.url,
+                                           endpoints=[slow.url, fast.url], cache=None)
+            router = client.router
+            router.hedge_min_samples, router.hedge_min_delay = 1, 0.0
+            router._latencies.extend([0.05] * 20)
+            router.endpoints[0].ewma_latency = 0.01
+            router.endpoints[1].ewma_latency = 0.015
+            before = HEDGED_REQUESTS.value(winner="hedge")
+
+            with patch('config.HEDGE_ENABLED', True):
+                response = client.generate_completion("What is hypertension?")
+
+            assert client.extract_response_text(response)
+            assert HEDGED_REQUESTS.value(winner="hedge") == before + 1
+            assert fast.stats["completions"] == 1
+            client.close()
@@ -0,0 +1,119 @@
+import threading
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.followups import FollowupPrefetcher, suggest_followups
+from src.scheduler import Priority, RequestScheduler
+
+ANSWER = "Start metformin for type 2 diabetes and continue lisinopril for hypertension."
+
+def make_client():
+    client = MagicMock()
+    client.generate_completion.return_value = {"choices": [{"text": ANSWER}]}
+    client.extract_response_text.side_effect = lambda response: response["choices"][0]["text"]
+    return client
+
+def wait_for_prefetches(interface):
+    for entry in list(interface.prefetcher._entries.values()):
+        entry.future.result(timeout=2)
+
+class TestSuggestFollowups:
+    """Test cases for the suggest_followups function."""
+
+    def test_suggestions_alternate_between_entities(self):
+        """Test that the most common follow-up of each entity comes first."""
+        assert suggest_followups(ANSWER, limit=4) == [
+            "What is the usual dosing of metformin?",
+            "What is the first-line treatment for type 2 diabetes?",
+            "What is the usual dosing of lisinopril?",
+            "What is the first-line treatment for hypertension?",
+        ]
+
+    def test_skips_asked_questions_and_falls_back_to_question(self):
+        """Test that earlier questions are not suggested again and entity-free answers use the question."""
+        history = [{"role": "user", "content": "What is the usual dosing of Metformin?"},
+                   {"role": "assistant", "content": "It depends on renal function."}]
+
+        assert suggest_followups(history[-1]["content"], history, limit=2) == [
+            "What are the contraindications to Metformin?",
+            "What are the major drug interactions of Metformin?",
+        ]
+        assert suggest_followups("No entities here.", limit=3) == []
+        assert suggest_followups(ANSWER, limit=0) == []
+
+class TestFollowupPrefetch:
+    """Test cases for prefetching suggested follow-ups in ChatInterface."""
+
+    def test_prefetch_is_opt_in(self):
+        """Test that no completions are spent on suggestions unless a budget is configured."""
+        client = make_client()
+        scheduler = RequestScheduler(workers=1)
+        interface = ChatInterface(client, scheduler=scheduler)
+        interface.get_response("Which drugs for diabetes?")
+
+        assert interface.prefetcher is None
+        assert interface.prefetch_followups(interface.followup_suggestions()) == 0
+        assert client.generate_completion.call_count == 1
+        scheduler.shutdown()
+
+    def test_suggestion_is_answered_from_prefetch(self):
+        """Test that asking a suggestion returns the background answer without another call."""
+        client = make_client()
+        scheduler = RequestScheduler(workers=4)
+        interface = ChatInterface(client, scheduler=scheduler,
+                                  prefetcher=FollowupPrefetcher(scheduler, budget=2, ttl=60))
+        interface.get_response("Which drugs for diabetes?")
+
+        suggestions = interface.followup_suggestions()
+        assert interface.prefetch_followups(suggestions) == 2
+        interface._create_context = MagicMock(wraps=interface._create_context)
+        assert interface.prefetch_followups(suggestions) == 2
+        interface._create_context.assert_not_called()
+        wait_for_prefetches(interface)
+        calls = client.generate_completion.call_count
+        prompts = [call.args[0] for call in client.generate_completion.call_args_list]
+
+        client.extract_response_text.side_effect = lambda response: "Fresh answer"
+        assert interface.get_response(suggestions[1]) == ANSWER
+        assert client.generate_completion.call_count == calls
+        assert interface.last_trace.attributes["prefetch_hit"] == 1
+        assert any(prompt.endswith(f"User: {suggestions[1]}\n\n") for prompt in prompts)
+        assert len(interface.prefetcher) == 0
+        scheduler.shutdown()
+
+    def test_other_question_cancels_queued_prefetches(self):
+        """Test that typing something else drops prefetches that have not started."""
+        client = make_client()
+        scheduler = RequestScheduler(workers=2, shares={Priority.BACKGROUND: 0.5})
+        interface = ChatInterface(client, scheduler=scheduler,
+                                  prefetcher=FollowupPrefetcher(scheduler, budget=3, ttl=60))
+        interface.get_response("Which drugs for diabetes?")
+        gate = threading.Event()
+        scheduler.submit(gate.wait, priority=Priority.BACKGROUND)
+
+        interface.prefetch_followups(interface.followup_suggestions())
+        calls = client.generate_completion.call_count
+        interface.get_response("Something else entirely")
+        gate.set()
+        scheduler.shutdown()
+
+        assert client.generate_completion.call_count == calls + 1
+        assert interface.last_trace.attributes["prefetch_hit"] == 0
+
+    def test_prefetch_is_discarded_once_history_moves_on(self):
+        """Test that an answer prepared for an earlier history is not used."""
+        client = make_client()
+        scheduler = RequestScheduler(workers=2)
+        interface = ChatInterface(client, scheduler=scheduler,
+                                  prefetcher=FollowupPrefetcher(scheduler, budget=1, ttl=60))
+        interface.get_response("Which drugs for diabetes?")
+        question = interface.followup_suggestions()[0]
+        interface.prefetch_followups([question])
+        wait_for_prefetches(interface)
+
+        interface.history.append({"role": "user", "content": "Typed elsewhere"})
+        interface.history.append({"role": "assistant", "content": "Noted"})
+        calls = client.generate_completion.call_count
+        interface.get_response(question)
+
+        assert client.generate_completion.call_count == calls + 1
+        scheduler.shutdown()
@@ -0,0 +1,63 @@
+import sys
+from src.history_store import HistoryStore, Message, history_bounds
+from src.context_builder import ContextBuilder
+
+class TestHistoryStore:
+    """Test cases for the HistoryStore and Message classes."""
+    
+    def test_message_behaves_like_dict(self):
+        """Test that messages compare equal to and read like the old dict records."""
+        message = Message("user", "Question")
+        
+        assert message["role"] == "user"
+        assert message == {"role": "user", "content": "Question"}
+        assert message.to_dict() == {"role": "user", "content": "Question"}
+        assert not hasattr(message, "__dict__")
+    
+    def test_roles_are_interned(self):
+        """Test that every message shares a single role string."""
+        a = Message("".join(["assis", "tant"]), "x")
+        b = Message("assistant", "y")
+        assert a.role is b.role is sys.intern("assistant")
+    
+    def test_append_accepts_dicts(self):
+        """Test that appended dicts are stored as Message records."""
+        store = HistoryStore(max_messages=10)
+        store.append({"role": "user", "content": "Question"})
+        
+        assert isinstance(store[0], Message)
+        assert store == [{"role": "user", "content": "Question"}]
+    
+    def test_ring_buffer_cap(self):
+        """Test that the oldest messages are evicted once the cap is reached."""
+        store = HistoryStore(max_messages=3)
+        for i in range(5):
+            store.append({"role": "user", "content": str(i)})
+        
+        assert [m["content"] for m in store] == ["2", "3", "4"]
+        assert store.total_count == 5
+        assert history_bounds(store) == (2, 5)
+    
+    def test_evicted_messages_spill_to_archive(self, tmp_path):
+        """Test that evicted messages can be read back from the gzip archive."""
+        archive = str(tmp_path / "session.jsonl.gz")
+        store = HistoryStore(max_messages=2, archive_path=archive)
+        for i in range(6):
+            store.append({"role": "user" if i % 2 == 0 else "assistant", "content": str(i)})
+        
+        assert [m["content"] for m in store.archived()] == ["0", "1", "2", "3"]
+        assert [m["content"] for m in store] == ["4", "5"]
+    
+    def test_context_builder_follows_evictions(self):
+        """Test that cached prompt segments track a bounded history."""
+        store = HistoryStore(max_messages=2)
+        builder = ContextBuilder(token_budget=1000)
+        for i in range(4):
+            store.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"})
+            builder.sync(store)
+        
+        context = builder.build()
+        assert len(builder) == 2
+        assert "turn 1" not in context
+        assert "User: turn 2" in context
+        assert "Assistant: turn 3" in context
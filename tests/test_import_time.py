@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party and stdlib packages that library modules must only load on first use
+DEFERRED_MODULES = ("requests", "httpx", "numpy", "dotenv", "http.server")
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+def cumulative_import_us(module: str) -> int:
+    """Cumulative import time of a module in a fresh interpreter, from -X importtime."""
+    stderr = run_python("-X", "importtime", "-c", f"import {module}").stderr
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise AssertionError(f"{module} not found in import timings")
+
+class TestImportTime:
+    """Cold-start checks for library modules."""
+
+    @pytest.mark.parametrize("module", ["src.chat_interface", "src.databricks_client",
+                                        "src.async_databricks_client", "src.client_registry",
+                                        "src.bulk_qa", "config"])
+    def test_import_has_no_heavy_dependencies_or_side_effects(self, module):
+        """Test that importing a module loads no deferred dependency and configures no logging."""
+        code = (
+            "import json, logging, sys\n"
+            f"import {module}\n"
+            f"print(json.dumps({{'loaded': [m for m in {DEFERRED_MODULES!r} if m in sys.modules],\n"
+            "                  'handlers': len(logging.getLogger().handlers)}))"
+        )
+        result = json.loads(run_python("-c", code).stdout)
+
+        assert result == {"loaded": [], "handlers": 0}
+
+    @pytest.mark.benchmark
+    def test_chat_interface_imports_faster_than_requests(self):
+        """Benchmark: the chat interface costs less to import than the HTTP library it defers."""
+        chat_interface = min(cumulative_import_us("src.chat_interface") for _ in range(3))
+        requests = min(cumulative_import_us("requests") for _ in range(3))
+
+        assert chat_interface < requests
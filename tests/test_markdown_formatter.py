@@ -0,0 +1,62 @@
+import pytest
+from src.markdown_formatter import StreamingMarkdownFormatter, format_markdown_stream
+from src.utils import format_markdown_response
+
+SAMPLE = (
+    "Metformin is first-line.\n## Dosing\n1. Start 500 mg\n2. Titrate weekly\nMonitor renal function."
+    " ## Contraindications\nSee below:```python print('eGFR < 30')\nstop()```\nDone."
+)
+
+def _stream(text, size):
+    formatter = StreamingMarkdownFormatter()
+    out = [formatter.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    out.append(formatter.flush())
+    return "".join(out)
+
+class TestMarkdownFormatter:
+    """Test cases for the streaming markdown formatter."""
+    
+    def test_headers_get_blank_line(self):
+        """Test that headers are separated from preceding text."""
+        assert format_markdown_response("Intro\n## Dosing\ntext") == "Intro\n\n## Dosing\ntext"
+    
+    def test_run_on_subheading_moves_to_own_line(self):
+        """Test that '## ' sub-headings in the middle of a line are split out."""
+        formatted = format_markdown_response("Monitor renal function. ## Contraindications")
+        assert formatted == "Monitor renal function.\n\n## Contraindications"
+    
+    def test_single_hash_in_text_is_untouched(self):
+        """Test that '#' used in ordinary text is not treated as a header."""
+        text = "Rank #1 among C# users"
+        assert format_markdown_response(text) == text
+    
+    def test_blank_line_after_list(self):
+        """Test that a paragraph after a list is separated by a blank line."""
+        formatted = format_markdown_response("1. One\n2. Two\nAfter")
+        assert formatted == "1. One\n2. Two\n\nAfter"
+    
+    def test_code_fences_on_own_lines(self):
+        """Test that fences are split onto their own lines and closed at end of stream."""
+        formatted = format_markdown_response("Run:```bash ls -la\npwd```\nok\n```\nopen")
+        assert formatted == "Run:\n```bash\nls -la\npwd\n```\nok\n```\nopen\n```"
+    
+    def test_code_fence_contents_untouched(self):
+        """Test that header-like text inside a fence is not reformatted."""
+        text = "```\n# comment ## not a header\n1. x\ny\n```"
+        assert format_markdown_response(text) == text
+    
+    @pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 64])
+    def test_streamed_output_matches_full_format(self, size):
+        """Test that any chunking yields the same output as formatting the whole text."""
+        assert _stream(SAMPLE, size) == format_markdown_response(SAMPLE)
+    
+    def test_output_is_append_only_and_prompt(self):
+        """Test that plain text streams through without waiting for the line to end."""
+        formatter = StreamingMarkdownFormatter()
+        assert formatter.feed("Metformin is") == "Metformin is"
+        assert formatter.feed(" first") == " first"
+    
+    def test_format_markdown_stream(self):
+        """Test the generator wrapper used by the UI."""
+        chunks = ["Intro\n##", " Dosing\n", "text"]
+        assert "".join(format_markdown_stream(iter(chunks))) == "Intro\n\n## Dosing\ntext"
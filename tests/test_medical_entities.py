@@ -0,0 +1,65 @@
+import re
+from src.medical_entities import MedicalEntityExtractor, build_trie_pattern, load_terms
+from src.utils import parse_medical_entities, parse_medical_entities_batch
+
+class TestMedicalEntities:
+    """Test cases for medical entity extraction."""
+    
+    def test_build_trie_pattern_matches_exact_terms(self):
+        """Test that the trie pattern matches each term and nothing partial."""
+        terms = ["metformin", "metoprolol", "met", "insulin glargine", "insulin"]
+        pattern = re.compile(r'\b(?:' + build_trie_pattern(terms) + r')\b')
+        
+        for term in terms:
+            assert pattern.fullmatch(term)
+        assert pattern.search("metfor") is None
+        assert pattern.search("insulin glargine daily").group(0) == "insulin glargine"
+    
+    def test_parse_medical_entities_single_pass(self):
+        """Test that all entity types are found in order of appearance."""
+        text = "Atorvastatin after angioplasty reduces risk in hypertension and CKD."
+        entities = parse_medical_entities(text)
+        
+        assert [(e["type"], e["text"]) for e in entities] == [
+            ("medication", "Atorvastatin"),
+            ("procedure", "angioplasty"),
+            ("condition", "hypertension"),
+            ("condition", "CKD"),
+        ]
+        assert text[entities[0]["start"]:entities[0]["end"]] == "Atorvastatin"
+    
+    def test_suffix_pattern_catches_unlisted_drugs(self):
+        """Test that class suffixes still identify drugs missing from the term list."""
+        entities = parse_medical_entities("Consider zanubrutinib or Xyzumab.")
+        assert [e["text"] for e in entities] == ["zanubrutinib", "Xyzumab"]
+    
+    def test_longest_term_wins(self):
+        """Test that multi-word terms are preferred over their prefixes."""
+        entities = parse_medical_entities("History of type 2 diabetes on insulin glargine.")
+        assert [e["text"] for e in entities] == ["type 2 diabetes", "insulin glargine"]
+    
+    def test_custom_terms_dir(self, tmp_path):
+        """Test that term lists can be loaded from a custom directory."""
+        (tmp_path / "medications.txt").write_text("# comment\nfoomycin\n")
+        (tmp_path / "conditions.txt").write_text("baritis\n")
+        extractor = MedicalEntityExtractor(terms_dir=str(tmp_path))
+        
+        assert load_terms(str(tmp_path / "medications.txt")) == ["foomycin"]
+        assert [e["type"] for e in extractor.extract("Foomycin for baritis")] == ["medication", "condition"]
+    
+    def test_batch_matches_single(self):
+        """Test that the batch API returns the same results as single calls."""
+        texts = ["Metformin for diabetes.", "No entities here.", "Biopsy scheduled."]
+        assert parse_medical_entities_batch(texts) == [parse_medical_entities(t) for t in texts]
+    
+    def test_large_term_list_shares_prefixes(self, tmp_path):
+        """Test that thousands of terms compile to a trie, so matching does not try each term in turn."""
+        words = [f"drug{i}x" for i in range(5000)]
+        (tmp_path / "medications.txt").write_text("\n".join(words))
+        extractor = MedicalEntityExtractor(terms_dir=str(tmp_path))
+        text = ("The patient was started on drug4321x and continued usual care. " * 50)
+        
+        entities = extractor.extract(text)
+        
+        assert len(entities) == 50
+        assert extractor.pattern.pattern.count("drug") == 1
@@ -0,0 +1,99 @@
+import urllib.request
+from unittest.mock import MagicMock
+from src.metrics import (MetricsRegistry, Histogram, STAGE_SECONDS, REQUEST_SECONDS, ERRORS,
+                         current_trace, observe_stage, stage_percentiles, start_metrics_server,
+                         time_stage, trace_request)
+from src.chat_interface import ChatInterface
+
+class TestMetrics:
+    """Test cases for request-path metrics and tracing."""
+
+    def test_histogram_quantiles(self):
+        """Test quantile estimates interpolate within buckets."""
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 0.2, 0.5, 1.0))
+        for _ in range(90):
+            histogram.observe(0.05)
+        for _ in range(10):
+            histogram.observe(0.8)
+
+        assert histogram.count() == 100
+        assert histogram.quantile(0.5) <= 0.1
+        assert 0.5 < histogram.quantile(0.99) <= 1.0
+        assert Histogram("empty", "Empty").quantile(0.5) is None
+
+    def test_render_prometheus(self):
+        """Test the text exposition format for counters and histograms."""
+        registry = MetricsRegistry()
+        counter = registry.counter("lookups_total", "Lookups", ("result",))
+        histogram = registry.histogram("stage_seconds", "Stages", ("stage",), buckets=(0.1, 1.0))
+        counter.inc(result="hit")
+        counter.inc(result="hit")
+        histogram.observe(0.5, stage="http_total")
+
+        text = registry.render_prometheus()
+
+        assert "# TYPE lookups_total counter" in text
+        assert 'lookups_total{result="hit"} 2' in text
+        assert 'stage_seconds_bucket{stage="http_total",le="0.1"} 0' in text
+        assert 'stage_seconds_bucket{stage="http_total",le="1"} 1' in text
+        assert 'stage_seconds_bucket{stage="http_total",le="+Inf"} 1' in text
+        assert 'stage_seconds_count{stage="http_total"} 1' in text
+        assert registry.counter("lookups_total", "Lookups", ("result",)) is counter
+
+    def test_trace_collects_stages(self):
+        """Test that stages timed inside a trace are recorded on it and in the histogram."""
+        before = STAGE_SECONDS.count(stage="unit_stage")
+
+        with trace_request() as trace:
+            assert current_trace() is trace
+            with time_stage("unit_stage"):
+                pass
+            observe_stage("other_stage", 0.25)
+
+        assert current_trace() is None
+        assert [stage for stage, _ in trace.spans] == ["unit_stage", "other_stage"]
+        assert trace.as_dict()["other_stage_ms"] == 250.0
+        assert STAGE_SECONDS.count(stage="unit_stage") == before + 1
+        assert "p95" in stage_percentiles()["unit_stage"]
+
+    def test_chat_interface_records_trace(self):
+        """Test that a chat turn records its timings and sizes."""
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+        client.extract_response_text.return_value = "Answer"
+        interface = ChatInterface(client)
+        before = REQUEST_SECONDS.count(mode="blocking")
+
+        interface.get_response("Question")
+
+        trace = interface.last_trace.as_dict()
+        assert "context_build_ms" in trace
+        assert "extract_ms" in trace
+        assert "total_ms" in trace
+        assert trace["response_chars"] == 6
+        assert REQUEST_SECONDS.count(mode="blocking") == before + 1
+
+    def test_chat_interface_counts_errors(self):
+        """Test that failed turns are counted by stage."""
+        client = MagicMock()
+        client.stream_completion.side_effect = Exception("API Error")
+        interface = ChatInterface(client)
+        before = ERRORS.value(stage="stream_response")
+
+        list(interface.stream_response("Question"))
+
+        assert ERRORS.value(stage="stream_response") == before + 1
+        assert interface.last_trace.as_dict()["error"] == 1
+        assert current_trace() is None
+
+    def test_metrics_endpoint(self):
+        """Test that the metrics server serves the registry."""
+        server = start_metrics_server(0)
+        port = server.server_address[1]
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+
+        assert response.status == 200
+        assert "clinical_chatbot_stage_seconds" in body
+        assert start_metrics_server(0) is server
@@ -0,0 +1,143 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.phi_redaction import (Detector, PHIRedactor, RedactionMap, get_default_redactor, normalize_input,
+                               prepare_input)
+from src.semantic_cache import SemanticCache
+from src.utils import sanitize_input
+
+NOTE = ("Patient John Smith, DOB 03/14/1961, MRN: 12345678, call (555) 123-4567 "
+        "or john.smith@example.com, SSN 123-45-6789.")
+
+class TestPHIRedactor:
+    """Test cases for the PHIRedactor class."""
+
+    def test_redacts_identifiers_and_restores(self):
+        """Test each default detector and the reversible mapping."""
+        redacted, mapping = get_default_redactor().redact(NOTE)
+
+        assert redacted == ("Patient [NAME_1], DOB [DATE_1], MRN: [MRN_1], call [PHONE_1] "
+                            "or [EMAIL_1], SSN [SSN_1].")
+        assert mapping.restore(redacted) == NOTE
+
+    def test_clinical_text_is_untouched(self):
+        """Test that doses, vitals, ages and lab values are not mistaken for identifiers."""
+        text = ("65 year old on metformin 1000 mg BID, BP 140/90, HR 72, eGFR 45 mL/min, "
+                "HbA1c 7.5%, started 2 weeks ago. What about Lisinopril 10 mg?")
+
+        assert get_default_redactor().redact(text)[0] == text
+        assert not get_default_redactor().contains_phi(text)
+
+    def test_mapping_is_stable_across_turns(self):
+        """Test that a shared mapping gives the same identifier the same placeholder."""
+        redactor, mapping = get_default_redactor(), RedactionMap()
+        first, _ = redactor.redact("Mrs. O'Brien was seen on March 3, 2024", mapping)
+        second, _ = redactor.redact("Is Mrs. O'Brien due for a follow-up? Ask Dr. Patel", mapping)
+
+        assert first == "Mrs. [NAME_1] was seen on [DATE_1]"
+        assert second == "Is Mrs. [NAME_1] due for a follow-up? Ask Dr. [NAME_2]"
+        assert len(mapping) == 3
+
+    def test_full_names_and_exact_identifiers_are_remembered(self):
+        """Test that later bare mentions of a full name or an MRN are redacted, case-sensitively."""
+        redactor, mapping = get_default_redactor(), RedactionMap()
+        redactor.redact("Patient John Smith, MRN: 12345678", mapping)
+
+        assert redactor.redact("Should John Smith repeat labs for 12345678?", mapping)[0] == \
+            "Should [NAME_1] repeat labs for [MRN_1]?"
+        assert redactor.redact("john smith", mapping)[0] == "john smith"
+
+    def test_common_word_names_are_not_remembered(self):
+        """Test that a one-word name such as "Dr. May" does not mask the word elsewhere."""
+        redactor, mapping = get_default_redactor(), RedactionMap()
+
+        assert redactor.redact("Dr. May suggested labs. Pt Denies chest pain.", mapping)[0] == \
+            "Dr. [NAME_1] suggested labs. Pt [NAME_2] chest pain."
+        text = "You may continue; the patient denies pain and May is fine. Will review."
+        assert redactor.redact(text, mapping)[0] == text
+        assert mapping.restore("Dr. [NAME_1] may call") == "Dr. May may call"
+
+    def test_custom_detectors(self):
+        """Test that detectors are pluggable and a value group keeps its label."""
+        redactor = PHIRedactor([Detector("BED", r"\bbed\s+(?P<value>\d{1,3}[A-Z]?)\b", flags=2)])
+
+        assert redactor.redact("Patient in Bed 12B")[0] == "Patient in Bed [BED_1]"
+        with pytest.raises(ValueError):
+            Detector("bed", r"\d+")
+
+    def test_restore_stream_handles_split_placeholders(self):
+        """Test that a placeholder split across deltas is restored whole."""
+        _, mapping = get_default_redactor().redact("Patient Jane Doe")
+        deltas = ["Hello [NA", "ME_1], your [", "lab] results", " [NAME_9] ["]
+
+        assert "".join(mapping.restore_stream(deltas)) == "Hello Jane Doe, your [lab] results [NAME_9] ["
+
+    def test_prepare_input_order(self):
+        """Test that normalization and redaction run before sanitizing."""
+        text = "Email：ｊａｎｅ@example.com <b>about</b> BP 140/90​"
+
+        assert prepare_input(text, get_default_redactor(), RedactionMap()) == "Email:[EMAIL_1] babout/b BP 140/90"
+        assert normalize_input("a \t b​") == "a b"
+        assert sanitize_input("rm -rf `x` & $y") == "rm -rf x  y"
+
+    def test_redact_batch(self):
+        """Test that batch redaction gives each text its own mapping."""
+        results = get_default_redactor().redact_batch(["Call 555-123-4567", "Call 555-987-6543"])
+
+        assert [text for text, _ in results] == ["Call [PHONE_1]", "Call [PHONE_1]"]
+        assert results[1][1].restore("[PHONE_1]") == "555-987-6543"
+
+    @pytest.mark.benchmark
+    def test_throughput(self):
+        """Benchmark: typical chat turns are redacted in well under a millisecond."""
+        redactor = get_default_redactor()
+        texts = [f"{NOTE} What is the first-line treatment for hypertension in a 65 year old "
+                 f"with CKD stage 3 on metformin 1000 mg? Visit {index}" for index in range(2000)]
+
+        started = time.perf_counter()
+        for text, _ in redactor.redact_batch(texts):
+            assert "John" not in text
+        per_text = (time.perf_counter() - started) / len(texts)
+
+        assert per_text < 0.0005
+
+class TestChatInterfaceRedaction:
+    """Test cases for PHI redaction in ChatInterface."""
+
+    def test_prompt_is_redacted_and_answer_restored(self):
+        """Test that identifiers never reach the client but appear in the answer shown locally."""
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "[NAME_1] should repeat labs."}]}
+        client.extract_response_text.side_effect = lambda response: response["choices"][0]["text"]
+        interface = ChatInterface(client, redactor=get_default_redactor())
+
+        response = interface.get_response("Patient John Smith, DOB 03/14/1961, has an eGFR of 40")
+        interface.get_response("Should John Smith stop metformin?")
+
+        prompts = " ".join(call.args[0] for call in client.generate_completion.call_args_list)
+        assert "John" not in prompts and "1961" not in prompts
+        assert "Patient [NAME_1], DOB [DATE_1], has an eGFR of 40" in prompts
+        assert "Assistant: [NAME_1] should repeat labs." in prompts
+        assert response == "John Smith should repeat labs."
+        assert interface.history[0]["content"].startswith("Patient John Smith")
+
+    def test_streamed_answer_is_restored(self):
+        """Test re-identification of a streamed answer."""
+        client = MagicMock()
+        client.stream_completion.return_value = iter(["[NAM", "E_1] is ", "stable"])
+        interface = ChatInterface(client, redactor=get_default_redactor())
+
+        assert "".join(interface.stream_response("How is Mr. Jones?")) == "Jones is stable"
+        assert "Jones" not in client.stream_completion.call_args.args[0]
+
+    def test_questions_with_identifiers_skip_semantic_cache(self):
+        """Test that answers about identified patients are never shared through the semantic cache."""
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+        client.extract_response_text.return_value = "Answer"
+        cache = SemanticCache(max_entries=10, ttl=60)
+
+        ChatInterface(client, semantic_cache=cache).get_response("Side effects of metformin for patient John Smith")
+
+        assert len(cache) == 0
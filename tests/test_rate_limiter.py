@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from src.rate_limiter import (AdaptiveConcurrencyLimiter, RateLimiter, RateLimitTimeout,
+                              TokenBucket, get_rate_limiter)
+from src.databricks_client import DatabricksGenieClient
+
+class TestTokenBucket:
+    """Test cases for the TokenBucket class."""
+
+    def test_burst_then_wait(self):
+        """Test that a full bucket allows a burst and then reports the refill wait."""
+        bucket = TokenBucket(rate=10, burst=3)
+
+        assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert 0 < bucket.try_acquire() <= 0.1
+
+    def test_acquire_times_out(self):
+        """Test that acquire gives up once the timeout expires."""
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.try_acquire()
+
+        assert bucket.acquire(timeout=0.01) is False
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test cases for the AdaptiveConcurrencyLimiter class."""
+
+    def test_additive_increase(self):
+        """Test that successful requests grow the limit by about one per window."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=10, name="test")
+
+        for _ in range(5):
+            limiter.release(limiter.acquire(), latency=0.1)
+
+        assert limiter.limit == 5
+        assert limiter.in_flight == 0
+
+    def test_burst_of_overloads_cuts_once(self):
+        """Test that concurrent 429s halve the limit once rather than collapsing it."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=10, name="test")
+        admitted = [limiter.acquire() for _ in range(8)]
+
+        for admitted_at in admitted:
+            limiter.release(admitted_at, overloaded=True)
+
+        assert limiter.limit == 4
+
+        # A request admitted after the cut can cut again
+        limiter.release(limiter.acquire(), overloaded=True)
+        assert limiter.limit == 2
+
+    def test_latency_spike_reduces_limit(self):
+        """Test that latency well above the baseline counts as overload."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=10,
+                                             latency_tolerance=2.0, name="test")
+        for _ in range(5):
+            limiter.release(limiter.acquire(), latency=0.1)
+        limit = limiter.limit
+
+        limiter.release(limiter.acquire(), latency=1.0)
+
+        assert limiter.limit == limit // 2
+
+    def test_full_limiter_queues_until_release(self):
+        """Test that a caller waits for a slot instead of failing."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, name="test")
+        held = limiter.acquire()
+
+        assert limiter.try_acquire() is None
+        threading.Timer(0.05, lambda: limiter.release(held, latency=0.01)).start()
+        assert limiter.acquire(timeout=2) is not None
+
+class TestRateLimiter:
+    """Test cases for the RateLimiter class."""
+
+    def test_acquire_raises_after_queue_timeout(self):
+        """Test that a request gives up once the queue timeout expires."""
+        concurrency = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, name="test")
+        limiter = RateLimiter(rate=0, concurrency=concurrency, queue_timeout=0.01)
+        limiter.acquire()
+
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire()
+
+    def test_acquire_async(self):
+        """Test that async callers queue on the shared limiter without blocking the loop."""
+        concurrency = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1, max_limit=2, name="test")
+        limiter = RateLimiter(rate=0, concurrency=concurrency, queue_timeout=5)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            admitted_at = await limiter.acquire_async()
+            peak = max(peak, concurrency.in_flight)
+            await asyncio.sleep(0.01)
+            limiter.release(admitted_at, 200, 0.01)
+
+        async def run():
+            await asyncio.gather(*(request() for _ in range(6)))
+
+        asyncio.run(run())
+        assert peak == 2
+        assert concurrency.in_flight == 0
+
+    def test_shared_per_workspace_token(self):
+        """Test that clients with the same credentials share one limiter."""
+        a = DatabricksGenieClient(api_key="shared-key", workspace_url="https://shared.example.com")
+        b = DatabricksGenieClient(api_key="shared-key", workspace_url="https://shared.example.com/")
+        c = DatabricksGenieClient(api_key="other-key", workspace_url="https://shared.example.com")
+
+        assert a.rate_limiter is b.rate_limiter
+        assert a.rate_limiter is not c.rate_limiter
+        assert get_rate_limiter("https://shared.example.com", "shared-key") is a.rate_limiter
+
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_client_throttling_shrinks_limit(self, mock_post, mock_sleep):
+        """Test that a 429 seen by the client reduces the concurrency limit and is retried."""
+        concurrency = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=8, name="test")
+        limiter = RateLimiter(rate=0, concurrency=concurrency, queue_timeout=1)
+        client = DatabricksGenieClient(api_key="test_key", workspace_url="https://test.databricks.com",
+                                       max_retries=1, rate_limiter=limiter)
+        throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {"choices": [{"text": "Answer"}]}
+        mock_post.side_effect = [throttled, ok]
+
+        assert client.generate_completion("Question") == {"choices": [{"text": "Answer"}]}
+        assert concurrency.limit == 4
+        assert concurrency.in_flight == 0
@@ -0,0 +1,112 @@
+from unittest.mock import patch, MagicMock
+from src.response_cache import ResponseCache, make_cache_key
+from src.databricks_client import DatabricksGenieClient
+
+def _payload(prompt="What is the dosing of atorvastatin in CKD?", temperature=0.3):
+    return {"model": "genie-1-mistral", "prompt": prompt, "max_tokens": 2000, "temperature": temperature}
+
+class TestResponseCache:
+    """Test cases for the ResponseCache class."""
+    
+    def test_make_cache_key_normalizes_prompt(self):
+        """Test that whitespace differences share a key but case differences do not."""
+        a = make_cache_key(_payload("Dosing of  atorvastatin\nin CKD"))
+        b = make_cache_key(_payload("Dosing of atorvastatin in CKD"))
+        c = make_cache_key(dict(_payload(), max_tokens=100))
+        
+        assert a == b
+        assert a != c
+        assert make_cache_key(_payload("Dose for MS")) != make_cache_key(_payload("Dose for ms"))
+    
+    def test_get_and_set(self):
+        """Test cache hits, misses and counters."""
+        cache = ResponseCache(max_entries=10, ttl=60, db_path="")
+        key = make_cache_key(_payload())
+        
+        assert cache.get(key) is None
+        cache.set(key, {"result": "cached"})
+        assert cache.get(key) == {"result": "cached"}
+        
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2, ttl=60, db_path="")
+        cache.set("a", {"result": "a"})
+        cache.set("b", {"result": "b"})
+        cache.get("a")
+        cache.set("c", {"result": "c"})
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == {"result": "a"}
+        assert cache.get("c") == {"result": "c"}
+    
+    def test_ttl_expiry(self):
+        """Test that expired entries are not served."""
+        cache = ResponseCache(max_entries=10, ttl=60, db_path="")
+        with patch('time.time', return_value=1000.0):
+            cache.set("a", {"result": "a"})
+        with patch('time.time', return_value=1061.0):
+            assert cache.get("a") is None
+    
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that the SQLite tier serves entries to a fresh cache instance."""
+        db_path = str(tmp_path / "responses.db")
+        ResponseCache(max_entries=10, ttl=60, db_path=db_path).set("a", {"result": "persisted"})
+        
+        restarted = ResponseCache(max_entries=10, ttl=60, db_path=db_path)
+        assert restarted.get("a") == {"result": "persisted"}
+        assert restarted.stats()["disk_hits"] == 1
+    
+    def test_expired_rows_are_purged_periodically(self, tmp_path):
+        """Test that expired SQLite rows are swept at most once per purge interval."""
+        cache = ResponseCache(max_entries=10, ttl=60, db_path=str(tmp_path / "responses.db"))
+        rows = lambda: cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with patch('time.time', return_value=1000.0):
+            cache.set("a", {"result": "a"})
+        with patch('time.time', return_value=1100.0):
+            cache.set("b", {"result": "b"})
+            assert rows() == 2
+            assert cache.get("a") is None
+        with patch('time.time', return_value=1400.0):
+            cache.set("c", {"result": "c"})
+            assert rows() == 1
+    
+    def test_high_temperature_bypasses_cache(self):
+        """Test that sampled requests above the threshold are not cacheable."""
+        cache = ResponseCache(max_entries=10, ttl=60, db_path="", max_temperature=0.5)
+        
+        assert cache.is_cacheable(_payload(temperature=0.3))
+        assert not cache.is_cacheable(_payload(temperature=0.9))
+        assert cache.stats()["bypassed"] == 1
+    
+    @patch('requests.Session.post')
+    def test_client_serves_repeated_question_from_cache(self, mock_post):
+        """Test that the client only calls upstream once for a repeated question."""
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {"result": "Cached answer"}
+        mock_post.return_value = mock_response
+        
+        cache = ResponseCache(max_entries=10, ttl=60, db_path="")
+        client = DatabricksGenieClient(api_key="test_key", cache=cache)
+        first = client.generate_completion("Dosing of atorvastatin in CKD?")
+        second = client.generate_completion("Dosing of atorvastatin in CKD?")
+        
+        assert first == second == {"result": "Cached answer"}
+        mock_post.assert_called_once()
+    
+    @patch('requests.Session.post')
+    def test_client_caches_completed_stream(self, mock_post):
+        """Test that a completed stream is cached and replayed as one delta."""
+        mock_response = MagicMock(status_code=200, headers={"Content-Type": "text/event-stream"})
+        mock_response.iter_lines.return_value = [b'data: {"result": "Hello "}', b'', b'data: {"result": "world"}', b'']
+        mock_post.return_value = mock_response
+        
+        client = DatabricksGenieClient(api_key="test_key",
+                                       cache=ResponseCache(max_entries=10, ttl=60, db_path=""))
+        assert list(client.stream_completion("Test prompt")) == ["Hello ", "world"]
+        assert list(client.stream_completion("Test prompt")) == ["Hello world"]
+        mock_post.assert_called_once()
@@ -0,0 +1,160 @@
+import threading
+import time
+import pytest
+from concurrent.futures import CancelledError
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.metrics import SCHEDULER_DROPPED, RequestTrace, trace_request
+from src.scheduler import DeadlineExceeded, Priority, RequestScheduler
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class TestRequestScheduler:
+    """Test cases for the RequestScheduler class."""
+
+    def test_most_urgent_class_runs_first(self):
+        """Test that a freed worker goes to interactive work ahead of earlier bulk work."""
+        scheduler = RequestScheduler(workers=1)
+        gate = threading.Event()
+        order = []
+        scheduler.submit(gate.wait, priority=Priority.BULK)
+        futures = [scheduler.submit(order.append, "bulk", priority=Priority.BULK),
+                   scheduler.submit(order.append, "background", priority=Priority.BACKGROUND),
+                   scheduler.submit(order.append, "interactive", priority=Priority.INTERACTIVE)]
+
+        assert scheduler.queue_depth() == 3
+        gate.set()
+        for future in futures:
+            future.result(timeout=1)
+
+        assert order == ["interactive", "background", "bulk"]
+        scheduler.shutdown()
+
+    def test_shares_reserve_capacity_for_interactive(self):
+        """Test that bulk work never occupies more than its share of workers."""
+        scheduler = RequestScheduler(workers=4, shares={Priority.BULK: 0.5})
+        gate = threading.Event()
+        bulk = [scheduler.submit(gate.wait, priority=Priority.BULK) for _ in range(6)]
+
+        assert scheduler.running(Priority.BULK) == 2
+        assert scheduler.queue_depth(Priority.BULK) == 4
+        assert scheduler.call(lambda: "now", timeout=1) == "now"
+        gate.set()
+        for future in bulk:
+            future.result(timeout=1)
+        scheduler.shutdown()
+
+    def test_expired_and_cancelled_requests_are_dropped(self):
+        """Test deadline-aware dropping of requests nobody is waiting for any more."""
+        scheduler = RequestScheduler(workers=1)
+        gate = threading.Event()
+        ran = []
+        scheduler.submit(gate.wait)
+        expired = scheduler.submit(ran.append, "expired", timeout=0.01)
+        cancelled = scheduler.submit(ran.append, "cancelled")
+        dropped_before = SCHEDULER_DROPPED.value(priority="interactive", reason="deadline")
+
+        cancelled.cancel()
+        with pytest.raises(DeadlineExceeded):
+            scheduler.call(ran.append, "waited", timeout=0.02)
+        time.sleep(0.02)
+        gate.set()
+
+        with pytest.raises(DeadlineExceeded):
+            expired.result(timeout=1)
+        with pytest.raises(CancelledError):
+            cancelled.result(timeout=1)
+        assert ran == []
+        assert SCHEDULER_DROPPED.value(priority="interactive", reason="deadline") == dropped_before + 1
+        scheduler.shutdown()
+
+    def test_slot_holds_capacity_on_caller_thread(self):
+        """Test that a slot counts against the pool and times out when none is free."""
+        scheduler = RequestScheduler(workers=1)
+        with scheduler.slot(Priority.INTERACTIVE):
+            assert scheduler.running() == 1
+            with pytest.raises(DeadlineExceeded):
+                with scheduler.slot(Priority.BACKGROUND, timeout=0.01):
+                    pass
+        assert scheduler.running() == 0
+        assert scheduler.queue_depth() == 0
+
+    def test_shutdown_fails_callers_waiting_for_a_slot(self):
+        """Test that shutdown wakes a thread blocked in slot() instead of leaving it hanging."""
+        scheduler = RequestScheduler(workers=1)
+        errors = []
+
+        def wait_for_slot():
+            try:
+                with scheduler.slot(Priority.BACKGROUND):
+                    pass
+            except RuntimeError as e:
+                errors.append(e)
+
+        with scheduler.slot(Priority.INTERACTIVE):
+            waiter = threading.Thread(target=wait_for_slot, daemon=True)
+            waiter.start()
+            while scheduler.queue_depth() == 0:
+                time.sleep(0.001)
+            scheduler.shutdown()
+            waiter.join(timeout=1)
+
+        assert not waiter.is_alive()
+        assert len(errors) == 1
+        with pytest.raises(RuntimeError):
+            with scheduler.slot():
+                pass
+
+    def test_calls_record_into_the_callers_trace(self):
+        """Test that scheduled calls run in the submitting context."""
+        scheduler = RequestScheduler(workers=2)
+        trace = RequestTrace()
+        with trace_request(trace):
+            scheduler.call(lambda: None)
+
+        assert [stage for stage, _ in trace.spans] == ["scheduler_wait"]
+        scheduler.shutdown()
+
+    @pytest.mark.benchmark
+    def test_interactive_latency_under_bulk_load(self):
+        """Benchmark: interactive p95 stays flat while bulk work saturates its share."""
+        scheduler = RequestScheduler(workers=8, shares={Priority.BULK: 0.75})
+        bulk = [scheduler.submit(time.sleep, 0.01, priority=Priority.BULK) for _ in range(200)]
+        waits = []
+        for _ in range(20):
+            started = time.perf_counter()
+            scheduler.call(lambda: None)
+            waits.append(time.perf_counter() - started)
+            time.sleep(0.005)
+        for future in bulk:
+            future.result(timeout=5)
+
+        assert percentile(waits, 0.95) < 0.01
+        scheduler.shutdown()
+
+class TestChatInterfaceScheduling:
+    """Test cases for queueing ChatInterface upstream calls through the scheduler."""
+
+    def test_completions_run_on_scheduler_workers(self):
+        """Test that blocking and streamed completions take scheduler capacity."""
+        scheduler = RequestScheduler(workers=2, name="test-scheduler")
+        client = MagicMock()
+        threads = []
+        client.generate_completion.side_effect = lambda context: threads.append(threading.current_thread().name)
+        client.extract_response_text.return_value = "Answer"
+
+        def stream(context):
+            threads.append(scheduler.running(Priority.INTERACTIVE))
+            yield "Streamed"
+
+        client.stream_completion.side_effect = stream
+        interface = ChatInterface(client, scheduler=scheduler)
+
+        assert interface.get_response("Question") == "Answer"
+        assert list(interface.stream_response("Another")) == ["Streamed"]
+        assert threads[0].startswith("test-scheduler")
+        assert threads[1] == 1
+        assert scheduler.running() == 0
+        scheduler.shutdown()
@@ -0,0 +1,146 @@
+import numpy as np
+from unittest.mock import patch, MagicMock
+from src.semantic_cache import HashingEmbedder, SemanticCache, normalize_question
+from src.chat_interface import ChatInterface
+
+class TestSemanticCache:
+    """Test cases for the SemanticCache class."""
+
+    def test_paraphrase_hits(self):
+        """Test that paraphrased questions share an answer."""
+        cache = SemanticCache(max_entries=100, ttl=60)
+        cache.set("What are the side effects of metformin?", "GI upset, lactic acidosis (rare).")
+
+        assert cache.get("metformin adverse effects") == "GI upset, lactic acidosis (rare)."
+        assert cache.get("Side effects of metformin") == "GI upset, lactic acidosis (rare)."
+        assert cache.stats()["hits"] == 2
+
+    def test_different_entities_miss(self):
+        """Test that similar wording about a different drug or condition never hits."""
+        cache = SemanticCache(max_entries=100, ttl=60)
+        cache.set("side effects of metformin", "Metformin answer")
+        cache.set("treatment for hypertension", "Hypertension answer")
+
+        assert cache.get("side effects of lisinopril") is None
+        assert cache.get("treatment for hypotension") is None
+        assert cache.get("how does metformin work") is None
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are not served."""
+        cache = SemanticCache(max_entries=100, ttl=60)
+        with patch('time.time', return_value=1000.0):
+            cache.set("dosing of atorvastatin in CKD", "Answer")
+        with patch('time.time', return_value=1030.0):
+            assert cache.get("atorvastatin dose in chronic kidney disease") == "Answer"
+        with patch('time.time', return_value=1061.0):
+            assert cache.get("atorvastatin dose in chronic kidney disease") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        embedder = HashingEmbedder(dim=64)
+        cache = SemanticCache(embedder=embedder, max_entries=2, ttl=60, signature=None)
+        cache.set("alpha question", "a")
+        cache.set("beta question", "b")
+        cache.get("alpha question")
+        cache.set("gamma question", "c")
+
+        assert len(cache) == 2
+        assert cache.get("beta question") is None
+        assert cache.get("alpha question") == "a"
+        assert cache.get("gamma question") == "c"
+
+    def test_full_cache_reuses_expired_rows(self):
+        """Test that a full cache frees expired rows first and tracks live rows as it churns."""
+        cache = SemanticCache(embedder=HashingEmbedder(dim=64), max_entries=4, ttl=60, signature=None)
+        with patch('time.time', return_value=1000.0):
+            for word in ["kilo", "lima", "mike"]:
+                cache.set(f"{word} question", "old")
+        with patch('time.time', return_value=1050.0):
+            cache.set("recent question", "recent")
+        with patch('time.time', return_value=1070.0):
+            cache.set("new question", "new")
+            assert cache.get("recent question") == "recent"
+            for index, word in enumerate(["alpha", "bravo", "charlie", "delta", "echo", "foxtrot"]):
+                cache.set(f"{word} question", str(index))
+
+        assert len(cache) == 4
+        assert int(cache._live.sum()) == len(cache)
+        assert [row for row, live in enumerate(cache._live) if live] == \
+            [row for row, codes in enumerate(cache._codes) if codes is not None]
+
+    def test_repeated_question_refreshes_its_entry(self):
+        """Test that caching a question again replaces its answer and TTL instead of adding a duplicate."""
+        cache = SemanticCache(max_entries=100, ttl=60)
+        with patch('time.time', return_value=1000.0):
+            cache.set("What are the side effects of metformin?", "Old answer")
+        with patch('time.time', return_value=1050.0):
+            cache.set("Side effects of metformin", "New answer")
+            cache.set("What are the side effects of metformin?", "New answer")
+        with patch('time.time', return_value=1070.0):
+            assert cache.get("metformin adverse effects") == "New answer"
+
+        assert len(cache) == 1
+        assert sum(len(bucket) for bucket in cache._buckets[0].values()) == 1
+
+    def test_lookup_scores_few_candidates_at_scale(self):
+        """Test that LSH narrows 100k entries to a small candidate set without losing exact matches."""
+        class RandomEmbedder:
+            dim = 256
+
+        cache = SemanticCache(embedder=RandomEmbedder(), max_entries=100_000, ttl=600, signature=None)
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((100_000, 256)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for index, vector in enumerate(vectors):
+            cache.add(vector, str(index))
+
+        def candidates(vector):
+            rows = set()
+            for table, code in enumerate(cache._signatures(vector)):
+                rows.update(cache._buckets[table].get(int(code), ()))
+            return len(rows)
+
+        found = sum(cache.lookup(vectors[index])[0] == str(index) for index in range(200))
+        scored = max(candidates(vectors[index]) for index in range(200))
+
+        assert found == 200
+        assert scored < 2000
+
+    def test_normalize_question(self):
+        """Test canonical rewriting of common paraphrases."""
+        assert normalize_question("Adverse reactions and DOSING in CKD") == \
+            "side effects and dose in chronic kidney disease"
+
+class TestChatInterfaceSemanticCache:
+    """Test cases for semantic caching in ChatInterface."""
+
+    def test_opening_question_served_from_cache(self):
+        """Test that a paraphrased opening question skips the model call."""
+        client = MagicMock()
+        client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+        client.extract_response_text.return_value = "Answer"
+        cache = SemanticCache(max_entries=100, ttl=60)
+
+        ChatInterface(client, semantic_cache=cache).get_response("side effects of metformin")
+        second = ChatInterface(client, semantic_cache=cache)
+        response = second.get_response("metformin adverse effects")
+
+        assert response == "Answer"
+        assert client.generate_completion.call_count == 1
+        assert second.history[-1]["content"] == "Answer"
+
+    def test_follow_up_questions_bypass_cache(self):
+        """Test that turns depending on earlier context are neither looked up nor stored."""
+        client = MagicMock()
+        client.stream_completion.return_value = iter(["Follow-up answer"])
+        cache = MagicMock()
+        interface = ChatInterface(client, semantic_cache=cache)
+        interface.history = [
+            {"role": "user", "content": "Tell me about metformin"},
+            {"role": "assistant", "content": "Metformin is..."}
+        ]
+
+        assert "".join(interface.stream_response("And its side effects?")) == "Follow-up answer"
+        cache.get.assert_not_called()
+        cache.set.assert_not_called()
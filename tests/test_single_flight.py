@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import httpx
+from unittest.mock import patch, MagicMock
+from src.single_flight import SingleFlight, AsyncSingleFlight, make_flight_key
+from src.databricks_client import DatabricksGenieClient
+from src.async_databricks_client import AsyncDatabricksGenieClient
+
+class TestSingleFlight:
+    """Test cases for request coalescing."""
+    
+    def test_make_flight_key_is_exact(self):
+        """Test that only identical payloads share a key."""
+        a = {"model": "m", "prompt": "p", "temperature": 0.3}
+        b = {"temperature": 0.3, "prompt": "p", "model": "m"}
+        c = {"model": "m", "prompt": "P", "temperature": 0.3}
+        
+        assert make_flight_key(a) == make_flight_key(b)
+        assert make_flight_key(a) != make_flight_key(c)
+        assert make_flight_key(a, "x") != make_flight_key(a, "y")
+    
+    def test_concurrent_threads_share_one_call(self):
+        """Test that concurrent callers with the same key run fn once."""
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+        
+        def fn():
+            calls.append(1)
+            release.wait(1)
+            return "shared"
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert len(calls) == 1
+        assert results == ["shared"] * 5
+        assert flight.in_flight() == 0
+    
+    def test_errors_propagate_to_all_callers(self):
+        """Test that an exception from the shared call reaches every waiter."""
+        flight = SingleFlight()
+        
+        def failing():
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError):
+            flight.do("k", failing)
+        
+        # The failed call is forgotten so the next caller retries
+        assert flight.do("k", lambda: "recovered") == "recovered"
+    
+    def test_async_callers_share_one_task(self):
+        """Test that concurrent coroutines with the same key await one task."""
+        flight = AsyncSingleFlight()
+        calls = []
+        
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "shared"
+        
+        async def run():
+            return await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        
+        assert asyncio.run(run()) == ["shared"] * 5
+        assert len(calls) == 1
+        assert flight.in_flight() == 0
+    
+    def test_async_task_is_cancelled_when_last_caller_leaves(self):
+        """Test that the shared task outlives one timed-out caller but not all of them."""
+        flight = AsyncSingleFlight()
+        cancelled = []
+        
+        async def fn():
+            try:
+                await asyncio.sleep(0.05)
+                return "shared"
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        async def run():
+            patient = asyncio.ensure_future(flight.do("k", fn))
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(flight.do("k", fn), 0.01)
+            assert await patient == "shared"
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(flight.do("k", fn), 0.01)
+            assert cancelled == [1]
+            assert flight.in_flight() == 0
+        
+        asyncio.run(run())
+    
+    @patch('requests.Session.post')
+    def test_client_coalesces_identical_requests(self, mock_post):
+        """Test that concurrent identical completions make one upstream request."""
+        release = threading.Event()
+        
+        def slow_post(*args, **kwargs):
+            release.wait(1)
+            response = MagicMock(status_code=200)
+            response.json.return_value = {"result": "Coalesced"}
+            return response
+        
+        mock_post.side_effect = slow_post
+        client = DatabricksGenieClient(api_key="test_key")
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.generate_completion("Same question")))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert mock_post.call_count == 1
+        assert results == [{"result": "Coalesced"}] * 4
+    
+    def test_async_client_coalesces_identical_requests(self):
+        """Test that the async client shares one request for duplicate prompts."""
+        requests_seen = []
+        
+        async def handler(request):
+            requests_seen.append(json.loads(request.content))
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"result": "Coalesced"})
+        
+        client = AsyncDatabricksGenieClient(api_key="test_key", transport=httpx.MockTransport(handler))
+        results = asyncio.run(client.batch_complete(["Same question"] * 3 + ["Other question"]))
+        
+        assert len(requests_seen) == 2
+        assert results[:3] == [{"result": "Coalesced"}] * 3
@@ -0,0 +1,71 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.databricks_client import DatabricksGenieClient
+from src.summarizer import ConversationSummarizer
+
+def _history(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"} for i in range(count)]
+
+class TestConversationSummarizer:
+    """Test cases for the ConversationSummarizer class."""
+    
+    @pytest.fixture
+    def mock_client(self):
+        """Create a mock Databricks client that returns a fixed summary."""
+        client = MagicMock(spec=DatabricksGenieClient)
+        client.generate_completion.return_value = {"result": "Patient on metformin."}
+        client.extract_response_text.return_value = "Patient on metformin."
+        return client
+    
+    def test_no_refresh_below_threshold(self, mock_client):
+        """Test that short conversations are not summarized."""
+        summarizer = ConversationSummarizer(mock_client, trigger_messages=4, keep_recent=2)
+        
+        assert summarizer.maybe_refresh(_history(5)) is None
+        assert summarizer.snapshot() == ("", 0)
+    
+    def test_refresh_folds_older_turns(self, mock_client):
+        """Test that turns outside the recent window are folded into the summary."""
+        summarizer = ConversationSummarizer(mock_client, trigger_messages=4, keep_recent=2,
+                                            executor=ThreadPoolExecutor(max_workers=1))
+        future = summarizer.maybe_refresh(_history(8))
+        future.result(timeout=5)
+        
+        assert summarizer.snapshot() == ("Patient on metformin.", 6)
+        prompt = mock_client.generate_completion.call_args.args[0]
+        assert "User: turn 0" in prompt
+        assert "turn 6" not in prompt
+    
+    def test_refresh_failure_keeps_verbatim_turns(self, mock_client):
+        """Test that a failed summary leaves the history unsummarized."""
+        mock_client.generate_completion.side_effect = Exception("upstream down")
+        summarizer = ConversationSummarizer(mock_client, trigger_messages=4, keep_recent=2,
+                                            executor=ThreadPoolExecutor(max_workers=1))
+        summarizer.maybe_refresh(_history(8)).result(timeout=5)
+        
+        assert summarizer.snapshot() == ("", 0)
+    
+    def test_reset_discards_in_flight_refresh(self, mock_client):
+        """Test that a refresh finishing after reset does not apply."""
+        summarizer = ConversationSummarizer(mock_client, trigger_messages=4, keep_recent=2,
+                                            executor=ThreadPoolExecutor(max_workers=1))
+        summarizer.reset()
+        summarizer._refresh("", _history(6), 6, generation=0)
+        
+        assert summarizer.snapshot() == ("", 0)
+    
+    def test_chat_interface_uses_summary_and_recent_turns(self, mock_client):
+        """Test that the prompt holds the summary plus only the recent verbatim turns."""
+        summarizer = ConversationSummarizer(mock_client, trigger_messages=4, keep_recent=2,
+                                            executor=ThreadPoolExecutor(max_workers=1))
+        interface = ChatInterface(mock_client, summarizer=summarizer)
+        interface.history = _history(8)
+        summarizer.maybe_refresh(interface.history).result(timeout=5)
+        
+        context = interface._create_context()
+        assert "Summary of the earlier conversation: Patient on metformin." in context
+        assert "turn 0" not in context
+        assert "User: turn 6" in context
+        assert "Assistant: turn 7" in context
@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+from src.chat_interface import ChatInterface
+from src.conversation_store import create_conversation_store
+from src.transcript import TranscriptView
+
+def make_interface(count, **kwargs):
+    client = MagicMock()
+    client.generate_completion.return_value = {"choices": [{"text": "Answer"}]}
+    client.extract_response_text.return_value = "Answer"
+    interface = ChatInterface(client, **kwargs)
+    for index in range(count // 2):
+        interface.get_response(f"Question {index}")
+    return interface
+
+class TestTranscriptView:
+    """Test cases for the TranscriptView class."""
+
+    def test_window_grows_a_page_at_a_time(self):
+        """Test that only the newest messages are shown until earlier ones are requested."""
+        interface = make_interface(50)
+        view = TranscriptView(window=20)
+
+        messages, has_earlier = view.visible(interface)
+        assert [index for index, _ in messages] == list(range(30, 50))
+        assert messages[0][1]["content"] == "Question 15"
+        assert has_earlier
+
+        view.load_earlier()
+        view.load_earlier()
+        messages, has_earlier = view.visible(interface)
+        assert len(messages) == 50 and not has_earlier
+
+        view.reset()
+        assert len(view.visible(interface)[0]) == 20
+
+    def test_rerender_cost_is_independent_of_length(self):
+        """Test that reruns format nothing again and render a fixed number of messages."""
+        for length in (40, 2000):
+            formatter = MagicMock(side_effect=str.upper)
+            view = TranscriptView(window=10, formatter=formatter)
+            interface = make_interface(length)
+
+            for _ in range(3):
+                rendered = [view.format(index, message) for index, message in view.visible(interface)[0]]
+
+            assert len(rendered) == 10
+            assert formatter.call_count == 10
+
+    def test_changed_content_is_reformatted(self):
+        """Test that memoized markdown is keyed on content and bounded in size."""
+        view = TranscriptView(window=2, formatter=str.upper, cache_size=3)
+
+        assert view.format(0, {"role": "user", "content": "old"}) == "OLD"
+        assert view.format(0, {"role": "user", "content": "new"}) == "NEW"
+        for index in range(1, 5):
+            view.format(index, {"role": "user", "content": "x"})
+        assert len(view._formatted) == 3
+
+    def test_earlier_pages_are_read_from_store_once(self, tmp_path):
+        """Test paging past the in-memory history into the conversation store."""
+        store = create_conversation_store(backend="sqlite", path=str(tmp_path / "conversations.db"))
+        interface = make_interface(60, history_limit=20, conversation_store=store, session_id="abc")
+        store.load_page = MagicMock(wraps=store.load_page)
+        view = TranscriptView(window=30)
+
+        view.load_earlier()
+        for _ in range(3):
+            messages, has_earlier = view.visible(interface)
+
+        assert [index for index, _ in messages] == list(range(0, 60))
+        assert messages[0][1]["content"] == "Question 0"
+        assert not has_earlier
+        assert store.load_page.call_count == 1
+        store.close()